@@ -0,0 +1,70 @@
+"""
+History store query time: closed scalps aggregates by depth and side, by ma_short_long_rel_delta bucket and by day
+over the generated history.
+
+Usage:
+    python3 benchmarks/bench_history_query.py [rows]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scalp_history import HistoryStore, COLUMNS
+
+
+def generate(store: HistoryStore, rows: int):
+    """
+    writes the random history straight as segments
+    """
+    rnd = np.random.default_rng(1)
+    for code_column, values in (("symbol", ["ETH/BTC", "XRP/BTC", "LTC/BTC", "ETH/USDT"]),
+                                ("side", ["buy", "sell"]), ("state", ["closed", "handed_over"]),
+                                ("leg1_status", ["closed"]), ("leg2_status", ["closed", "canceled"])):
+        for v in values:
+            store.code(code_column, v)
+
+    now = time.time()
+    for start in range(0, rows, store.segment_rows):
+        n = min(store.segment_rows, rows - start)
+        columns = {"time": np.sort(now - 30 * 86400 + (start + np.arange(n)) * 30 * 86400 / rows),
+                   "symbol": rnd.integers(0, 4, n, dtype=np.int32),
+                   "side": rnd.integers(0, 2, n, dtype=np.int32),
+                   "depth": rnd.integers(1, 11, n, dtype=np.int32),
+                   "state": (rnd.random(n) < 0.05).astype(np.int32),
+                   "ma_delta": rnd.random(n) * 0.01,
+                   "result": rnd.normal(0.0001, 0.001, n),
+                   "leg1_status": np.zeros(n, dtype=np.int32),
+                   "leg2_status": (rnd.random(n) < 0.1).astype(np.int32)}
+        for column, kind in COLUMNS.items():
+            if column not in columns:
+                columns[column] = np.zeros(n, dtype="i4" if kind == "cat" else kind)
+        store._write_segment(columns)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    directory = tempfile.mkdtemp()
+
+    try:
+        store = HistoryStore(directory, segment_rows=262144).open()
+        start = time.monotonic()
+        generate(store, rows)
+        print("Generated {} rows in {} segments: {:.2f} s".format(rows, len(store.segments),
+                                                                 time.monotonic() - start))
+
+        store = HistoryStore(directory).open()
+        week = time.time() - 7 * 86400
+        for title, by, since in (("depth, side", ["depth", "side"], None),
+                                 ("depth, last week", ["depth"], week),
+                                 ("delta bucket, leg2 status", ["delta_bucket", "leg2_status"], None),
+                                 ("symbol, day", ["symbol", "day"], None)):
+            start = time.monotonic()
+            aggregates = store.aggregate(by, since)
+            print("{:30} {:5} groups {:8.3f} s".format(title, len(aggregates), time.monotonic() - start))
+    finally:
+        shutil.rmtree(directory)
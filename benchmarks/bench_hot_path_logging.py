@@ -0,0 +1,107 @@
+"""
+Trading loop overhead per active scalp with the different hot path logging settings.
+
+Lane with N active scalps (order1 is open and not updated) is proceeded by scalp.proceed_lane() with the bot's
+logger writing to a null handler, so only formatting and logging calls are measured. Every cycle the order 1 of
+every scalp notifies its scalp of the status update, so all the scalps are proceeded by the lane as changed ones:
+ - "info": hot_path_log_level INFO, every scalp status is logged (the behaviour before hot path logging mode)
+ - "info sampled": hot_path_log_level INFO, scalp_status_log_sample_rate 0.1
+ - "warning": hot_path_log_level WARNING
+
+Usage:
+    python3 benchmarks/bench_hot_path_logging.py [active scalps] [cycles]
+"""
+import os
+import sys
+import time
+import io
+import logging
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scalp_bot import ScalpBot, ScalpLane, SingleScalp
+from scalp_indicators import TickerMAIndicator
+import scalp
+
+
+class _Order(object):
+    def __init__(self, price, amount):
+        self.id = "1"
+        self.symbol = "ETH/BTC"
+        self.start_currency = "BTC"
+        self.dest_currency = "ETH"
+        self.price = price
+        self.amount = amount
+        self.filled = 0.0
+        self.status = "open"
+        self.state = "open"
+        self.max_order_updates = 100
+        self.update_requests_count = 1
+
+    def get_active_order(self):
+        return self
+
+
+class _OrderManager(object):
+    def add_order(self, order):
+        pass
+
+    def get_open_orders(self):
+        return list()
+
+
+def create_lane(bot: ScalpBot, active_scalps: int):
+    indicator = TickerMAIndicator(2, 3)
+    lane = ScalpLane("ETH/BTC", "BTC", "ETH", 0.01, 0.001, 0.003, active_scalps, indicator)
+
+    for i in range(active_scalps):
+        scalp = SingleScalp("ETH/BTC", "BTC", 0.01, i, 0.08, "ETH", 0.003, 0.001, 100, 100, 5, 0)
+        scalp.order1 = _Order(0.08, 0.125)
+        scalp.state = "order1"
+        with contextlib.redirect_stdout(io.StringIO()):  # collection prints every added scalp
+            lane.scalps.add_scalp(scalp)
+
+    lane.run = bot.max_runs + 1  # no new scalps
+    return lane
+
+
+def bench(bot: ScalpBot, active_scalps: int, cycles: int):
+    lane = create_lane(bot, active_scalps)
+    om = _OrderManager()
+    ticker = {"ask": 0.0801, "bid": 0.08}
+
+    scalps = list(lane.scalps.active_scalps.values())
+
+    start = time.perf_counter()
+    for i in range(cycles):
+        for s in scalps:
+            s.order_changed(s.order1)
+        scalp.proceed_lane(bot, om, lane, ticker)
+        scalp.log_cycle_summary(bot, om, [lane], i)
+
+    return (time.perf_counter() - start) / cycles / active_scalps * 1e6
+
+
+if __name__ == "__main__":
+    active_scalps = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    bot = ScalpBot("_config_default.json")
+    bot.load_config_from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "_config_default.json"))
+    bot.max_runs = 1
+
+    logger = logging.getLogger("bench_hot_path_logging")
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    bot.logger = logger
+
+    print("Active scalps: {}. Cycles: {}".format(active_scalps, cycles))
+
+    for name, level, sample_rate in (("info", "INFO", 1.0),
+                                     ("info sampled", "INFO", 0.1),
+                                     ("warning", "WARNING", 1.0)):
+        bot.hot_path_log_level = level
+        bot.scalp_status_log_sample_rate = sample_rate
+        print("{:<14} {:>8.2f} us per cycle per active scalp".format(name, bench(bot, active_scalps, cycles)))
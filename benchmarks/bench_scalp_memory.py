@@ -0,0 +1,65 @@
+"""
+Memory per scalp and scalps creation rate for large ladders: scalps are created on one shared signal record, added to
+the scalps collection and moved to "order1" state as in the trading loop.
+
+Usage:
+    python3 benchmarks/bench_scalp_memory.py [scalps]
+"""
+import os
+import sys
+import gc
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scalp_bot import SingleScalp, ScalpSignal, ScalpsCollection
+
+
+class _QuietScalpsCollection(ScalpsCollection):
+
+    def _report_scalp_add(self, scalp_id):
+        pass
+
+    def _report_scalp_removed(self, scalp_id):
+        pass
+
+
+def create_scalps(scalps_count: int):
+    scalps = _QuietScalpsCollection(scalps_count)
+    signal = ScalpSignal("buy", 0.0801, 0.08, 0.00125)
+
+    for depth in range(1, scalps_count + 1):
+        scalp = SingleScalp("ETH/BTC", "BTC", 0.01, depth, 0.08 * (1 - 0.0005 * depth), "ETH", 0.003, 0.00075,
+                            100, 100, 5, 0)
+        scalp.signal = signal
+        scalps.add_scalp(scalp)
+        scalp.state = "order1"
+
+    return scalps
+
+
+if __name__ == "__main__":
+    scalps_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    gc.collect()
+    start = time.perf_counter()
+    scalps = create_scalps(scalps_count)
+    elapsed = time.perf_counter() - start
+    del scalps
+
+    gc.collect()
+    tracemalloc.start()
+    scalps = create_scalps(scalps_count)
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    gc.collect()
+    start = time.perf_counter()
+    gc.collect()
+    gc_time = time.perf_counter() - start
+
+    print("Scalps: {}".format(scalps_count))
+    print("Memory per scalp (with collection indexes): {:.0f} bytes".format(memory / scalps_count))
+    print("Creation rate: {:.0f} scalps/s".format(scalps_count / elapsed))
+    print("Full gc collection with scalps alive: {:.1f} ms".format(gc_time * 1000))
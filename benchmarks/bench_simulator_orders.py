@@ -0,0 +1,156 @@
+"""
+Order operations per second of the exchange simulator with hundreds of concurrent orders: every cycle the market moves
+by one tick, all the open orders are updated, filled and canceled orders are replaced by the new ones around the best
+price and the orders left far from the price are canceled. The order path costs are the simulator's own, no latency.
+
+The bot run plugs the simulator in as the ccxt exchange of the bot's exchange wrapper (bot.exchange._ccxt) and runs
+the trading loop of scalp.py: buy and sell lanes with the ladders of N levels are proceeded by proceed_lane() and their
+orders by the order manager (FokOrders) in proceed_orders(), so the wrapper, the order manager, the batched orders
+and the scalps are measured together.
+
+Usage:
+    python3 benchmarks/bench_simulator_orders.py [orders] [cycles] [ladder levels]
+"""
+import os
+import sys
+import contextlib
+import io
+import json
+import logging
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scalp_simulator import SimulatedExchange, random_walk_tickers
+
+MARKETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_data", "markets_binance.json")
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "_config_default.json")
+
+
+def run(orders_count: int, cycles: int, errors: float = 0.0):
+    with open(MARKETS_FILE) as f:
+        markets = json.load(f)
+
+    symbol = "ETH/BTC"
+    exchange = SimulatedExchange(markets, random_walk_tickers({symbol: 0.08}, {symbol: 0.000001}, volatility=2.0),
+                                 errors={"default": errors}, tick_interval=0.0)
+    tick_size = 0.000001
+    open_ids = list()
+    ops = 0
+
+    start = time.perf_counter()
+    for cycle in range(cycles):
+        ops += 1
+        try:
+            ticker = exchange.fetch_tickers([symbol])[symbol]
+        except Exception:
+            continue
+
+        still_open = list()
+        for order_id in open_ids:
+            ops += 1
+            try:
+                order = exchange.fetch_order(order_id, symbol)
+            except Exception:
+                still_open.append(order_id)
+                continue
+
+            if order["status"] != "open":
+                continue
+
+            if abs(order["price"] - ticker["bid"]) > 50 * tick_size:
+                ops += 1
+                try:
+                    exchange.cancel_order(order_id, symbol)
+                    continue
+                except Exception:
+                    pass
+            still_open.append(order_id)
+
+        open_ids = still_open
+        for i in range(orders_count - len(open_ids)):
+            side = "buy" if i % 2 == 0 else "sell"
+            price = ticker["bid"] - (i % 20) * tick_size if side == "buy" else ticker["ask"] + (i % 20) * tick_size
+            ops += 1
+            try:
+                open_ids.append(exchange.create_order(symbol, "limit", side, 0.1, price)["id"])
+            except Exception:
+                pass
+
+    return ops, time.perf_counter() - start, exchange.stats()
+
+
+def run_bot(levels: int, cycles: int, errors: float = 0.0):
+    """
+    trading loop cycles of the bot over the simulator: tickers, lanes and order manager
+    """
+    import scalp
+    from scalp_bot import ScalpBot
+
+    with open(MARKETS_FILE) as f:
+        markets = json.load(f)
+
+    data_dir = tempfile.mkdtemp()
+    bot = ScalpBot(CONFIG_FILE, os.path.join(data_dir, "scalp.log"))
+    bot.load_config_from_file(CONFIG_FILE)
+    bot.symbols = [{"symbol": "ETH/BTC", "start_currency": "BTC", "dest_currency": "ETH"},
+                   {"symbol": "ETH/BTC", "start_currency": "ETH", "dest_currency": "BTC"}]
+    bot.max_active_scalps = bot.max_buy_orders_per_run = levels
+    bot.max_runs = 10 ** 9
+    bot.ma_short_long_threshold = -1.0  # signal is always on, the ladders are kept full
+    bot.max_requests_per_lap = 0
+    bot.om_proceed_sleep = 0.0
+    bot.history_enabled = bot.journal_enabled = bot.buffered_reports = False
+    bot.hot_path_log_level = "WARNING"
+    bot.data_dir = data_dir
+    bot.logger.setLevel(logging.WARNING)
+
+    bot.init_exchange()
+    bot.exchange._ccxt = SimulatedExchange(markets, random_walk_tickers({"ETH/BTC": 0.08}, {"ETH/BTC": 0.000001},
+                                                                        volatility=5.0),
+                                           exchange_id=bot.exchange_id, errors={"default": errors},
+                                           tick_interval=0.0)
+    bot.set_markets(markets, "simulator")
+
+    lanes = scalp.init_lanes(bot)
+    om = scalp.create_order_manager(bot)
+
+    open_orders = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # collection prints every added scalp
+        for cycle in range(cycles):
+            tickers = scalp.fetch_lanes_tickers(bot, ["ETH/BTC"])
+            for lane in lanes:
+                scalp.proceed_lane(bot, om, lane, tickers.get("ETH/BTC"))
+            scalp.proceed_orders(bot, om)
+            open_orders += len(om.get_open_orders())
+
+    elapsed = time.perf_counter() - start
+    stats = bot.exchange._ccxt.stats()
+    stats["open_orders_mean"] = open_orders / cycles
+    stats["scalps_added"] = sum([lane.scalps_added for lane in lanes])
+    stats["result"] = sum([lane.total_result for lane in lanes])
+
+    bot.stop_report_writer()
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return elapsed, stats
+
+
+if __name__ == "__main__":
+    orders_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    levels = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    for errors in (0.0, 0.01):
+        ops, elapsed, stats = run(orders_count, cycles, errors)
+        print("orders {} cycles {} errors rate {}: {} ops in {:.2f} s, {:.0f} ops/s, {} fills, {} request errors".format(
+            orders_count, cycles, errors, ops, elapsed, ops / elapsed, stats["fills"], stats["errors"]))
+
+    for errors in (0.0, 0.01):
+        elapsed, stats = run_bot(levels, cycles, errors)
+        print("bot: 2 lanes of {} levels, cycles {}, errors rate {}: {:.2f} ms per cycle, {:.0f} open orders, "
+              "{:.1f} requests per cycle, {} fills, {} scalps added, {} request errors".format(
+                  levels, cycles, errors, elapsed / cycles * 1000, stats["open_orders_mean"],
+                  stats["requests"] / cycles, stats["fills"], stats["scalps_added"], stats["errors"]))
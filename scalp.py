@@ -1,15 +1,25 @@
+import time
+_imports_start = time.monotonic()
+
 import ztom
 from ztom import ActionOrder
-from scalp_bot import ScalpBot, ScalpsCollection, SingleScalp
+from scalp_bot import ScalpBot, ScalpsCollection, SingleScalp, ScalpSignal, ScalpLane, ScalpState
+from scalp_orders import BatchedOrdersExchange, OrderRefreshScheduler
+from scalp_journal import ScalpJournal
+from scalp_feed import PollingFeed, StreamFeed, FallbackFeed
 import sys
 import csv
 import os
-import time
 from typing import Dict, Tuple, List
 import copy
 import datetime
 
+_imports_time = time.monotonic() - _imports_start
+
 def log_scalp_status(_bot, _scalp):
+    if not _bot.log_enabled(_bot.LOG_INFO) or not _bot.scalp_status_log_sampled():
+        return
+
     _bot.log(_bot.LOG_INFO, "######################################################################################")
     _bot.log(_bot.LOG_INFO, "Scalp ID: {}".format(_scalp.id))
     _bot.log(_bot.LOG_INFO, "Symbol: {}".format(_scalp.symbol))
@@ -57,7 +67,7 @@ def log_scalp_order(_bot, _scalp, _scalp_order: ActionOrder):
 def report_close_scalp(_bot: ScalpBot, _scalp: SingleScalp):
     report = dict()
 
-    report["scalp-id"] = _scalp.id
+    report["scalp-id"] = "{}-{}".format(_bot.session_uuid, _scalp.id)
     report["result-fact-diff"] = float(_scalp.result_fact_diff)
     report["start-qty"] = float(_scalp.start_amount)
     report["cur1"] = str(_scalp.start_currency)
@@ -117,8 +127,14 @@ def report_close_scalp(_bot: ScalpBot, _scalp: SingleScalp):
             len(_scalp.order2.orders_history) > 0 else None
 
     _bot.log_report(report)
-    _bot.save_csv_report(report, "{}.csv".format(_scalp.id))
-    _bot.send_remote_report(report)
+
+    if _bot.report_writer is not None:
+        _bot.report_writer.put(report)
+    else:
+        _bot.save_csv_report(report, "{}.csv".format(report["scalp-id"]))
+        _bot.send_remote_report(report)
+        if _bot.history is not None:
+            _bot.history.append_report(report)
 
     # todo : report for order 2
     # report["leg2-order-updates"] = _scalp.order2.orders_history[0].update_requests_count if _scalp.order1 is not None
@@ -128,311 +144,669 @@ def report_close_scalp(_bot: ScalpBot, _scalp: SingleScalp):
 
 
 def report_order1_closed(_bot, _scalp):
-    _bot.log(_bot.LOG_INFO, "Scalp ID: {}. Order 1 closed. Filled {} {}".format(_scalp.id, _scalp.order1.dest_currency,
-                                                                                _scalp.order1.filled_dest_amount))
+    _bot.hot_log(_bot.LOG_INFO, "Scalp ID: {}. Order 1 closed. Filled {} {}", _scalp.id, _scalp.order1.dest_currency,
+                 _scalp.order1.filled_dest_amount)
 
 
 def report_order2_closed(_bot, _scalp):
     if _scalp.order2 is not None:
-        _bot.log(_bot.LOG_INFO,
-                 "Scalp ID: {}. Order 2 closed. Filled {} {}".format(_scalp.id, _scalp.order2.dest_currency,
-                                                                     _scalp.order2.filled_dest_amount))
+        _bot.hot_log(_bot.LOG_INFO, "Scalp ID: {}. Order 2 closed. Filled {} {}", _scalp.id,
+                     _scalp.order2.dest_currency, _scalp.order2.filled_dest_amount)
     else:
-        _bot.log(_bot.LOG_INFO,
-                 "Scalp ID: {}. Closed after Order 1.".format(_scalp.id))
+        _bot.hot_log(_bot.LOG_INFO, "Scalp ID: {}. Closed after Order 1.", _scalp.id)
 
 
-bot = ScalpBot("_config_default.json", "scalp.log")
+def valid_ticker(_ticker):
+    return _ticker is not None and _ticker["ask"] is not None and _ticker["bid"] is not None \
+           and _ticker["ask"] > 0 and _ticker["bid"] > 0
 
-bot.set_from_cli(sys.argv[1:])  # cli parameters  override config
-bot.load_config_from_file(bot.config_filename)  # config taken from cli or default
 
-bot.init_exchange()
+def fetch_lanes_tickers(_bot: ScalpBot, _symbols: List[str]):
+    """
+    fetches tickers for all the lanes' symbols by the single request
+    :return: dict of tickers or empty dict in case of error
+    """
+    try:
+        _bot.hot_log(_bot.LOG_INFO, "Getting tickers for {} symbols", len(_symbols))
+        return _bot.exchange.fetch_tickers(_symbols)
 
-if bot.offline:
-    bot.offline_tickers_file = "test_data/tickers_many.csv"
-    bot.offline_markets_file = "test_data/markets_binance.json"
-    bot.init_offline_mode()
+    except Exception as e:
+        _bot.log(_bot.LOG_ERROR, "Error while fetching tickers exchange_id:{} session_uuid:{}".
+                 format(_bot.exchange_id, _bot.session_uuid))
 
-bot.init_remote_reports()
+        _bot.log(_bot.LOG_ERROR, "Exception: {}".format(type(e).__name__))
+        _bot.log(_bot.LOG_ERROR, "Exception body:", e.args)
 
-bot.load_markets()
+    return dict()
 
-# init parameters
-symbol = bot.symbol
-start_currency = bot.start_currency
-dest_currency = bot.dest_currency
 
-start_amount = bot.start_amount
-profit = bot.profit
-commission = bot.commission
+def lane_order_book(_bot: ScalpBot, _lane: ScalpLane):
+    """
+    cached order book index of the lane's symbol for the order 1 side
+    :return: OrderBookIndex or None if the order book ladder is off or in case of error
+    """
+    if _bot.order_books is None:
+        return None
 
-profit_with_fee = bot.target_single_order_profit(profit, commission)  # target profit considering commission
-scalps_to_do = bot.scalps_to_do  # number of consecutive scalp runs
+    try:
+        return _bot.order_books.index(_lane.symbol, _lane.order1_side)
 
-bot.run = 1  # current run
-total_result = 0.0
+    except Exception as e:
+        _bot.log(_bot.LOG_ERROR, "Error while fetching order book {}: {} {}".format(_lane.symbol, type(e).__name__,
+                                                                                     e.args))
+    return None
 
-total_cur1_diff = 0.0
-total_cur2_diff = 0.0
 
-ticker = bot.exchange.fetch_tickers(symbol)[symbol]
+def lane_done(_bot: ScalpBot, _lane: ScalpLane):
+    return _lane.run > _bot.max_runs and len(_lane.scalps.active_scalps) == 0
 
-depth = 1
 
-om = ztom.OwaManager(bot.exchange, bot.max_order_update_attempts, bot.max_order_update_attempts, bot.request_sleep)
-# om.log = lambda x, y: x
-om.log = bot.log  # override order manager logger to the bot logger
-om.LOG_INFO = bot.LOG_INFO
-om.LOG_ERROR = bot.LOG_ERROR
-om.LOG_DEBUG = bot.LOG_DEBUG
-om.LOG_CRITICAL = bot.LOG_CRITICAL
+def proceed_lane(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane, _ticker):
+    """
+    one iteration of the scalping algo for the lane: updates MAs with the new ticker, adds scalps if signal fires and
+    proceeds scalps of the lane.
+    """
+    scalps = _lane.scalps
+    order1_side = _lane.order1_side
+    ma_indicator = _lane.indicator
 
-order1_side = ztom.core.get_order_type(start_currency, dest_currency, symbol)
+    if _bot.log_enabled(_bot.LOG_INFO):
+        scalps_in_oder1 = scalps.count(ScalpState.ORDER1)
+        scalps_in_oder2 = scalps.count(ScalpState.ORDER2)
 
-if order1_side == "buy":
-    start_price = ticker["bid"]*(1 - profit_with_fee*bot.first_order_price_margin_in_profits_with_fees
-                                 - (depth-1)*bot.depth_step_in_profits*bot.profit)
-elif order1_side == "sell":
-    start_price = ticker["ask"] * (1 + profit_with_fee * bot.first_order_price_margin_in_profits_with_fees
-                                   + (depth - 1) * bot.depth_step_in_profits*bot.profit)
-else:
-    bot.log(bot.LOG_ERROR, "Wrong symbol")
-    sys.exit()
+        _bot.log(_bot.LOG_INFO, "Lane: {}. Run: {}/{}. Active scalps: {} (order1 {}, order2 {}). Scalps added: {}/{}. "
+                                "Total result so far {}".format(_lane.id, _lane.run, _bot.max_runs,
+                                                                len(scalps.active_scalps), scalps_in_oder1,
+                                                                scalps_in_oder2, scalps.scalps_order1_complete,
+                                                                _bot.max_buy_orders_per_run, _lane.total_result))
 
-bot.log(bot.LOG_CRITICAL, "Init ticker:{}".format(start_price))
+    if valid_ticker(_ticker):
+        with _bot.profile("ma"):
+            ma_indicator.update(_ticker["ask"], _ticker["bid"])
+        cancel_stale_levels(_bot, _om, _lane, _ticker)
+        update_order_refresh(_om, _lane, _ticker)
 
-scalp = SingleScalp(symbol, start_currency, start_amount, depth,
-                    start_price, dest_currency,
-                    profit_with_fee, bot.commission, bot.order1_max_updates, bot.order2_max_updates_for_profit,
-                    bot.order2_max_updates_market,
-                    bot.cancel_threshold)
+    if not ma_indicator.warmed_up:
+        _bot.hot_log(_bot.LOG_INFO, "Still collecting tickers {}/{}", ma_indicator.ticks, ma_indicator.warm_up_len)
+        return
 
-scalps = ScalpsCollection(bot.max_active_scalps)
-# scalps.add_scalp(scalp)
+    _bot.hot_log(_bot.LOG_INFO, "Collecting tickers done {}/{}", ma_indicator.ticks, ma_indicator.warm_up_len)
+    _bot.hot_log(_bot.LOG_INFO, "Use {} for MAs", "ASK" if order1_side == "buy" else "BID")
 
-scalps_added = 0
-prev_ticker = None
+    ma = ma_indicator.for_side(order1_side)
 
-tickers_hist = dict()
-tickers_hist["ask"] = list()
-tickers_hist["bid"] = list()
+    ma_short_last = ma.ma_short
+    ma_long_last = ma.ma_long
+    ma_short_long_rel_delta = ma.rel_delta
 
-ticker_history_len = bot.ma_long_window + bot.ma_count
+    _bot.hot_log(_bot.LOG_INFO, "Last ma_long:{}", ma_long_last)
+    _bot.hot_log(_bot.LOG_INFO, "Last ma_short:{}", ma_short_last)
+    _bot.hot_log(_bot.LOG_INFO, "Delta relative short long / threshold :{}/{}", ma_short_long_rel_delta,
+                 _bot.ma_short_long_threshold)
 
-while True:
-    bot.log(bot.LOG_INFO, "")
-    bot.log(bot.LOG_INFO, "")
-    bot.log(bot.LOG_INFO, "")
-    bot.log(bot.LOG_INFO, "######################################################################################")
-    bot.log(bot.LOG_INFO, "Run: {}/{}".format(bot.run, bot.max_runs))
-    bot.log(bot.LOG_INFO, "Total active scalps: {} ".format(len(scalps.active_scalps)))
-    bot.log(bot.LOG_INFO, "Scalps adeed: {}/{} ".format(scalps.scalps_order1_complete, bot.max_buy_orders_per_run))
-    bot.log(bot.LOG_INFO, "Total result so far {}".format(total_result))
+    ok_to_add_scapls = ma_indicator.signal(order1_side, _bot.ma_short_long_threshold)
 
-    scalps_in_oder1 = len(list(filter(lambda x: x.state == "order1", scalps.active_scalps.values())))
-    scalps_in_oder2 = len(list(filter(lambda x: x.state == "order2", scalps.active_scalps.values())))
+    if ok_to_add_scapls and order1_side == "buy":
+        _bot.hot_log(_bot.LOG_INFO, "Going to buy->sell. ma_short {} greater than ma_long{} more than threshold {}.",
+                     ma_short_last, ma_long_last, _bot.ma_short_long_threshold)
 
-    bot.log(bot.LOG_INFO, "Total active orders: {}".format(len(om.get_open_orders())))
-    bot.log(bot.LOG_INFO, "Scalps in order1:{} . Scalps in order2:{}".format(scalps_in_oder1, scalps_in_oder2))
-    bot.log(bot.LOG_INFO, "######################################################################################")
+    if ok_to_add_scapls and order1_side == "sell":
+        _bot.hot_log(_bot.LOG_INFO, "Going to sell->buy. ma_short {} less than ma_long {} less than rel. threshold {}.",
+                     ma_short_last, ma_long_last, _bot.ma_short_long_threshold)
 
-    bot.log(bot.LOG_INFO, "")
-    bot.log(bot.LOG_INFO, "")
-    bot.log(bot.LOG_INFO, "")
+    if _bot.offline:
+        _bot.hot_log(_bot.LOG_INFO, "Fetch_id {}", _bot.exchange._offline_tickers_current_index-1)
 
-    active_scalps = list(scalps.active_scalps.values())
+    # create new scalp if  have not executed total amount of scalps
+    if len(scalps.active_scalps) < scalps.max_scalps and _lane.run <= _bot.max_runs and ok_to_add_scapls \
+            and valid_ticker(_ticker):
 
-    if bot.run > bot.max_runs and len(active_scalps) == 0:
-        bot.log(bot.LOG_INFO, "Max runs reached {}/{} and no active scalps.".format(bot.run, bot.max_runs))
-        break
+        _bot.hot_log(_bot.LOG_INFO, "Adding new scalp  ")
 
-    ticker = None
-    ok_to_add_scapls = False
+        depth_levels_to_add = scalps.missed_scalps_depth(ScalpState.ORDER1, _lane.max_active_scalps)
+        signal = ScalpSignal(order1_side, ma_short_last, ma_long_last, ma_short_long_rel_delta)
+        book = lane_order_book(_bot, _lane)
+        if book is not None:
+            depth_levels_to_add, prices, profits_with_fee_and_depth = _lane.book_ladder(
+                _ticker, depth_levels_to_add, book, _bot.order_book_wall_ratio, _bot.order_book_max_queue_ratio)
+        else:
+            prices, profits_with_fee_and_depth = _lane.ladder(_ticker, depth_levels_to_add)
+
+        new_scalps = list()
+        for depth, price, profit_with_fee_and_depth in zip(depth_levels_to_add, prices, profits_with_fee_and_depth):
+            new_scalp = SingleScalp(_lane.symbol, _lane.start_currency, _lane.start_amount, depth, price,
+                                    _lane.dest_currency,
+                                    profit_with_fee_and_depth,
+                                    _bot.commission,
+                                    _bot.order1_max_updates,
+                                    _bot.order2_max_updates_for_profit,
+                                    _bot.order2_max_updates_market,
+                                    _bot.cancel_threshold
+                                    )
+            new_scalp.signal = signal
+            new_scalps.append(new_scalp)
+
+        scalps.add_scalps(new_scalps)
+
+    if scalps.scalps_order1_complete >= _lane.max_active_scalps and _lane.run <= _bot.max_runs:
+        _lane.run += 1
+        scalps.scalps_order1_complete = 0
 
-    # # request tickers if only going to add scalps:
-    # if len(scalps.active_scalps) < scalps.max_scalps and bot.run <= bot.max_runs:
+    with _bot.profile("scalps"):
+        proceed_scalps(_bot, _om, _lane)
 
-    try:
-        bot.log(bot.LOG_INFO, "Getting ticker. Tickers collected {}/{}".format(len(tickers_hist["ask"]), bot.ma_long_window) )
-        new_buy_order_price = None
 
-        ticker = bot.exchange.fetch_tickers(symbol)[symbol]
+def on_scalp_new(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane, _scalp: SingleScalp):
+    _bot.hot_log(_bot.LOG_INFO, "Scalp ID: {}. Creating order 1", _scalp.id)
+    _scalp.create_order1()
+    _om.add_order(_scalp.order1)
 
-    except Exception as e:
-        bot.log(bot.LOG_ERROR, "Error while fetching tickers exchange_id:{} session_uuid:{}".
-                format(bot.exchange_id, bot.session_uuid))
 
-        bot.log(bot.LOG_ERROR, "Exception: {}".format(type(e).__name__))
-        bot.log(bot.LOG_ERROR, "Exception body:", e.args)
+def on_order1_complete(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane, _scalp: SingleScalp):
+    report_order1_closed(_bot, _scalp)
+    _bot.hot_log(_bot.LOG_INFO, "Scalp {}. Creating Order 2... ", _scalp.id)
+    _scalp.create_order2()
+    _om.add_order(_scalp.order2)
 
-    if ticker is not None and ticker["ask"] is not None \
-            and ticker["bid"] is not None and ticker["ask"] > 0 and ticker["bid"] > 0:
+    _lane.scalps.scalps_order1_complete += 1
+    _lane.scalps_added += 1
 
-        tickers_hist["ask"].append(ticker["ask"])
-        tickers_hist["bid"].append(ticker["bid"])
 
-        if (len(tickers_hist["ask"])) > ticker_history_len :
-            tickers_hist["ask"] = tickers_hist["ask"][-ticker_history_len:]
+def on_scalp_closed(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane, _scalp: SingleScalp):
+    report_order2_closed(_bot, _scalp)
+    report_close_scalp(_bot, _scalp)
+    _lane.total_result += _scalp.result_fact_diff
 
-        if (len(tickers_hist["bid"])) > ticker_history_len:
-            tickers_hist["bid"] = tickers_hist["bid"][-ticker_history_len:]
+    _lane.total_cur1_diff += _scalp.cur1_diff
+    _lane.total_cur2_diff += _scalp.cur2_diff
 
-    if len(tickers_hist["ask"]) < ticker_history_len:
-        bot.log(bot.LOG_INFO, "Still collecting tickers {}/{}".format(len(tickers_hist["ask"]), ticker_history_len))
-        continue
+    _lane.scalps.remove_scalp(_scalp.id)
+    _bot.hot_log(_bot.LOG_INFO, "Total result from {}", _lane.total_result)
 
-    else:
-        bot.log(bot.LOG_INFO, "Collecting tickers done {}/{}".format(len(tickers_hist["ask"]), ticker_history_len))
 
-        if order1_side == "buy":
-            bot.log(bot.LOG_INFO, "Use ASK for MAs")
-            ma_long = ztom.indicators.computeMA(tickers_hist["ask"], bot.ma_long_window)
-            ma_short = ztom.indicators.computeMA(tickers_hist["ask"], bot.ma_short_window)
-        else:
-            bot.log(bot.LOG_INFO, "Use BID for MAs")
-            ma_long = ztom.indicators.computeMA(tickers_hist["bid"], bot.ma_long_window)
-            ma_short = ztom.indicators.computeMA(tickers_hist["bid"], bot.ma_short_window)
+# handlers of the scalp's states, called when the scalp is proceeded in the state
+SCALP_STATE_HANDLERS = {ScalpState.NEW: on_scalp_new,
+                        ScalpState.ORDER1_COMPLETE: on_order1_complete,
+                        ScalpState.CLOSED: on_scalp_closed,
+                        ScalpState.HANDED_OVER: on_scalp_closed}
 
-    ok_to_add_scapls = False
 
-    ma_short_last = ma_short[-1:].item()
-    ma_long_last = ma_long[-1:].item()
+def proceed_scalp(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane, _scalp: SingleScalp):
+    """
+    makes the transition of the scalp by its orders statuses and calls the handler of the scalp's state
+    """
+    _bot.hot_log(_bot.LOG_INFO, "Proceed Scalp id: {}", _scalp.id)
 
-    if ma_short_last != 0:
-        ma_short_long_rel_delta = (ma_short_last - ma_long_last) / ma_short_last
-    else:
-        ma_short_long_rel_delta = None
+    _scalp.update_state(_scalp.order1.status if _scalp.order1 is not None else "",
+                        _scalp.order2.status if _scalp.order2 is not None else "")
 
-    bot.log(bot.LOG_INFO, "Last ma_long:{}".format(ma_long[-1:]))
-    bot.log(bot.LOG_INFO, "Last ma_short:{}".format(ma_short[-1:]))
-    bot.log(bot.LOG_INFO, "Delta relative short long / threshold :{}/{}".format(ma_short_long_rel_delta,
-                                                                                bot.ma_short_long_threshold))
+    log_scalp_status(_bot, _scalp)
 
-    if order1_side == "buy" and ma_short_long_rel_delta is not None \
-            and ( ma_short_long_rel_delta > bot.ma_short_long_threshold):
+    handler = SCALP_STATE_HANDLERS.get(_scalp.state)
+    if handler is not None:
+        handler(_bot, _om, _lane, _scalp)
 
-        bot.log(bot.LOG_INFO, "Going to buy->sell. ma_short {} greater than ma_long{} more than threshold {}.".format(
-            ma_short_last, ma_long_last, bot.ma_short_long_threshold))
 
-        ok_to_add_scapls = True
+def proceed_scalps(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane):
+    """
+    proceeds the lane's scalps added or with the orders changed since the last call: creates orders 1 of the new
+    scalps, orders 2 of the scalps with order 1 complete and closes the scalps with order 2 complete. Scalps waiting
+    for their orders are not proceeded, except the order 2 handoff check if the recovery worker is on.
+    """
+    scalps = _lane.scalps
 
-    if order1_side == "sell" and ma_short_long_rel_delta is not None and  \
-            (ma_short_long_rel_delta < -bot.ma_short_long_threshold):
-        bot.log(bot.LOG_INFO, "Going to sell->buy. ma_short less than ma_long less than rel. threshold {}.".format(
-            ma_short_last, ma_long_last, bot.ma_short_long_threshold))
+    for scalp in scalps.pop_changed():
+        if scalps.active_scalps.get(scalp.id) is scalp:  # not removed by the handler of the other scalp
+            proceed_scalp(_bot, _om, _lane, scalp)
 
-        ok_to_add_scapls = True
+    if _bot.recovery_client is not None:
+        for scalp in scalps.scalps_in_state(ScalpState.ORDER2):
+            if handoff_order2(_bot, _om, scalp):
+                on_scalp_closed(_bot, _om, _lane, scalp)
 
-    if bot.offline:
-        bot.log(bot.LOG_INFO, "Fetch_id {}".format(bot.exchange._offline_tickers_current_index-1))
 
-    # create new scalp if  have not executed total amount of scalps
-    if len(scalps.active_scalps) < scalps.max_scalps and bot.run <= bot.max_runs and ok_to_add_scapls:
+def release_order(_om: ztom.OwaManager, _order: ActionOrder):
+    """
+    stops the order manager from proceeding the order. Order manager's facades (e.g. of the async runner) could
+    defer the release by their own release_order().
+    """
+    release = getattr(_om, "release_order", None)
+    if release is not None:
+        release(_order)
+        return
 
-        bot.log(bot.LOG_INFO, "Adding new scalp  ")
+    orders = getattr(_om, "orders", None)
+    if isinstance(orders, list) and _order in orders:
+        orders.remove(_order)
 
-        if ticker is not None and ticker["ask"] is not None \
-                and ticker["bid"] is not None and ticker["ask"] > 0 and ticker["bid"] > 0:
+    _order.status = "closed"
 
-            depth_levels_to_add = scalps.missed_scalps_depth("order1", bot.max_active_scalps)
 
-            for depth in depth_levels_to_add:
+def handoff_order2(_bot: ScalpBot, _om: ztom.OwaManager, _scalp: SingleScalp):
+    """
+    hands the stalled order 2 over to the recovery worker: order 2 which was not filled for recovery_handoff_updates
+    updates. The scalp is closed with the filled part of order 2 and its depth level becomes free.
 
-                if order1_side == "buy":
-                    price = ticker["bid"]*(1 - profit_with_fee*bot.first_order_price_margin_in_profits_with_fees
-                                           - (depth-1)*bot.depth_step_in_profits*bot.profit)
-                else:
-                    price = ticker["ask"] * (1 + profit_with_fee * bot.first_order_price_margin_in_profits_with_fees
-                                   + (depth - 1) * bot.depth_step_in_profits*bot.profit)
+    :return: True if order 2 was handed over
+    """
+    active_order = _scalp.order2.get_active_order()
+    if active_order is None or active_order.id is None \
+            or active_order.update_requests_count < _bot.recovery_handoff_updates \
+            or not _bot.recovery_client.available():
+        return False
 
+    leg = {"leg_id": "{}-{}".format(_bot.session_uuid, _scalp.id),
+           "symbol": _scalp.symbol,
+           "side": active_order.side,
+           "order_id": active_order.id,
+           "amount": active_order.amount,
+           "price": active_order.price,
+           "filled": active_order.filled,
+           "cost": getattr(active_order, "cost", 0.0) or 0.0}
+
+    if not _bot.recovery_client.handoff(leg):
+        _bot.log(_bot.LOG_ERROR, "Scalp ID: {}. Recovery worker has not taken order 2".format(_scalp.id))
+        if not _bot.recovery_client.available():
+            _bot.log(_bot.LOG_ERROR, "Recovery worker is not reachable. Handoffs are skipped for {} s".format(
+                _bot.recovery_client.retry_interval))
+        return False
 
-                profit_with_fee_and_depth = profit_with_fee + bot.profit*bot.depth_step_in_profits*(depth-1)
+    release_order(_om, _scalp.order2)
+    _scalp.hand_over_order2()
+
+    _bot.log(_bot.LOG_INFO, "Scalp ID: {}. Order 2 {} handed over to recovery worker. Filled {}/{}".format(
+        _scalp.id, active_order.id, active_order.filled, active_order.amount))
+    return True
+
+
+def log_cycle_summary(_bot: ScalpBot, _om: ztom.OwaManager, _lanes: List[ScalpLane], _cycle: int):
+    """
+    single info record per main loop cycle. Logged regardless of hot_path_log_level.
+    """
+    if not _bot.logger_enabled(_bot.LOG_INFO):
+        return
+
+    states = {"order1": 0, "order2": 0}
+    active_scalps, result = 0, 0.0
+    for lane in _lanes:
+        active_scalps += len(lane.scalps.active_scalps)
+        result += lane.total_result
+        for state in states:
+            states[state] += lane.scalps.count(state)
+
+    summary = "Cycle {}. Lanes {}. Active scalps {} (order1 {}, order2 {}). Open orders {}. Result {}".format(
+        _cycle, len(_lanes), active_scalps, states["order1"], states["order2"], len(_om.get_open_orders()), result)
+
+    if _bot.request_scheduler is not None:
+        summary += ". Requests utilization {utilization:.2f}, tokens {tokens:.0f}, per cycle " \
+                   "{requests_per_cycle:.1f}".format(**_bot.request_scheduler.stats())
+
+    _bot.log(_bot.LOG_INFO, summary)
+
+
+def report_profile(_bot: ScalpBot, _force: bool = False):
+    """
+    exports the phases aggregates every profiling_report_interval seconds as metrics points of the report writer (or
+    remote reports) and to the log, then starts the new interval
+    """
+    profiler = _bot.profiler
+    if profiler is None or (not _force and time.monotonic() - profiler.interval_start < _bot.profiling_report_interval):
+        return
+
+    points = profiler.points()
+    profiler.reset()
+
+    _bot.log(_bot.LOG_INFO, profiler.summary(points))
+
+    if _bot.report_writer is not None:
+        _bot.report_writer.put_metrics(points)
+    else:
+        for point in points:
+            _bot.send_remote_report(point)
 
-                new_scalp = SingleScalp(symbol, start_currency, start_amount, depth, price, dest_currency,
-                                        profit_with_fee_and_depth,
-                                        bot.commission,
-                                        bot.order1_max_updates,
-                                        bot.order2_max_updates_for_profit,
-                                        bot.order2_max_updates_market,
-                                        bot.cancel_threshold
-                                        )
 
-                new_scalp.supplementary["ticker_price"] = price
-                new_scalp.supplementary["order1_side"] = order1_side
-                new_scalp.supplementary["ma_short"] = ma_short_last
-                new_scalp.supplementary["ma_long"] = ma_long_last
-                new_scalp.supplementary["ma_short_long_rel_delta"] = ma_short_long_rel_delta
-                new_scalp.supplementary["time_created_utc"] = datetime.datetime.utcnow()
+def lanes_health(_bot: ScalpBot, _om: ztom.OwaManager, _lanes: List[ScalpLane], _cycle: int):
+    """
+    health and PnL of the lanes: scalps and open orders counts, results in the start currencies and balance changes
+    by currency
+    """
+    result, balance_diff = dict(), dict()
+    active_scalps, order1, order2 = 0, 0, 0
 
+    for lane in _lanes:
+        result[lane.start_currency] = result.get(lane.start_currency, 0.0) + lane.total_result
+        balance_diff[lane.start_currency] = balance_diff.get(lane.start_currency, 0.0) + lane.total_cur1_diff
+        balance_diff[lane.dest_currency] = balance_diff.get(lane.dest_currency, 0.0) + lane.total_cur2_diff
 
-                scalps.add_scalp(new_scalp)
+        active_scalps += len(lane.scalps.active_scalps)
+        order1 += lane.scalps.count(ScalpState.ORDER1)
+        order2 += lane.scalps.count(ScalpState.ORDER2)
 
-    if scalps.scalps_order1_complete >= bot.max_active_scalps and bot.run <= bot.max_runs:
-        bot.run += 1
-        scalps.scalps_order1_complete = 0
+    health = {"time": time.time(), "exchange_id": _bot.exchange_id, "cycle": _cycle, "lanes": len(_lanes),
+              "lanes_done": len([lane for lane in _lanes if lane_done(_bot, lane)]), "active_scalps": active_scalps,
+              "order1": order1, "order2": order2, "open_orders": len(_om.get_open_orders()), "result": result,
+              "balance_diff": balance_diff}
+
+    if _bot.request_scheduler is not None:
+        health["requests_utilization"] = _bot.request_scheduler.stats()["utilization"]
+    if _bot.feed is not None:
+        health["feed_mode"] = getattr(_bot.feed, "mode", "polling")
+
+    return health
+
+
+def report_health(_bot: ScalpBot, _om: ztom.OwaManager, _lanes: List[ScalpLane], _cycle: int,
+                  _force: bool = False):
+    """
+    sends the lanes health to the bot's health sink every health_report_interval seconds
+    """
+    if _bot.health_sink is None:
+        return
+
+    now = time.monotonic()
+    if not _force and now - _bot.last_health_report_time < _bot.health_report_interval:
+        return
 
-    for scalp in active_scalps:
-        bot.log(bot.LOG_INFO, "Proceed Scalp id: {}".format(scalp.id))
+    _bot.last_health_report_time = now
+    try:
+        _bot.health_sink(lanes_health(_bot, _om, _lanes, _cycle))
+    except Exception as e:
+        _bot.log(_bot.LOG_ERROR, "Error while reporting health: {} {}".format(type(e).__name__, e.args))
+
+
+def run_lanes(_bot: ScalpBot, _om: ztom.OwaManager, _lanes: List[ScalpLane]):
+    """
+    main loop: lanes are proceeded on every tickers update of the feed (single tickers request per cycle for the
+    polling feed) and single order manager for all the orders is proceeded once per cycle or right away if there are
+    new orders. Exits when all the lanes have done max_runs and have no active scalps.
+    """
+    symbols = list(set([lane.symbol for lane in _lanes]))
+
+    if _bot.feed is None:
+        init_feed(_bot, symbols)
+
+    cycle = 0
+    next_cycle_time = 0.0
+
+    while True:
+
+        if all([lane_done(_bot, lane) for lane in _lanes]):
+            _bot.log(_bot.LOG_INFO, "Max runs reached {} and no active scalps in all lanes.".format(_bot.max_runs))
+            break
+
+        with _bot.profile("tickers"):
+            tickers = _bot.feed.get_tickers(symbols)
+        orders_count = len(_om.get_open_orders())
+        cycle_due = time.monotonic() >= next_cycle_time
+
+        for lane in _lanes:
+            if lane_done(_bot, lane) or not (cycle_due or lane.symbol in tickers):
+                continue
+
+            proceed_lane(_bot, _om, lane, tickers.get(lane.symbol))
+
+        if cycle_due or len(_om.get_open_orders()) > orders_count:
+            cycle += 1
+            with _bot.profile("orders"):
+                proceed_orders(_bot, _om)
+
+            if _bot.journal is not None:
+                with _bot.profile("journal"):
+                    _bot.journal.record_cycle(_lanes)
+
+            log_cycle_summary(_bot, _om, _lanes, cycle)
+            report_profile(_bot)
+            report_health(_bot, _om, _lanes, cycle)
+            next_cycle_time = time.monotonic() + _bot.cycle_sleep()
+
+        with _bot.profile("sleep"):
+            _bot.feed.wait(max(0.0, next_cycle_time - time.monotonic()))
+
+    _bot.feed.stop()
+    report_profile(_bot, True)
+    report_health(_bot, _om, _lanes, cycle, True)
+
+    for lane in _lanes:
+        _bot.log(_bot.LOG_INFO, "")
+        _bot.log(_bot.LOG_INFO, "")
+        _bot.log(_bot.LOG_INFO, "Lane: {}".format(lane.id))
+        _bot.log(_bot.LOG_INFO, "Total scalps added with order 1 complete {}".format(lane.scalps_added))
+        _bot.log(_bot.LOG_INFO, "Total result from {}".format(lane.total_result))
+        _bot.log(_bot.LOG_INFO, "Total cur1 diff {}".format(lane.total_cur1_diff))
+        _bot.log(_bot.LOG_INFO, "Total cur2 diff {}".format(lane.total_cur2_diff))
+
+
+def proceed_orders(_bot: ScalpBot, _om: ztom.OwaManager):
+    """
+    proceeds open orders of the order manager. If the order manager uses BatchedOrdersExchange the new orders are
+    placed in bulk and the statuses of open orders are fetched in batch before.
+    """
+    open_orders = _om.get_open_orders()
+    if len(open_orders) == 0:
+        return
+
+    if not isinstance(_om.exchange, BatchedOrdersExchange):
+        _om.proceed_orders()
+        return
+
+    if _bot.batch_order_placement:
+        placement = _om.exchange.place_orders(open_orders)
+        if placement["orders"] > 0:
+            _bot.hot_log(_bot.LOG_INFO, "Placed {} new orders in {:.1f} ms. Requests: batch {}, single {}. Errors {}",
+                         placement["orders"], placement["latency"] * 1000, placement["batch_requests"],
+                         placement["single_requests"], placement["errors"])
+        if placement["orphaned"] > 0:
+            _bot.hot_log(_bot.LOG_ERROR, "Canceled {} orders placed in bulk and left by the order manager",
+                         placement["orphaned"])
+
+    if _bot.batch_order_updates:
+        _om.exchange.prefetch_open_orders(open_orders)
+
+    _om.proceed_orders()
+    stats = _om.exchange.finish_cycle()
+
+    _bot.hot_log(_bot.LOG_INFO, "Orders updates: {}. Requests: batch {}, single {}. Saved {} (cached far orders {})",
+                 stats["order_updates"], stats["batch_requests"], stats["single_requests"], stats["requests_saved"],
+                 stats["cached_updates"])
+
+
+def update_order_refresh(_om: ztom.OwaManager, _lane: ScalpLane, _ticker):
+    """
+    passes the lane's market and depth step to the order refresh scheduler of the order manager's exchange
+    """
+    refresh = getattr(getattr(_om, "exchange", None), "refresh", None)
+    if not isinstance(refresh, OrderRefreshScheduler):
+        return
+
+    refresh.set_depth_step(_lane.symbol, _lane.depth_step)
+    refresh.update_market(_lane.symbol, _ticker["bid"], _ticker["ask"])
+
+
+def cancel_stale_levels(_bot: ScalpBot, _om: ztom.OwaManager, _lane: ScalpLane, _ticker):
+    """
+    cancels in bulk order 1 of the lane's scalps left behind the ladder by the price move, so their depth levels are
+    refilled from the current price. Scalps are closed (or proceed to order 2 if partially filled) on the next orders
+    update.
+    """
+    if not _bot.cancel_stale_levels or not isinstance(_om.exchange, BatchedOrdersExchange) \
+            or not valid_ticker(_ticker):
+        return
+
+    active_ids = set()
+    trade_orders = list()
+
+    for scalp in _lane.stale_scalps(_ticker):
+        active_order = scalp.order1.get_active_order() if scalp.order1 is not None else None
+        if active_order is None or active_order.id is None:
+            continue
+
+        active_ids.add(active_order.id)
+        if active_order.id not in _lane.stale_canceled:
+            trade_orders.append(active_order)
+
+    _lane.stale_canceled &= active_ids
+    if len(trade_orders) == 0:
+        return
+
+    stats = _om.exchange.cancel_orders(trade_orders)
+    _lane.stale_canceled.update([o.id for o in trade_orders])
+
+    _bot.hot_log(_bot.LOG_INFO, "Lane {}. Canceled {} stale levels in {:.1f} ms. Requests: batch {}, single {}. "
+                                "Errors {}", _lane.id, stats["orders"], stats["latency"] * 1000,
+                 stats["batch_requests"], stats["single_requests"], stats["errors"])
+
+
+def create_order_manager(_bot: ScalpBot):
+    refresh = OrderRefreshScheduler(_bot.order_refresh_near_levels, _bot.order_refresh_max_interval) \
+        if _bot.adaptive_order_refresh else None
+
+    exchange = BatchedOrdersExchange(_bot.exchange, _bot.order_placement_workers, refresh) \
+        if _bot.batch_order_updates or _bot.batch_order_placement or _bot.cancel_stale_levels or refresh is not None \
+        else _bot.exchange
+
+    om = ztom.OwaManager(exchange, _bot.max_order_update_attempts, _bot.max_order_update_attempts,
+                         _bot.request_sleep)
+    # om.log = lambda x, y: x
+    om.log = _bot.log  # override order manager logger to the bot logger
+    om.LOG_INFO = _bot.LOG_INFO
+    om.LOG_ERROR = _bot.LOG_ERROR
+    om.LOG_DEBUG = _bot.LOG_DEBUG
+    om.LOG_CRITICAL = _bot.LOG_CRITICAL
+    return om
+
+
+def init_bot(argv: List[str], overrides: dict = None, log_filename: str = "scalp.log"):
+    """
+    creates the bot from config and cli parameters, inits exchange, remote reports and markets
+
+    :param overrides: parameters overriding the config, e.g. of the shard
+    """
+    _bot = ScalpBot("_config_default.json", log_filename)
+    _bot.startup.add("imports", _imports_time)
+
+    with _bot.startup.phase("config"):
+        _bot.set_from_cli(argv)  # cli parameters  override config
+        _bot.load_config_from_file(_bot.config_filename)  # config taken from cli or default
+        for key, value in (overrides or dict()).items():
+            setattr(_bot, key, value)
+
+    with _bot.startup.phase("exchange"):
+        _bot.init_exchange()
+
+        if _bot.offline:
+            _bot.offline_tickers_file = "test_data/tickers_many.csv"
+            _bot.offline_markets_file = "test_data/markets_binance.json"
+            _bot.init_offline_mode()
+
+    _bot.init_profiler()
+
+    with _bot.startup.phase("reports"):
+        _bot.init_remote_reports()
+        _bot.init_report_writer()
+
+    _bot.init_recovery_client()
+    _bot.init_order_books()
+
+    with _bot.startup.phase("markets") as phase:
+        _bot.init_hub_reader()
+        if not _bot.load_markets_from_hub():
+            _bot.load_markets()
+        phase.name = "markets ({})".format(_bot.markets_source)
+
+    return _bot
+
+
+def init_feed(_bot: ScalpBot, _symbols: List[str]):
+    """
+    creates and starts the tickers feed: polling by fetch_tickers, stream from the feed adapter or from the market data
+    hub with the fallback to polling while they are not available
+    """
+    polling = PollingFeed(lambda symbols: fetch_lanes_tickers(_bot, symbols))
+
+    if _bot.feed_mode == "hub" and _bot.hub_reader is not None:
+        from scalp_hub import HubFeed
+        stream = HubFeed(_bot.hub_reader, _symbols, _bot.feed_stale_timeout,
+                         fetch_tickers=lambda symbols: fetch_lanes_tickers(_bot, symbols),
+                         fetch_interval=_bot.om_proceed_sleep)
+        if len(stream.missing) > 0:
+            _bot.log(_bot.LOG_ERROR, "Symbols not published by the hub {} are polled: {}".format(
+                _bot.hub["name"], stream.missing))
+    elif _bot.feed_mode == "stream" and not _bot.offline:
+        stream = StreamFeed(_bot.feed_server["host"], _bot.feed_server["port"], _symbols, _bot.feed_stale_timeout)
+    else:
+        _bot.feed = polling
+        return _bot.feed
+
+    _bot.feed = FallbackFeed(stream, polling,
+                             lambda mode: _bot.log(_bot.LOG_INFO, "Tickers feed: {}".format(mode)))
+    _bot.feed.start()
+    return _bot.feed
 
-        order1_status = scalp.order1.status if scalp.order1 is not None else ""
-        order2_status = scalp.order2.status if scalp.order2 is not None else ""
 
-        scalp.update_state(order1_status, order2_status)
+def init_lanes(_bot: ScalpBot):
+    _lanes = _bot.create_scalp_lanes()
 
-        log_scalp_status(bot, scalp)
+    for lane in _lanes:
+        if lane.order1_side not in ("buy", "sell"):
+            _bot.log(_bot.LOG_ERROR, "Wrong symbol {}".format(lane.id))
+            sys.exit(1)
 
-        if scalp.state == "new":
-            bot.log(bot.LOG_INFO, "Scalp ID: {}. Creating order 1".format(scalp.id))
-            scalp.create_order1()
-            om.add_order(scalp.order1)
+        _bot.log(_bot.LOG_INFO, "Lane {}: order1 side {}".format(lane.id, lane.order1_side))
 
-        if scalp.state == "order1":
-            pass
-            # log_scalp_order(bot, scalp, scalp.order1)
+    return _lanes
 
-        if scalp.state == "order1_complete":
-            report_order1_closed(bot, scalp)
-            bot.log(bot.LOG_INFO, "Scalp {}. Creating Order 2... ".format(scalp.id))
-            scalp.create_order2()
-            om.add_order(scalp.order2)
 
-            scalps.scalps_order1_complete += 1
-            scalps_added += 1
+def init_journal(_bot: ScalpBot, _om: ztom.OwaManager, _lanes: List[ScalpLane]):
+    """
+    opens the lanes state journal and restores the lanes from it: active scalps, lanes counters and indicators. Live
+    orders of the restored scalps are added to the order manager.
+    """
+    if not _bot.journal_enabled or _bot.offline:
+        return
 
-            # if scalps.scalps_added >= scalps.max_scalps-1:
-            #     bot.run += 1
-            #     scalps.scalps_added = 0
+    start = time.monotonic()
 
-        if scalp.state == "order2":
-            pass
-            # log_scalp_order(bot, scalp, scalp.order2)
+    _bot.journal = ScalpJournal(_bot.data_path("journal"), int(_bot.journal_size), _bot.journal_snapshot_interval)
+    _bot.journal.open()
 
-        if scalp.state == "closed":
-            report_order2_closed(bot, scalp)
-            report_close_scalp(bot, scalp)
-            total_result += scalp.result_fact_diff
+    live_orders = _bot.journal.restore(_lanes)
+    for order in live_orders:
+        _om.add_order(order)
 
-            total_cur1_diff += scalp.cur1_diff
-            total_cur2_diff += scalp.cur2_diff
+    _bot.log(_bot.LOG_INFO, "Journal restored in {:.1f} ms. Scalps {}, live orders {}".format(
+        (time.monotonic() - start) * 1000, sum([len(lane.scalps.active_scalps) for lane in _lanes]),
+        len(live_orders)))
 
-            scalps.remove_scalp(scalp.id)
-            bot.log(bot.LOG_INFO, "Total result from {}".format(total_result))
 
-    if len(om.get_open_orders()) > 0:
-        om.proceed_orders()
-    time.sleep(bot.om_proceed_sleep)
+def close_journal(_bot: ScalpBot, _lanes: List[ScalpLane]):
+    if _bot.journal is not None:
+        _bot.journal.snapshot(_lanes)
+        _bot.journal.close()
 
-bot.log(bot.LOG_INFO, "")
-bot.log(bot.LOG_INFO, "")
 
-bot.log(bot.LOG_INFO, "Total scalps added with order 1 complete {}".format(scalps_added))
-bot.log(bot.LOG_INFO, "No more active scalps")
-bot.log(bot.LOG_INFO, "Total result from {}".format(total_result))
+def run_bot(_bot: ScalpBot):
+    """
+    inits the lanes and runs them until all are done
+    """
+    with _bot.startup.phase("lanes"):
+        lanes = init_lanes(_bot)
+        om = create_order_manager(_bot)
+
+    with _bot.startup.phase("journal"):
+        init_journal(_bot, om, lanes)
+
+    _bot.log(_bot.LOG_INFO, _bot.startup.summary())
+
+    try:
+        run_lanes(_bot, om, lanes)
+    finally:
+        close_journal(_bot, lanes)
+        _bot.stop_report_writer()
 
-bot.log(bot.LOG_INFO, "Total cur1 diff {}".format(total_cur1_diff))
-bot.log(bot.LOG_INFO, "Total cur2 diff {}".format(total_cur2_diff))
+    _bot.log(_bot.LOG_INFO, "No more active scalps")
+    _bot.log(_bot.LOG_INFO, "Exiting...")
 
-bot.log(bot.LOG_INFO, "Exiting...")
 
-sys.exit(0)
+if __name__ == "__main__":
+    run_bot(init_bot(sys.argv[1:]))
+    sys.exit(0)
@@ -0,0 +1,240 @@
+"""
+Asynchronous runtime of the scalp bot: tickers polling, orders proceeding and scalps processing are run as concurrent
+asyncio tasks sharing the bot's requests scheduler, so slow tickers request does not delay order updates and scalps
+are processed as soon as new ticker or orders update arrives.
+
+Usage:
+    python3 scalp_async.py [--offline]
+"""
+import ztom
+from scalp_bot import ScalpBot, ScalpLane
+from scalp_throttle import RequestScheduler
+from scalp import init_bot, init_lanes, create_order_manager, proceed_lane, lane_done, fetch_lanes_tickers, \
+    proceed_orders, init_journal, close_journal, release_order
+import asyncio
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+
+async def acquire(scheduler: RequestScheduler, requests: int = 1,
+                  priority: int = RequestScheduler.PRIORITY_TICKERS):
+    """
+    takes requests from the bot's requests scheduler without blocking the event loop
+    """
+    if scheduler is None:
+        return
+
+    while not scheduler.try_acquire(requests, priority):
+        await asyncio.sleep(max(scheduler.wait_time(requests, priority), 0.001))
+
+
+class _DeferredOrderManager(object):
+    """
+    Order manager facade for the scalps task: new and released orders are queued and added to or removed from the
+    order manager by the orders task before the orders are proceeded, so the order manager is never changed while
+    it's proceeding orders.
+    """
+
+    def __init__(self, om: ztom.OwaManager):
+        self.om = om
+        self.new_orders = deque()
+        self.released_orders = deque()
+        self.new_orders_event = None  # type: asyncio.Event
+        self.loop = None  # type: asyncio.AbstractEventLoop
+
+    def add_order(self, order):
+        self.new_orders.append(order)
+        if self.new_orders_event is not None:
+            # orders are added by the lanes in the orders thread
+            self.loop.call_soon_threadsafe(self.new_orders_event.set)
+
+    def release_order(self, order):
+        self.released_orders.append(order)
+
+    def apply(self):
+        """
+        adds the new orders to the order manager and removes the released ones
+        """
+        while len(self.released_orders) > 0:
+            release_order(self.om, self.released_orders.popleft())
+
+        while len(self.new_orders) > 0:
+            self.om.add_order(self.new_orders.popleft())
+
+    @property
+    def exchange(self):
+        return self.om.exchange
+
+    def get_open_orders(self):
+        return self.om.get_open_orders()
+
+
+class AsyncScalpRunner(object):
+    """
+    Tickers are fetched by the async exchange or in the tickers thread. The order manager and the lanes (which place
+    and cancel orders, fetch order books and hand orders over) are proceeded in the single orders thread one after
+    another, so the event loop is never blocked by the exchange requests and the order manager's exchange is used by
+    one thread only.
+    """
+
+    def __init__(self, bot: ScalpBot, om: ztom.OwaManager, lanes: List[ScalpLane]):
+        self.bot = bot
+        self.om = om
+        self.deferred_om = _DeferredOrderManager(om)
+        self.lanes = lanes
+        self.symbols = list(set([lane.symbol for lane in lanes]))
+
+        self.async_exchange = None  # ccxt async_support exchange for tickers, sync bot's exchange is used if None
+        self.tickers = dict()
+        self.tickers_time = 0.0
+
+        self._tickers_event = None  # type: asyncio.Event
+        self._orders_event = None  # type: asyncio.Event
+        self._executor = ThreadPoolExecutor(max_workers=1)  # tickers
+        self._orders_executor = ThreadPoolExecutor(max_workers=1)  # order manager and lanes
+
+    def init_async_exchange(self):
+        """
+        creates ccxt async exchange for tickers polling. Tickers are fetched by the bot's exchange in the thread pool
+        in offline mode or if ccxt async_support is not available.
+        """
+        if self.bot.offline:
+            return
+
+        try:
+            import ccxt.async_support as ccxt_async
+        except ImportError:
+            self.bot.log(self.bot.LOG_ERROR, "ccxt async_support is not available. Tickers will be fetched in thread")
+            return
+
+        params = dict(self.bot.api_key) if isinstance(getattr(self.bot, "api_key", None), dict) else dict()
+        params["enableRateLimit"] = self.bot.request_scheduler is None  # or limited by the requests scheduler
+        self.async_exchange = getattr(ccxt_async, self.bot.exchange_id)(params)
+
+    async def fetch_tickers(self):
+        if self.async_exchange is not None:
+            # bot's exchange requests are throttled by the bot's exchange itself
+            await acquire(self.bot.request_scheduler)
+            try:
+                return await self.async_exchange.fetch_tickers(self.symbols)
+            except Exception as e:
+                self.bot.log(self.bot.LOG_ERROR, "Error while fetching tickers: {} {}".format(type(e).__name__,
+                                                                                            e.args))
+                return dict()
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, fetch_lanes_tickers, self.bot, self.symbols)
+
+    async def tickers_task(self):
+        while True:
+            tickers = await self.fetch_tickers()
+            if len(tickers) > 0:
+                self.tickers = tickers
+                self.tickers_time = time.monotonic()
+                self._tickers_event.set()
+
+            await asyncio.sleep(self.bot.request_sleep)
+
+    def _proceed_orders(self):
+        self.deferred_om.apply()
+        proceed_orders(self.bot, self.om)
+
+    def _proceed_lanes(self, tickers: dict):
+        for lane in self.lanes:
+            if lane_done(self.bot, lane):
+                continue
+
+            proceed_lane(self.bot, self.deferred_om, lane, tickers.get(lane.symbol))
+
+        if self.bot.journal is not None:
+            self.bot.journal.record_cycle(self.lanes)
+
+    async def orders_task(self):
+        loop = asyncio.get_event_loop()
+        new_orders_event = self.deferred_om.new_orders_event
+
+        while True:
+            if len(self.om.get_open_orders()) + len(self.deferred_om.new_orders) == 0:
+                try:
+                    await asyncio.wait_for(new_orders_event.wait(), self.bot.om_proceed_sleep)
+                except asyncio.TimeoutError:
+                    pass
+                new_orders_event.clear()
+                continue
+
+            new_orders_event.clear()
+            await loop.run_in_executor(self._orders_executor, self._proceed_orders)
+            self._orders_event.set()
+
+            await asyncio.sleep(self.bot.cycle_sleep())
+
+    async def scalps_task(self):
+        """
+        proceeds the lanes on new tickers or orders update. Returns when all the lanes are done.
+        """
+        loop = asyncio.get_event_loop()
+
+        while not all([lane_done(self.bot, lane) for lane in self.lanes]):
+            tickers_wait = asyncio.ensure_future(self._tickers_event.wait())
+            orders_wait = asyncio.ensure_future(self._orders_event.wait())
+
+            await asyncio.wait([tickers_wait, orders_wait], return_when=asyncio.FIRST_COMPLETED)
+            tickers_wait.cancel()
+            orders_wait.cancel()
+
+            # MAs are updated only by the new tickers
+            tickers = self.tickers if self._tickers_event.is_set() else dict()
+            self._tickers_event.clear()
+            self._orders_event.clear()
+
+            await loop.run_in_executor(self._orders_executor, self._proceed_lanes, tickers)
+
+    async def run(self):
+        self._tickers_event = asyncio.Event()
+        self._orders_event = asyncio.Event()
+        self.deferred_om.new_orders_event = asyncio.Event()
+        self.deferred_om.loop = asyncio.get_event_loop()
+
+        self.init_async_exchange()
+
+        tasks = [asyncio.ensure_future(self.tickers_task()), asyncio.ensure_future(self.orders_task())]
+        try:
+            await self.scalps_task()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            if self.async_exchange is not None:
+                await self.async_exchange.close()
+            self._executor.shutdown(wait=True)
+            self._orders_executor.shutdown(wait=True)
+
+        for lane in self.lanes:
+            self.bot.log(self.bot.LOG_INFO, "Lane: {}. Total result {}. Total cur1 diff {}. Total cur2 diff {}".format(
+                lane.id, lane.total_result, lane.total_cur1_diff, lane.total_cur2_diff))
+
+
+if __name__ == "__main__":
+    bot = init_bot(sys.argv[1:])
+
+    with bot.startup.phase("lanes"):
+        lanes = init_lanes(bot)
+        om = create_order_manager(bot)
+
+    with bot.startup.phase("journal"):
+        init_journal(bot, om, lanes)
+
+    bot.log(bot.LOG_INFO, bot.startup.summary())
+
+    asyncio.run(AsyncScalpRunner(bot, om, lanes).run())
+    close_journal(bot, lanes)
+    bot.stop_report_writer()
+
+    bot.log(bot.LOG_INFO, "No more active scalps")
+    bot.log(bot.LOG_INFO, "Exiting...")
+
+    sys.exit(0)
@@ -0,0 +1,340 @@
+"""
+Offline backtest of the scalping algo: replays tickers from csv file through the scalp lanes with simulated order fills.
+No sleeps, no logging and no reports on the way - only totals in the end.
+
+Usage:
+    python3 scalp_backtest.py --tickers test_data/counter_order_tickers.csv --symbol AE/ETH --start-currency ETH
+    --dest-currency AE
+"""
+from scalp_bot import ScalpBot, ScalpsCollection, SingleScalp, ScalpLane, ScalpState, ScalpOrderEvents
+import argparse
+import csv
+import sys
+import time
+from typing import Dict, List, Iterable, Tuple
+
+
+class BacktestOrder(ScalpOrderEvents):
+    """
+    Simulated fill-or-kill order: filled completely at its price when the replayed ticker crosses it or closed not
+    filled after max_order_updates ticks. Provides the fields of FokOrder which are used by SingleScalp and reports the
+    status change to the scalp.
+    """
+
+    __slots__ = ["symbol", "start_currency", "start_amount", "dest_currency", "price", "side", "amount",
+                 "max_order_updates", "updates", "_status", "scalp", "filled", "filled_start_amount", "filled_dest_amount"]
+
+    def __init__(self, symbol: str, start_currency: str, start_amount: float, dest_currency: str, price: float,
+                 max_order_updates: int = 5):
+        self.symbol = symbol
+        self.start_currency = start_currency
+        self.start_amount = start_amount
+        self.dest_currency = dest_currency
+        self.price = price
+
+        self.side = "buy" if symbol.split("/")[0] == dest_currency else "sell"
+        self.amount = start_amount / price if self.side == "buy" else start_amount
+
+        self.max_order_updates = max_order_updates
+        self.updates = 0
+        self.scalp = None
+
+        self.status = "open"
+        self.filled = 0.0
+        self.filled_start_amount = 0.0
+        self.filled_dest_amount = 0.0
+
+    @classmethod
+    def create_from_start_amount(cls, symbol, start_currency, amount_start, dest_currency, target_price,
+                                 cancel_threshold=0.0, max_order_updates=5):
+        return cls(symbol, start_currency, amount_start, dest_currency, target_price, max_order_updates)
+
+    def proceed(self, ask: float, bid: float, commission: float):
+        """
+        one order update against the replayed ticker
+        :return: True if order was closed
+        """
+        self.updates += 1
+
+        if (self.side == "buy" and ask <= self.price) or (self.side == "sell" and bid >= self.price):
+            self.filled = self.amount
+            self.filled_start_amount = self.start_amount
+            dest_amount = self.amount if self.side == "buy" else self.amount * self.price
+            self.filled_dest_amount = dest_amount * (1 - commission)
+            self.status = "closed"
+            return True
+
+        if self.updates >= self.max_order_updates:
+            self.status = "closed"
+            return True
+
+        return False
+
+
+class BacktestScalp(SingleScalp):
+    order_class = BacktestOrder
+
+    __slots__ = ("created_tick",)
+
+    def __init__(self, *args, **kwargs):
+        super(BacktestScalp, self).__init__(*args, **kwargs)
+        self.created_tick = 0
+
+
+class QuietScalpsCollection(ScalpsCollection):
+
+    def _report_scalp_add(self, scalp_id):
+        pass
+
+    def _report_scalp_removed(self, scalp_id):
+        pass
+
+
+class BacktestResult(object):
+
+    def __init__(self, lane_id: str):
+        self.lane_id = lane_id
+
+        self.ticks = 0
+        self.scalps_added = 0
+        self.scalps_closed = 0
+
+        self.order1_filled = 0
+        self.order1_not_filled = 0
+        self.order2_filled = 0
+        self.order2_not_filled = 0
+
+        self.result_fact_diff = 0.0
+        self.cur1_diff = 0.0
+        self.cur2_diff = 0.0
+
+        self.lifetime_ticks = 0  # sum of lifetime of closed scalps in ticks
+        self.active_scalps_left = 0
+
+    @property
+    def order1_fill_rate(self):
+        total = self.order1_filled + self.order1_not_filled
+        return self.order1_filled / total if total > 0 else None
+
+    @property
+    def order2_fill_rate(self):
+        total = self.order2_filled + self.order2_not_filled
+        return self.order2_filled / total if total > 0 else None
+
+    @property
+    def avg_lifetime_ticks(self):
+        return self.lifetime_ticks / self.scalps_closed if self.scalps_closed > 0 else None
+
+    def report(self):
+        return {"lane": self.lane_id,
+                "ticks": self.ticks,
+                "scalps-added": self.scalps_added,
+                "scalps-closed": self.scalps_closed,
+                "result-fact-diff": self.result_fact_diff,
+                "cur1-diff": self.cur1_diff,
+                "cur2-diff": self.cur2_diff,
+                "order1-fill-rate": self.order1_fill_rate,
+                "order2-fill-rate": self.order2_fill_rate,
+                "avg-lifetime-ticks": self.avg_lifetime_ticks,
+                "active-scalps-left": self.active_scalps_left}
+
+
+class ScalpBacktest(object):
+    """
+    Replays tickers through the scalp lanes. Follows the live loop of scalp.py: MAs update, adding of the missed depth
+    levels when signal fires, scalps proceeding and orders proceeding on every tick.
+    """
+
+    def __init__(self, lanes: List[ScalpLane], commission: float, ma_short_long_threshold: float,
+                 order1_max_updates: int, order2_max_updates_for_profit: int, order2_max_updates_market: int = 5,
+                 cancel_threshold: float = 0.0, max_runs: int = None):
+
+        self.lanes = dict()  # type: Dict[str, List[ScalpLane]]
+        for lane in lanes:
+            lane.scalps = QuietScalpsCollection(lane.max_active_scalps)
+            self.lanes.setdefault(lane.symbol, list()).append(lane)
+
+        self.commission = commission
+        self.ma_short_long_threshold = ma_short_long_threshold
+        self.order1_max_updates = order1_max_updates
+        self.order2_max_updates_for_profit = order2_max_updates_for_profit
+        self.order2_max_updates_market = order2_max_updates_market
+        self.cancel_threshold = cancel_threshold
+        self.max_runs = max_runs  # None for no limit
+
+        self.results = dict()  # type: Dict[ScalpLane, BacktestResult]
+        self._open_orders = dict()  # type: Dict[ScalpLane, List[BacktestOrder]]
+        for lane in lanes:
+            self.results[lane] = BacktestResult(lane.id)
+            self._open_orders[lane] = list()
+
+        self.run_time = 0.0
+
+    @classmethod
+    def from_bot(cls, bot: ScalpBot, max_runs: int = None):
+        return cls(bot.create_scalp_lanes(), bot.commission, bot.ma_short_long_threshold, bot.order1_max_updates,
+                   bot.order2_max_updates_for_profit, bot.order2_max_updates_market, bot.cancel_threshold, max_runs)
+
+    def run(self, tickers: Iterable[Tuple[str, float, float]]):
+        """
+        replays tickers
+        :param tickers: iterable of (symbol, ask, bid)
+        :return: list of BacktestResult for the lanes
+        """
+        time_start = time.perf_counter()
+
+        lanes = self.lanes
+        for symbol, ask, bid in tickers:
+            if symbol not in lanes or not ask > 0 or not bid > 0:
+                continue
+
+            for lane in lanes[symbol]:
+                self.proceed_tick(lane, ask, bid)
+
+        for lane, result in self.results.items():
+            result.active_scalps_left = len(lane.scalps.active_scalps)
+
+        self.run_time += time.perf_counter() - time_start
+        return list(self.results.values())
+
+    def proceed_tick(self, lane: ScalpLane, ask: float, bid: float):
+        result = self.results[lane]
+        scalps = lane.scalps
+        indicator = lane.indicator
+        tick = result.ticks
+        result.ticks += 1
+
+        indicator.update(ask, bid)
+
+        if not indicator.warmed_up:
+            return
+
+        if len(scalps.active_scalps) < scalps.max_scalps and (self.max_runs is None or lane.run <= self.max_runs) \
+                and indicator.signal(lane.order1_side, self.ma_short_long_threshold):
+
+            ticker = {"ask": ask, "bid": bid}
+            for depth in scalps.missed_scalps_depth(ScalpState.ORDER1, lane.max_active_scalps):
+                scalp = BacktestScalp(lane.symbol, lane.start_currency, lane.start_amount, depth,
+                                      lane.order1_price(ticker, depth), lane.dest_currency,
+                                      lane.profit_with_depth(depth), self.commission, self.order1_max_updates,
+                                      self.order2_max_updates_for_profit, self.order2_max_updates_market,
+                                      self.cancel_threshold)
+                scalp.created_tick = tick
+                scalps.add_scalp(scalp)
+                result.scalps_added += 1
+
+        if scalps.scalps_order1_complete >= lane.max_active_scalps:
+            lane.run += 1
+            scalps.scalps_order1_complete = 0
+
+        open_orders = self._open_orders[lane]
+
+        for scalp in scalps.pop_changed():
+            scalp.update_state(scalp.order1.status if scalp.order1 is not None else "",
+                               scalp.order2.status if scalp.order2 is not None else "")
+
+            if scalp.state == ScalpState.NEW:
+                open_orders.append(scalp.create_order1())
+
+            elif scalp.state == ScalpState.ORDER1_COMPLETE:
+                result.order1_filled += 1
+                open_orders.append(scalp.create_order2())
+                scalps.scalps_order1_complete += 1
+                lane.scalps_added += 1
+
+            elif scalp.state == ScalpState.CLOSED:
+                if scalp.order2 is None:
+                    result.order1_not_filled += 1
+                elif scalp.order2.filled > 0:
+                    result.order2_filled += 1
+                else:
+                    result.order2_not_filled += 1
+
+                result.scalps_closed += 1
+                result.lifetime_ticks += tick - scalp.created_tick
+                result.result_fact_diff += scalp.result_fact_diff
+                result.cur1_diff += scalp.cur1_diff
+                result.cur2_diff += scalp.cur2_diff
+
+                lane.total_result += scalp.result_fact_diff
+                lane.total_cur1_diff += scalp.cur1_diff
+                lane.total_cur2_diff += scalp.cur2_diff
+
+                scalps.remove_scalp(scalp.id)
+
+        if len(open_orders) > 0:
+            commission = self.commission
+            open_orders[:] = [o for o in open_orders if not o.proceed(ask, bid, commission)]
+
+
+def read_tickers_csv(filename: str, symbol: str = None):
+    """
+    generator of (symbol, ask, bid) from the csv file. Supports tickers files (with "symbol", "ask" and "bid"
+    columns, like test_data/tickers_many.csv) and deals reports with order and counter order prices of the first leg
+    (like test_data/counter_order_tickers.csv).
+
+    :param filename: csv file
+    :param symbol: if set only the tickers of the symbol are returned
+    """
+    with open(filename, newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+
+        if "ask" in header and "bid" in header:
+            symbol_index, ask_index, bid_index = header.index("symbol"), header.index("ask"), header.index("bid")
+            counter_prices = False
+        else:
+            symbol_index = header.index("symbol1")
+            ask_index, bid_index = header.index("leg1-price"), header.index("leg1-counter-price")
+            counter_prices = True
+
+        for row in reader:
+            row_symbol = row[symbol_index]
+            if symbol is not None and row_symbol != symbol:
+                continue
+
+            try:
+                ask, bid = float(row[ask_index]), float(row[bid_index])
+            except ValueError:
+                continue
+
+            if counter_prices and ask < bid:
+                ask, bid = bid, ask
+
+            yield row_symbol, ask, bid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scalp bot backtest on the tickers from csv file")
+    parser.add_argument("--config", default="_config_default.json")
+    parser.add_argument("--tickers", default="test_data/tickers_many.csv")
+    parser.add_argument("--symbol", default=None, help="symbol to backtest instead of configured one(s)")
+    parser.add_argument("--start-currency", default=None)
+    parser.add_argument("--dest-currency", default=None)
+    parser.add_argument("--max-runs", type=int, default=None, help="max runs per lane. No limit by default")
+    args = parser.parse_args()
+
+    bot = ScalpBot(args.config)
+    bot.load_config_from_file(args.config)
+
+    if args.symbol is not None:
+        bot.symbols = [{"symbol": args.symbol,
+                        "start_currency": args.start_currency if args.start_currency is not None
+                        else args.symbol.split("/")[1],
+                        "dest_currency": args.dest_currency if args.dest_currency is not None
+                        else args.symbol.split("/")[0]}]
+
+    backtest = ScalpBacktest.from_bot(bot, args.max_runs)
+    results = backtest.run(read_tickers_csv(args.tickers))
+
+    total_ticks = 0
+    for result in results:
+        total_ticks += result.ticks
+        for k, v in result.report().items():
+            print("{} = {}".format(k, v))
+        print("")
+
+    print("Total result-fact-diff {}".format(sum([r.result_fact_diff for r in results])))
+    print("Run time {:.3f}s, {:.0f} ticks/s".format(backtest.run_time,
+                                                  total_ticks / backtest.run_time if backtest.run_time > 0 else 0))
+    sys.exit(0)
@@ -2,17 +2,112 @@ import ztom
 from ztom import TradeOrder
 from ztom import OrderWithAim
 from ztom import RecoveryOrder, FokOrder
-import uuid
+from scalp_indicators import TickerMAIndicator
+from scalp_throttle import RequestScheduler, ThrottledExchange
+from scalp_reports import ReportWriter
+from scalp_history import HistoryStore
+from scalp_ladder import ladder, market_tick_size, book_ladder, OrderBookIndex, OrderBookCache
+from scalp_startup import MarketsCache, StartupTimings
+from scalp_profiler import PhaseProfiler, ProfiledExchange, ProfileSignals, NO_PHASE
 import sys
 import csv
 import os
 import time
 from typing import Dict, Tuple, List
 import copy
+import logging
+import itertools
+import datetime
+import threading
+from collections import deque
+from enum import Enum
+
+
+class ScalpSignal(object):
+    """
+    MA signal which the scalps were created on. One record is shared by all the scalps created on the same signal.
+    """
+
+    __slots__ = ("order1_side", "ma_short", "ma_long", "ma_short_long_rel_delta", "time_created")
+
+    def __init__(self, order1_side: str, ma_short: float, ma_long: float, ma_short_long_rel_delta: float,
+                 time_created: float = None):
+        """
+        :param time_created: unix timestamp, current time by default
+        """
+        self.order1_side = order1_side
+        self.ma_short = ma_short
+        self.ma_long = ma_long
+        self.ma_short_long_rel_delta = ma_short_long_rel_delta
+        self.time_created = time_created if time_created is not None else time.time()
+
+
+class ScalpState(str, Enum):
+    """
+    States of the scalp. Members are equal to their values, so the states could be compared with and looked up by
+    the strings (reports, journal).
+    """
+
+    NEW = "new"
+    ORDER1 = "order1"
+    ORDER1_COMPLETE = "order1_complete"
+    ORDER2 = "order2"
+    CLOSED = "closed"
+    HANDED_OVER = "handed_over"
+
+    def __str__(self):
+        return self.value
+
+    def __format__(self, format_spec):
+        return self.value.__format__(format_spec)
+
+
+class ScalpOrderEvents(object):
+    """
+    Mixin of the scalp's order class: the status change of the order is reported to the scalp the order belongs to, so
+    the scalps are proceeded only when their orders change.
+    """
+
+    __slots__ = ()
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, status: str):
+        old_status = getattr(self, "_status", None)
+        self._status = status
+
+        scalp = getattr(self, "scalp", None)
+        if scalp is not None and status != old_status:
+            scalp.order_changed(self)
+
+
+class ScalpOrder(ScalpOrderEvents, FokOrder):
+    pass
+
+
+_scalp_ids = itertools.count(1)
+
+
+def skip_scalp_ids(last_id: int):
+    """
+    makes ids of the new scalps greater than last_id, e.g. after the scalps were restored
+    """
+    global _scalp_ids
+    _scalp_ids = itertools.count(max(next(_scalp_ids), last_id + 1))
 
 
 class SingleScalp(object):
 
+    order_class = ScalpOrder  # class of the scalp's orders, should provide create_from_start_amount()
+
+    __slots__ = ("symbol", "start_currency", "start_amount", "start_price", "dest_currency", "profit", "depth",
+                 "price_step_incremental_per_depth", "commission", "order1_max_updates",
+                 "order2_max_updates_for_profit", "order2_max_updates_market", "cancel_threshold", "order1", "order2",
+                 "result_fact_diff", "cur1_diff", "cur2_diff", "id", "_collection", "_state", "signal")
+
     def __init__(self, symbol: str, start_currency: str, amount_start: float, depth: int, start_price: float, dest_currency: str,
                  profit: float,
                  commission: float = 0.001,
@@ -48,17 +143,49 @@ class SingleScalp(object):
         self.cur1_diff = 0.0
         self.cur2_diff = 0.0
 
-        self.id = str(uuid.uuid4())
-        self.state = "new"  # "order1","order1_complete", "order1_not_filled",  "order2", "closed"
+        self.id = next(_scalp_ids)  # unique within the process
+        self._collection = None  # type: ScalpsCollection
+        self._state = ScalpState.NEW
 
-        self.supplementary = dict()  # for stats and additional data
+        self.signal = None  # type: ScalpSignal
+
+    @property
+    def supplementary(self):
+        """
+        stats and additional data of the scalp for reporting
+        """
+        if self.signal is None:
+            return dict()
+
+        return {"ticker_price": self.start_price,
+                "order1_side": self.signal.order1_side,
+                "ma_short": self.signal.ma_short,
+                "ma_long": self.signal.ma_long,
+                "ma_short_long_rel_delta": self.signal.ma_short_long_rel_delta,
+                "time_created_utc": datetime.datetime.fromtimestamp(self.signal.time_created, datetime.timezone.utc)}
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state: str):
+        """
+        sets the state and updates the indexes of the scalps collection the scalp belongs to
+        """
+        old_state = self._state
+        self._state = ScalpState(state)
+
+        if self._collection is not None and old_state != state:
+            self._collection.scalp_state_changed(self, old_state)
 
     def create_order1(self):
-        order1 = FokOrder.create_from_start_amount(self.symbol, self.start_currency, self.start_amount,
-                                                   self.dest_currency, self.start_price, self.cancel_threshold,
-                                                   self.order1_max_updates)
+        order1 = self.order_class.create_from_start_amount(self.symbol, self.start_currency, self.start_amount,
+                                                           self.dest_currency, self.start_price, self.cancel_threshold,
+                                                           self.order1_max_updates)
+        self._watch_order(order1)
         self.order1 = order1
-        self.state = "order1"
+        self.state = ScalpState.ORDER1
 
         return order1
 
@@ -81,39 +208,75 @@ class SingleScalp(object):
         #                        self.order2_max_updates_for_profit,
         #                        self.order2_max_updates_market)
 
-        order2 = FokOrder.create_from_start_amount(self.symbol, self.dest_currency, self.order1.filled_dest_amount,
-                                                   self.start_currency, order2_price, self.cancel_threshold,
-                                                   self.order2_max_updates_for_profit)
+        order2 = self.order_class.create_from_start_amount(self.symbol, self.dest_currency,
+                                                           self.order1.filled_dest_amount,
+                                                           self.start_currency, order2_price, self.cancel_threshold,
+                                                           self.order2_max_updates_for_profit)
 
-        self.state = "order2"
+        self._watch_order(order2)
+        self.state = ScalpState.ORDER2
 
         self.order2 = order2
         return order2
 
+    def _watch_order(self, order):
+        if isinstance(order, ScalpOrderEvents):
+            order.scalp = self
+
+    def order_changed(self, order):
+        """
+        called by the scalp's order on the status change: the scalp is queued to be proceeded by its collection
+        """
+        if self._collection is not None:
+            self._collection.scalp_changed(self)
+
+    def hand_over_order2(self):
+        """
+        closes the scalp after order 2 was handed over to the recovery worker: result is taken by the filled part of
+        order 2, the rest is managed by the worker.
+        """
+        self.result_fact_diff = self.order2.filled_dest_amount - self.order1.filled_start_amount
+
+        self.cur1_diff += self.order2.filled_dest_amount
+        self.cur2_diff -= self.order2.filled_start_amount
+
+        self.state = ScalpState.HANDED_OVER
+        return self.state
+
     def update_state(self, order1_status: str, order2_status: str):
+        """
+        transition of the state machine by the orders statuses
+        :return: new state or None if the state was not changed
+        """
+        transition = self._transitions.get(self._state)
+        return transition(self, order1_status, order2_status) if transition is not None else None
 
-        if self.state == "new" and order1_status == "open":
-            self.state = "order1"
+    def _from_new(self, order1_status: str, order2_status: str):
+        if order1_status == "open":
+            self.state = ScalpState.ORDER1
             return self.state
 
-        if self.state == "order1" and order1_status == "closed" and self.order1.filled > 0:
-            self.state = "order1_complete"
+    def _from_order1(self, order1_status: str, order2_status: str):
+        if order1_status != "closed":
+            return None
+
+        if self.order1.filled > 0:
+            self.state = ScalpState.ORDER1_COMPLETE
             self.cur1_diff = -self.order1.filled_start_amount
             self.cur2_diff = self.order1.filled_dest_amount
-            return self.state
-
-        if self.state == "order1" and order1_status == "closed" and self.order1.filled <= 0:
-            self.state = "closed"
+        else:
+            self.state = ScalpState.CLOSED
             self.result_fact_diff = 0
-            return self.state
-
-        if self.state == "order1_complete" and order2_status == "open":
-            self.state = "order2"
+        return self.state
 
+    def _from_order1_complete(self, order1_status: str, order2_status: str):
+        if order2_status == "open":
+            self.state = ScalpState.ORDER2
             return self.state
 
-        if self.state == "order2" and order2_status == "closed":
-            self.state = "closed"
+    def _from_order2(self, order1_status: str, order2_status: str):
+        if order2_status == "closed":
+            self.state = ScalpState.CLOSED
             self.result_fact_diff = self.order2.filled_dest_amount - self.order1.filled_start_amount
 
             self.cur1_diff += self.order2.filled_dest_amount
@@ -122,34 +285,143 @@ class SingleScalp(object):
             return self.state
 
 
+SingleScalp._transitions = {ScalpState.NEW: SingleScalp._from_new,
+                            ScalpState.ORDER1: SingleScalp._from_order1,
+                            ScalpState.ORDER1_COMPLETE: SingleScalp._from_order1_complete,
+                            ScalpState.ORDER2: SingleScalp._from_order2}
+
+
 class ScalpsCollection(object):
+    """
+    Active scalps indexed by state and by depth of the scalps in every state. Indexes are updated on every scalp's
+    state change, so counts by state are O(1) and missed depths lookup is O(k) of the depths checked.
+
+    Added scalps and scalps with changed orders are queued to be proceeded by pop_changed(). Orders could change in
+    the order manager's thread, the queue is thread safe.
+    """
+
     def __init__(self, max_scalps: int = 1):
         self.max_scalps = max_scalps
         self.active_scalps = dict()  # type: Dict[str, SingleScalp]
         self.scalps_order1_complete = 0  # type: int
 
+        self.scalps_by_state = dict()  # type: Dict[str, Dict[str, SingleScalp]]
+        self._depths_by_state = dict()  # type: Dict[str, Dict[int, int]]  # state -> {depth: scalps count}
+        self.changed = deque()  # scalps to proceed
+
     def _report_scalp_add(self, scalp_id):
         print("Scalp ID: {} was added".format(scalp_id))
 
     def _report_scalp_removed(self, scalp_id):
         print("Scalp ID: {} was removed".format(scalp_id))
 
+    def _index(self, scalp: SingleScalp, state: str):
+        self.scalps_by_state.setdefault(state, dict())[scalp.id] = scalp
+
+        depths = self._depths_by_state.setdefault(state, dict())
+        depths[scalp.depth] = depths.get(scalp.depth, 0) + 1
+
+    def _unindex(self, scalp: SingleScalp, state: str):
+        self.scalps_by_state[state].pop(scalp.id, None)
+
+        depths = self._depths_by_state[state]
+        depths[scalp.depth] -= 1
+        if depths[scalp.depth] <= 0:
+            del depths[scalp.depth]
+
     def add_scalp(self, single_scalp: SingleScalp = None):
         self.active_scalps[single_scalp.id] = single_scalp
+        single_scalp._collection = self
+        self._index(single_scalp, single_scalp.state)
+        self.changed.append(single_scalp)
 
         self._report_scalp_add(single_scalp.id)
 
+    def add_scalps(self, scalps: List[SingleScalp]):
+        """
+        adds the list of scalps, e.g. the ladder levels created on one signal
+        """
+        for single_scalp in scalps:
+            self.active_scalps[single_scalp.id] = single_scalp
+            single_scalp._collection = self
+            self._index(single_scalp, single_scalp.state)
+        self.changed.extend(scalps)
+
+        self._report_scalps_add([single_scalp.id for single_scalp in scalps])
+
+    def _report_scalps_add(self, scalp_ids: List[int]):
+        for scalp_id in scalp_ids:
+            self._report_scalp_add(scalp_id)
+
     def remove_scalp(self, scalp_id: str):
-        self.active_scalps.pop(scalp_id)
+        scalp = self.active_scalps.pop(scalp_id)
+        scalp._collection = None
+        self._unindex(scalp, scalp.state)
+
         self._report_scalp_removed(scalp_id)
 
+    def scalp_state_changed(self, scalp: SingleScalp, old_state: str):
+        """
+        moves the scalp between the state indexes. Called by the scalp on state change.
+        """
+        if scalp.id not in self.active_scalps:
+            return
+
+        self._unindex(scalp, old_state)
+        self._index(scalp, scalp.state)
+
+    def scalp_changed(self, scalp: SingleScalp):
+        self.changed.append(scalp)
+
+    def pop_changed(self):
+        """
+        :return: list of the active scalps queued since the last call, every scalp once
+        """
+        changed = self.changed
+        scalps = dict()
+        while len(changed) > 0:
+            scalp = changed.popleft()
+            if self.active_scalps.get(scalp.id) is scalp:
+                scalps[scalp.id] = scalp
+        return list(scalps.values())
+
+    def count(self, state: str):
+        """
+        :return: number of active scalps in state
+        """
+        scalps = self.scalps_by_state.get(state)
+        return len(scalps) if scalps is not None else 0
+
+    def scalps_in_state(self, state: str):
+        """
+        :return: list of active scalps in state
+        """
+        return list(self.scalps_by_state.get(state, dict()).values())
+
     def depth_list(self, state: str):
         """
         return list of depth of active scalps in state "state"
         :type state: str
         :return: list
         """
-        return sorted([k.depth for k in self.active_scalps.values() if k.state == state or k.state == "new"])
+        depths = list()
+        for s in {state, ScalpState.NEW}:
+            for depth, count in self._depths_by_state.get(s, dict()).items():
+                depths.extend([depth] * count)
+
+        return sorted(depths)
+
+    def free_depths(self, state: str, max_depth: int):
+        """
+        yields depth levels from 1 to max_depth which are not occupied by the scalps in <state> or "new" state in
+        ascending order
+        """
+        state_depths = self._depths_by_state.get(state, dict())
+        new_depths = self._depths_by_state.get(ScalpState.NEW, dict())
+
+        for depth in range(1, max_depth + 1):
+            if depth not in state_depths and depth not in new_depths:
+                yield depth
 
     def missed_scalps_depth(self, state: str, max_active_scalps: int):
         """
@@ -159,22 +431,123 @@ class ScalpsCollection(object):
         :return:
         """
         missed_scalps = list()
-        scalps_should_be = range(1, max_active_scalps + 1)
-
         scalps_to_add = max_active_scalps - len(self.active_scalps)
 
         if scalps_to_add > 0:
-            present_depths = self.depth_list(state)
+            for depth in self.free_depths(state, max_active_scalps):
+                missed_scalps.append(depth)
 
-            for i in scalps_should_be:
-                if i not in present_depths:
-                    missed_scalps.append(i)
+                if len(missed_scalps) >= scalps_to_add:
+                    break
 
-                    if len(missed_scalps) >= scalps_to_add:
-                        return missed_scalps
         return missed_scalps
 
 
+class ScalpLane(object):
+    """
+    Scalping of one symbol in one direction: scalps collection, MA indicator, runs counter and results. Several lanes
+    could be served by one bot, one tickers request and one order manager.
+    """
+
+    def __init__(self, symbol: str, start_currency: str, dest_currency: str, start_amount: float, profit: float,
+                 profit_with_fee: float, max_active_scalps: int, indicator: TickerMAIndicator,
+                 depth_step_in_profits: float = 0.0, first_order_price_margin_in_profits_with_fees: float = 0.0):
+
+        self.symbol = symbol
+        self.start_currency = start_currency
+        self.dest_currency = dest_currency
+        self.start_amount = start_amount
+
+        self.profit = profit
+        self.profit_with_fee = profit_with_fee  # target profit considering commission
+        self.max_active_scalps = max_active_scalps
+
+        self.depth_step_in_profits = depth_step_in_profits
+        self.first_order_price_margin_in_profits_with_fees = first_order_price_margin_in_profits_with_fees
+
+        self.order1_side = ztom.core.get_order_type(start_currency, dest_currency, symbol)
+        self.tick_size = None  # prices of the ladder are rounded to the tick size if set
+        self.stale_canceled = set()  # ids of order 1 trade orders requested to cancel as stale
+
+        self.indicator = indicator
+        self.scalps = ScalpsCollection(max_active_scalps)
+
+        self.run = 1  # current run
+        self.scalps_added = 0  # scalps with order 1 complete
+
+        self.total_result = 0.0
+        self.total_cur1_diff = 0.0
+        self.total_cur2_diff = 0.0
+
+    @property
+    def id(self):
+        return "{} {}->{}".format(self.symbol, self.start_currency, self.dest_currency)
+
+    @property
+    def depth_step(self):
+        """
+        price step between the ladder levels relative to the price
+        """
+        return self.depth_step_in_profits * self.profit
+
+    def order1_price(self, ticker: dict, depth: int):
+        """
+        price of order 1 for the scalp on depth level: first level is shifted from the bid (for buy) or ask (for sell)
+        by margin in profits with fees and every next level is shifted by depth step in profits.
+        """
+        if self.order1_side == "buy":
+            return ticker["bid"] * (1 - self.profit_with_fee * self.first_order_price_margin_in_profits_with_fees
+                                    - (depth - 1) * self.depth_step_in_profits * self.profit)
+
+        return ticker["ask"] * (1 + self.profit_with_fee * self.first_order_price_margin_in_profits_with_fees
+                                + (depth - 1) * self.depth_step_in_profits * self.profit)
+
+    def profit_with_depth(self, depth: int):
+        """
+        target profit with fee for the scalp on depth level
+        """
+        return self.profit_with_fee + self.profit * self.depth_step_in_profits * (depth - 1)
+
+    def ladder(self, ticker: dict, depths: List[int]):
+        """
+        order 1 prices rounded to the tick size and target profits with fee for the depth levels
+
+        :return: tuple of lists of prices and profits
+        """
+        prices, profits = ladder(self.order1_side, ticker["bid"], ticker["ask"], self.profit, self.profit_with_fee,
+                                 self.depth_step_in_profits, self.first_order_price_margin_in_profits_with_fees,
+                                 depths, self.tick_size)
+        return prices.tolist(), profits.tolist()
+
+    def book_ladder(self, ticker: dict, depths: List[int], book: OrderBookIndex, wall_ratio: float,
+                    max_queue_ratio: float = 0.0):
+        """
+        ladder adjusted to the order book: levels are placed just ahead of the volume walls within the half of the depth
+        step before them and the levels behind more than max_queue_ratio of mean book level volumes are skipped.
+
+        :return: tuple of lists of depths, prices and profits of the levels to place
+        """
+        prices, profits = ladder(self.order1_side, ticker["bid"], ticker["ask"], self.profit, self.profit_with_fee,
+                                 self.depth_step_in_profits, self.first_order_price_margin_in_profits_with_fees,
+                                 depths, self.tick_size)
+
+        band = prices * self.depth_step_in_profits * self.profit / 2
+        prices, mask = book_ladder(prices, band, book, self.tick_size, wall_ratio, max_queue_ratio)
+
+        return [d for d, m in zip(depths, mask) if m], prices[mask].tolist(), profits[mask].tolist()
+
+    def stale_scalps(self, ticker: dict):
+        """
+        scalps in "order1" state with order 1 price behind the deepest level of the ladder from the current ticker
+        """
+        deepest_price = self.ladder(ticker, [max(1, self.max_active_scalps)])[0][0]
+
+        if self.order1_side == "buy":
+            return [s for s in self.scalps.scalps_in_state(ScalpState.ORDER1) if s.start_price < deepest_price]
+
+        return [s for s in self.scalps.scalps_in_state(ScalpState.ORDER1) if s.start_price > deepest_price]
+
+
 class ScalpBot(ztom.Bot):
 
     def __init__(self, default_config: str, log_filename=None):
@@ -191,6 +564,7 @@ class ScalpBot(ztom.Bot):
 
         self.om_proceed_sleep = 0.0
         self.symbol = ""
+        self.symbols = list()  # list of dicts with "symbol", "start_currency", "dest_currency" and optional overrides
         self.start_currency = ""
         self.dest_currency = ""
 
@@ -220,19 +594,331 @@ class ScalpBot(ztom.Bot):
         self.order2_max_updates_market = 0
         self.cancel_threshold = 0.0
 
+        self.batch_order_updates = True  # fetch open orders statuses by single request per symbol
+        self.batch_order_placement = True  # place new orders of the cycle in bulk
+        self.order_placement_workers = 8  # concurrent requests if exchange has no batch orders requests
+        self.cancel_stale_levels = False  # cancel order 1 of the levels left behind the ladder by the price move
+        # orders farther than order_refresh_near_levels depth steps from the market are updated every 2, 4, ... up to
+        # order_refresh_max_interval orders cycles
+        self.adaptive_order_refresh = True
+        self.order_refresh_near_levels = 2.0
+        self.order_refresh_max_interval = 16
+
+        self.order_book_ladder = False  # adjust the ladder levels to the order book volume walls and queue
+        self.order_book_limit = 20  # levels of the order book to fetch
+        self.order_book_max_age = 1.0  # seconds, order book is fetched at most once per this time
+        self.order_book_wall_ratio = 3.0  # min volume of the wall in mean order book level volumes
+        self.order_book_max_queue_ratio = 0.0  # skip levels with more volume ahead (in mean level volumes), 0 - off
+        self.order_books = None  # type: OrderBookCache
+
+        self.recovery_enabled = False  # hand stalled order 2 over to the recovery worker
+        self.recovery_server = {"host": "localhost", "port": 8080}
+        self.recovery_handoff_updates = 45  # order 2 updates before the handoff
+        self.recovery_retry_interval = 30.0  # seconds without handoffs after the worker was not reachable
+        self.recovery_max_requests_per_lap = 0  # requests budget of the recovery worker, max_requests_per_lap if 0
+        self.recovery_client = None  # type: RecoveryClient
+
+        self.journal_enabled = True  # journal and snapshots of the lanes state for restart
+        self.journal_snapshot_interval = 60.0  # seconds
+        self.journal_size = 4194304  # initial size of the journal file
+        self.journal = None  # type: ScalpJournal
+
+        # "polling" by fetch_tickers, "stream" from the feed adapter or "hub" from the market data hub. Stream and hub
+        # feeds fall back to polling while not available
+        self.feed_mode = "polling"
+        self.feed_server = {"host": "localhost", "port": 8765, "heartbeat_interval": 1.0}
+        self.feed_stale_timeout = 5.0  # seconds without stream messages before the fallback to polling
+        self.feed = None  # type: PollingFeed
+
+        self.hub = {"name": "scalp_hub", "feed_mode": "polling", "max_symbols": 64, "ring_size": 256,
+                    "markets_capacity": 16777216}
+        self.hub_symbols = list()  # symbols published by the hub in addition to the config lanes
+        self.hub_reader = None  # type: HubReader
+
+        self.markets_cache_enabled = True  # load markets from the local cache "_{exchange_id}/markets.bin"
+        self.markets_cache_max_age = 3600.0  # seconds, older cache is refreshed in background
+        self.markets_cache = None  # type: MarketsCache
+        self.markets_source = None  # "exchange", "cache" or "hub"
+
+        self.lazy_remote_reports = True  # init remote reports client on the first report
+        self._remote_reports_pending = False
+        self._remote_reports_lock = threading.Lock()
+
+        self.startup = StartupTimings()
+
+        self.profiling_enabled = False  # phases timers, latency histograms and requests per phase of the main loop
+        self.profiling_report_interval = 60.0  # seconds between the exported aggregates
+        self.profiling_signals = True  # SIGUSR1 toggles cProfile, SIGUSR2 dumps threads stacks
+        self.profiler = None  # type: PhaseProfiler
+        self.profile_signals = None  # type: ProfileSignals
+
+        self.lap_time = 60  # seconds
+        self.max_requests_per_lap = 0  # no requests scheduling if 0
+        self.requests_orders_reserve = 0.2  # share of requests per lap reserved for orders
+        self.request_scheduler = None  # type: RequestScheduler
+
+        self.hot_path_log_level = "INFO"  # min level of the trading loop messages
+        self.scalp_status_log_sample_rate = 1.0  # share of the scalps statuses to log
+        self._scalp_status_log_counter = 0
+
+        self.buffered_reports = True  # write reports by the background writer
+        self.reports_batch_size = 100
+        self.reports_flush_interval = 5.0  # seconds
+        self.report_writer = None  # type: ReportWriter
+
+        self.history_enabled = True  # closed scalps history store "_{exchange_id}/history"
+        self.history_segment_rows = 65536
+        self.history_flush_interval = 600.0  # seconds
+        self.history = None  # type: HistoryStore
+
+        # in-process exchange simulator instead of the exchange: orders are matched against the replayed tickers
+        self.simulator_enabled = False
+        self.simulator = {"markets_file": "test_data/markets_binance.json", "tickers_file": "test_data/tickers_many.csv",
+                          "seed": 0, "tick_interval": 1.0, "trade_ratio": 0.5, "level_volume": 10.0,
+                          "latency": {"default": [0.05, 0.05]}, "errors": {"default": 0.0}, "realtime": False}
+
+        self.data_dir = ""  # directory of the journal, history, reports and markets cache, "_{exchange_id}" if empty
+
+        self.health_report_interval = 10.0  # seconds between the health points of the lanes
+        self.health_sink = None  # function of the health point, e.g. set by the shards supervisor
+        self.last_health_report_time = 0.0
+
         self.offline_tickers_file = "test_data/tickers_many.csv"
 
+    def data_path(self, *names: str):
+        """
+        :return: path of the bot's file (or the directory itself) in the data_dir
+        """
+        return os.path.join(self.data_dir or "_{}".format(self.exchange_id), *names)
+
+    def init_exchange(self):
+        """
+        inits exchange. If max_requests_per_lap is set all the exchange requests are taken through the requests
+        scheduler (not in offline mode).
+        """
+        super(ScalpBot, self).init_exchange()
+
+        if self.simulator_enabled and not self.offline:
+            from scalp_simulator import SimulatedExchange
+            params = dict(self.simulator)
+            self.exchange._ccxt = SimulatedExchange.from_files(params.pop("markets_file"), params.pop("tickers_file"),
+                                                               exchange_id=self.exchange_id, **params)
+            self.log(self.LOG_INFO, "Exchange simulator: {}".format(self.simulator))
+
+        if self.max_requests_per_lap > 0 and not self.offline:
+            self.request_scheduler = RequestScheduler(self.max_requests_per_lap, self.lap_time,
+                                                      self.requests_orders_reserve)
+            self.exchange = ThrottledExchange(self.exchange, self.request_scheduler)
+
+    def cycle_sleep(self):
+        """
+        sleep time after the main loop cycle: om_proceed_sleep or less if there is spare requests budget
+        """
+        if self.request_scheduler is None:
+            return self.om_proceed_sleep
+
+        return self.request_scheduler.cycle_sleep(self.om_proceed_sleep)
+
+    def init_order_books(self):
+        if self.order_book_ladder and not self.offline:
+            self.order_books = OrderBookCache(self.exchange.fetch_order_book, int(self.order_book_limit),
+                                              self.order_book_max_age)
+
+    def init_profiler(self):
+        """
+        inits the main loop profiler if profiling_enabled is set: exchange requests are counted per phase
+        """
+        if not self.profiling_enabled:
+            return
+
+        self.profiler = PhaseProfiler()
+        self.exchange = ProfiledExchange(self.exchange, self.profiler)
+
+        if self.profiling_signals:
+            self.profile_signals = ProfileSignals(self.data_path(),
+                                                  lambda msg: self.log(self.LOG_INFO, msg))
+            self.profile_signals.install()
+
+    def profile(self, phase: str):
+        """
+        context manager timing the phase of the main loop, does nothing if profiling is off
+        """
+        if self.profiler is None:
+            return NO_PHASE
+        return self.profiler.phase(phase)
+
+    def init_hub_reader(self):
+        if self.feed_mode != "hub" or self.offline:
+            return
+
+        try:
+            from scalp_hub import HubReader
+            self.hub_reader = HubReader(self.hub["name"]).attach()
+        except (FileNotFoundError, ValueError) as e:
+            self.log(self.LOG_ERROR, "Market data hub {} is not available: {} {}".format(self.hub["name"],
+                                                                                         type(e).__name__, e.args))
+
+    def load_markets_from_hub(self):
+        """
+        takes the markets from the market data hub instead of requesting the exchange
+        :return: True if the markets were loaded
+        """
+        markets = self.hub_reader.markets() if self.hub_reader is not None else None
+        if not markets:
+            return False
+
+        self.set_markets(markets, "hub")
+        return True
+
+    def set_markets(self, markets: dict, source: str):
+        """
+        sets the markets loaded not from the exchange to the bot and to the exchange, so it does not load them on the
+        first request
+
+        :param source: "hub", "cache" or "exchange"
+        """
+        self.markets = markets
+        self.markets_source = source
+        ccxt = getattr(self.exchange, "_ccxt", None)
+        if ccxt is not None and hasattr(ccxt, "set_markets"):
+            ccxt.set_markets(list(markets.values()))
+
+    def load_markets(self):
+        """
+        loads markets from the local cache if it's enabled and valid, the cache older than markets_cache_max_age is
+        refreshed in background. Otherwise markets are loaded from the exchange and saved to the cache.
+        """
+        if not self.markets_cache_enabled or self.offline or self.simulator_enabled:
+            self.markets_source = "exchange"
+            return super(ScalpBot, self).load_markets()
+
+        self.markets_cache = MarketsCache(self.data_path("markets.bin"), self.exchange_id)
+        cached = self.markets_cache.load()
+
+        if cached is None:
+            result = super(ScalpBot, self).load_markets()
+            self.markets_source = "exchange"
+            self.markets_cache.save(self.markets)
+            return result
+
+        markets, saved_time = cached
+        self.set_markets(markets, "cache")
+
+        if time.time() - saved_time > self.markets_cache_max_age:
+            threading.Thread(target=self.refresh_markets, name="MarketsRefresh", daemon=True).start()
+
+        return markets
+
+    def refresh_markets(self):
+        """
+        loads the markets from the exchange and updates the cache
+        """
+        try:
+            super(ScalpBot, self).load_markets()
+            self.markets_source = "exchange"
+            self.markets_cache.save(self.markets)
+            self.log(self.LOG_INFO, "Markets cache refreshed: {} markets".format(len(self.markets)))
+
+        except Exception as e:
+            self.log(self.LOG_ERROR, "Error while refreshing markets cache: {} {}".format(type(e).__name__, e.args))
+
+    def init_remote_reports(self):
+        """
+        inits remote reports. If lazy_remote_reports is set the reports client (and its imports) is inited on the first
+        report.
+        """
+        if not self.lazy_remote_reports:
+            return super(ScalpBot, self).init_remote_reports()
+
+        self._remote_reports_pending = True
+
+    def send_remote_report(self, report):
+        if self._remote_reports_pending:
+            with self._remote_reports_lock:
+                if self._remote_reports_pending:
+                    super(ScalpBot, self).init_remote_reports()
+                    self._remote_reports_pending = False
+
+        return super(ScalpBot, self).send_remote_report(report)
+
+    def init_recovery_client(self):
+        if self.recovery_enabled and not self.offline:
+            from scalp_recovery import RecoveryClient
+            self.recovery_client = RecoveryClient(self.recovery_server["host"], self.recovery_server["port"],
+                                                  retry_interval=self.recovery_retry_interval)
+
+    def init_report_writer(self):
+        """
+        opens the closed scalps history store if history_enabled is set and starts background report writer if
+        buffered_reports is set. Reports are appended to the history by the report writer or by the trading loop if
+        there is no writer.
+        """
+        if self.history_enabled and not self.offline:
+            self.history = HistoryStore(self.data_path("history"),
+                                        int(self.history_segment_rows), self.history_flush_interval).open()
+
+        if not self.buffered_reports:
+            return
+
+        self.report_writer = ReportWriter(self, self.data_path(), self.reports_batch_size,
+                                          self.reports_flush_interval, getattr(self, "influxdb", None), self.history)
+        self.report_writer.start()
+
+    def stop_report_writer(self):
+        if self.report_writer is not None:
+            self.report_writer.stop()
+
+        if self.history is not None:
+            self.history.close()
+
+    def logger_enabled(self, level: int):
+        logger = getattr(self, "logger", None)
+        return logger is None or logger.isEnabledFor(level)
+
+    def log_enabled(self, level: int):
+        """
+        checks if the trading loop (hot path) message of the level should be logged: level is not less than
+        hot_path_log_level and bot's logger is enabled for it
+        """
+        hot_path_level = self.hot_path_log_level if isinstance(self.hot_path_log_level, int) \
+            else logging.getLevelName(str(self.hot_path_log_level).upper())
+
+        if isinstance(hot_path_level, int) and level < hot_path_level:
+            return False
+
+        return self.logger_enabled(level)
+
+    def hot_log(self, level: int, msg: str, *args):
+        """
+        logs the trading loop message. Message is formatted with args only if it's going to be logged.
+        """
+        if self.log_enabled(level):
+            self.log(level, msg.format(*args) if len(args) > 0 else msg)
+
+    def scalp_status_log_sampled(self):
+        """
+        checks if current scalp status should be logged according to scalp_status_log_sample_rate
+        """
+        if self.scalp_status_log_sample_rate <= 0:
+            return False
+
+        self._scalp_status_log_counter += 1
+        return self._scalp_status_log_counter % max(1, int(round(1 / self.scalp_status_log_sample_rate))) == 0
+
     def log_report(self, report):
+        if not self.log_enabled(self.LOG_INFO):
+            return
+
         for r in self.report_fields:
             self.log(self.LOG_INFO, "{} = {}".format(r, report[r] if r in report else "None"))
 
     def save_csv_report(self, report: dict, filename: str = "report.csv"):
         write_header = False
-        file_deals = "_{}/{}".format(self.exchange_id, filename)
+        file_deals = self.data_path(filename)
 
         directory = os.path.dirname(file_deals)
         if not os.path.isdir(directory):
-            os.mkdir(directory)
+            os.makedirs(directory)
 
         if not os.path.isfile(file_deals):
             write_header = True
@@ -254,3 +940,42 @@ class ScalpBot(ztom.Bot):
 
         # self.profit / ((1 - self.commission) ** 2)
         return t_p
+
+    def create_scalp_lanes(self) -> List[ScalpLane]:
+        """
+        creates scalp lanes from the "symbols" config list. Every list item should contain "symbol",
+        "start_currency" and "dest_currency" and could override "start_amount", "profit", "max_active_scalps",
+        "depth_step_in_profits" and "first_order_price_margin_in_profits_with_fees".
+        If "symbols" is not set the single lane is created from the "symbol", "start_currency" and "dest_currency"
+        config parameters.
+
+        :return: list of ScalpLane
+        """
+        lanes_config = self.symbols if len(self.symbols) > 0 else [{"symbol": self.symbol,
+                                                                      "start_currency": self.start_currency,
+                                                                      "dest_currency": self.dest_currency}]
+        lanes = list()
+        markets = getattr(self, "markets", None) or dict()
+        precision_mode = getattr(getattr(getattr(self, "exchange", None), "_ccxt", None), "precisionMode", None)
+
+        for lane_config in lanes_config:
+            profit = lane_config.get("profit", self.profit)
+
+            indicator = TickerMAIndicator(self.ma_short_window, self.ma_long_window,
+                                          self.ma_long_window + self.ma_count)
+
+            lane = ScalpLane(lane_config["symbol"], lane_config["start_currency"],
+                             lane_config["dest_currency"],
+                             lane_config.get("start_amount", self.start_amount),
+                             profit,
+                             self.target_single_order_profit(profit, self.commission),
+                             lane_config.get("max_active_scalps", self.max_active_scalps),
+                             indicator,
+                             lane_config.get("depth_step_in_profits", self.depth_step_in_profits),
+                             lane_config.get("first_order_price_margin_in_profits_with_fees",
+                                             self.first_order_price_margin_in_profits_with_fees))
+
+            lane.tick_size = market_tick_size(markets.get(lane.symbol), precision_mode)
+            lanes.append(lane)
+
+        return lanes
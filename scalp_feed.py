@@ -0,0 +1,346 @@
+"""
+Tickers feeds of the bot. Polling feed requests tickers by REST fetch_tickers every cycle. Stream feed receives best
+bid/ask pushed by the local feed adapter (exchange websocket behind FeedServer) as soon as they change, so the lanes
+are proceeded on every change instead of once per cycle. Fallback feed uses the stream while it's alive and switches to
+polling otherwise.
+
+Stream protocol: newline delimited json over tcp. Client sends {"subscribe": [symbols]} and the server pushes
+{"symbol": ..., "bid": ..., "ask": ..., "timestamp": ...} on every change and {"heartbeat": time} every heartbeat
+interval, so the stream of the quiet market is still healthy.
+
+Usage of the adapter (requires ccxt.pro):
+    python3 scalp_feed.py [--config _config_default.json]
+"""
+import json
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+class PollingFeed(object):
+
+    def __init__(self, fetch_tickers: Callable[[List[str]], dict]):
+        """
+        :param fetch_tickers: function requesting the tickers of the symbols
+        """
+        self.fetch_tickers = fetch_tickers
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_tickers(self, symbols: List[str]):
+        return self.fetch_tickers(symbols)
+
+    def wait(self, timeout: float):
+        """
+        waits for the next tickers: polling feed just sleeps
+        """
+        time.sleep(timeout)
+
+
+class StreamFeed(object):
+    """
+    Client of the feed server. Keeps the last ticker of every symbol, reconnects if connection is lost.
+    """
+
+    def __init__(self, host: str, port: int, symbols: List[str], stale_timeout: float = 5.0,
+                 reconnect_interval: float = 1.0):
+        """
+        :param stale_timeout: feed is not healthy if there were no messages for stale_timeout seconds
+        """
+        self.host = host
+        self.port = port
+        self.symbols = symbols
+        self.stale_timeout = stale_timeout
+        self.reconnect_interval = reconnect_interval
+
+        self.connected = False
+        self.last_message_time = 0.0
+        self.messages = 0
+        self.heartbeats = 0
+        self.reconnects = 0
+
+        self._tickers = dict()  # type: Dict[str, dict]
+        self._changed = set()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._socket = None  # type: socket.socket
+        self._thread = None  # type: threading.Thread
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="StreamFeed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._socket is not None:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        if self._thread is not None:
+            self._thread.join(self.reconnect_interval + 1)
+            self._thread = None
+
+    def healthy(self):
+        return self.connected and time.monotonic() - self.last_message_time < self.stale_timeout
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._socket = socket.create_connection((self.host, self.port), self.reconnect_interval)
+                self._socket.settimeout(None)
+                self._socket.sendall((json.dumps({"subscribe": self.symbols}) + "\n").encode())
+                self.connected = True
+                self.last_message_time = time.monotonic()
+
+                with self._socket.makefile("r") as f:
+                    for line in f:
+                        self.on_message(json.loads(line))
+
+            except (OSError, ValueError):
+                pass
+
+            finally:
+                self.connected = False
+                if self._socket is not None:
+                    self._socket.close()
+                    self._socket = None
+
+            if not self._stop.wait(self.reconnect_interval):
+                self.reconnects += 1
+
+    def on_message(self, message: dict):
+        with self._condition:
+            self.last_message_time = time.monotonic()
+            if "heartbeat" in message:
+                self.heartbeats += 1
+                return
+
+            self._tickers[message["symbol"]] = {"ask": message["ask"], "bid": message["bid"],
+                                                "timestamp": message.get("timestamp")}
+            self._changed.add(message["symbol"])
+            self.messages += 1
+            self._condition.notify_all()
+
+    def get_tickers(self, symbols: List[str]):
+        """
+        :return: tickers of the symbols which were changed since the last call
+        """
+        with self._condition:
+            tickers = {s: self._tickers[s] for s in self._changed if s in symbols}
+            self._changed = set()
+        return tickers
+
+    def wait(self, timeout: float):
+        """
+        waits for the ticker change or timeout
+        """
+        with self._condition:
+            if len(self._changed) == 0:
+                self._condition.wait(timeout)
+
+
+class FallbackFeed(object):
+    """
+    Stream feed while it's healthy and polling feed otherwise
+    """
+
+    def __init__(self, stream: StreamFeed, polling: PollingFeed, on_switch: Callable[[str], None] = None):
+        """
+        :param on_switch: called with the name of the feed ("stream" or "polling") on switch
+        """
+        self.stream = stream
+        self.polling = polling
+        self.on_switch = on_switch
+        self.mode = None
+        self.switches = 0
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+
+    def _current(self):
+        mode = "stream" if self.stream.healthy() else "polling"
+        if mode != self.mode:
+            if self.mode is not None:
+                self.switches += 1
+            self.mode = mode
+            if self.on_switch is not None:
+                self.on_switch(mode)
+
+        return self.stream if mode == "stream" else self.polling
+
+    def get_tickers(self, symbols: List[str]):
+        return self._current().get_tickers(symbols)
+
+    def wait(self, timeout: float):
+        self._current().wait(timeout)
+
+
+class _FeedHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server.feed_server  # type: FeedServer
+        try:
+            subscription = json.loads(self.rfile.readline().decode())
+        except ValueError:
+            return
+
+        client = server.add_client(self.connection, self.wfile, subscription.get("subscribe", list()))
+        try:
+            self.rfile.read()  # until the client disconnects
+        except OSError:
+            pass
+        finally:
+            server.remove_client(client)
+
+
+class _FeedTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True  # adapter restarts on the same port
+    daemon_threads = True
+
+
+class FeedServer(object):
+    """
+    Pushes best bid/ask to the subscribed stream feeds. Fed by the exchange's websocket in the adapter or directly
+    in tests.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 0, heartbeat_interval: float = 1.0):
+        """
+        :param port: port to listen, 0 for any free port
+        :param heartbeat_interval: seconds between the heartbeats to all the clients, no heartbeats if 0
+        """
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+
+        self._clients = list()
+        self._lock = threading.Lock()
+        self._server = None  # type: _FeedTCPServer
+        self._stop = threading.Event()
+
+    def start(self):
+        self._server = _FeedTCPServer((self.host, self.port), _FeedHandler)
+        self._server.feed_server = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="FeedServer", daemon=True).start()
+
+        self._stop.clear()
+        if self.heartbeat_interval > 0:
+            threading.Thread(target=self._heartbeats, name="FeedServerHeartbeat", daemon=True).start()
+
+    def _heartbeats(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+        with self._lock:
+            for connection, wfile, symbols in self._clients:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._clients = list()
+
+    def add_client(self, connection: socket.socket, wfile, symbols: List[str]):
+        client = (connection, wfile, set(symbols))
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def remove_client(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def clients_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def publish(self, symbol: str, bid: float, ask: float, timestamp: int = None):
+        line = (json.dumps({"symbol": symbol, "bid": bid, "ask": ask, "timestamp": timestamp}) + "\n").encode()
+        self._send(line, symbol)
+
+    def heartbeat(self):
+        """
+        tells the clients the adapter is alive while the market does not change
+        """
+        self._send((json.dumps({"heartbeat": time.time()}) + "\n").encode())
+
+    def _send(self, line: bytes, symbol: str = None):
+        """
+        :param symbol: sent to the clients subscribed to the symbol, to all if None
+        """
+        with self._lock:
+            clients = list(self._clients)
+
+        for client in clients:
+            if symbol is not None and symbol not in client[2]:
+                continue
+            try:
+                client[1].write(line)
+                client[1].flush()
+            except (OSError, ValueError):
+                self.remove_client(client)
+
+
+async def watch_tickers(exchange, symbol: str, feed_server: FeedServer):
+    last = None
+    while True:
+        ticker = await exchange.watch_ticker(symbol)
+        if (ticker["bid"], ticker["ask"]) != last:
+            last = (ticker["bid"], ticker["ask"])
+            feed_server.publish(symbol, ticker["bid"], ticker["ask"], ticker.get("timestamp"))
+
+
+if __name__ == "__main__":
+    import asyncio
+    from scalp_bot import ScalpBot
+
+    bot = ScalpBot("_config_default.json", "scalp_feed.log")
+    bot.set_from_cli(sys.argv[1:])
+    bot.load_config_from_file(bot.config_filename)
+
+    try:
+        import ccxt.pro as ccxt_pro
+    except ImportError:
+        bot.log(bot.LOG_ERROR, "ccxt.pro is required for the feed adapter")
+        sys.exit(1)
+
+    symbols = [s["symbol"] for s in bot.symbols] if len(bot.symbols) > 0 else [bot.symbol]
+    server = FeedServer(bot.feed_server["host"], bot.feed_server["port"],
+                        bot.feed_server.get("heartbeat_interval", 1.0))
+    server.start()
+    bot.log(bot.LOG_INFO, "Feed server is listening on {}:{} for {}".format(server.host, server.port, symbols))
+
+    async def main():
+        exchange = getattr(ccxt_pro, bot.exchange_id)()
+        try:
+            await asyncio.gather(*[watch_tickers(exchange, symbol, server) for symbol in set(symbols)])
+        finally:
+            await exchange.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        server.stop()
+
+    sys.exit(0)
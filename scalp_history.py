@@ -0,0 +1,453 @@
+"""
+Columnar store of the closed scalps history: every closed scalp report (with its order legs fill and status) is
+appended as a row to the in-memory buffer which is written as an immutable segment of numpy columns when it's full,
+on flush interval or on close. String columns (symbol, side, states) are dictionary encoded. Segments keep the time
+range and symbols, so queries skip the segments out of the time range and map only the columns they need.
+
+Usage:
+    python3 scalp_history.py import _binance/*.csv [--history _binance/history]
+    python3 scalp_history.py query --by depth,side [--days 7] [--symbol ETH/BTC] [--delta-bucket 0.001]
+"""
+import argparse
+import csv
+import datetime
+import glob
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import time
+import numpy as np
+from typing import Dict, List
+
+HISTORY_VERSION = 1
+
+# column: numpy dtype or "cat" for the dictionary encoded strings
+COLUMNS = {"time": "f8",  # time created, unix timestamp
+           "symbol": "cat",
+           "side": "cat",  # order 1 side
+           "depth": "i4",
+           "state": "cat",
+           "start_qty": "f8",
+           "ticker_price": "f8",
+           "ma_delta": "f8",  # ma_short_long_rel_delta
+           "result": "f8",  # result-fact-diff
+           "cur1_diff": "f8",
+           "cur2_diff": "f8",
+           "leg1_filled": "f8",  # filled share, nan if no order
+           "leg1_status": "cat",
+           "leg1_updates": "i4",  # -1 if no order
+           "leg2_filled": "f8",
+           "leg2_status": "cat",
+           "leg2_updates": "i4"}
+
+# column: report field
+REPORT_FIELDS = {"symbol": "symbol", "side": "order1_side", "depth": "depth", "state": "state",
+                 "start_qty": "start-qty", "ticker_price": "ticker_price", "ma_delta": "ma_short_long_rel_delta",
+                 "result": "result-fact-diff", "cur1_diff": "cur1-diff", "cur2_diff": "cur2-diff",
+                 "leg1_filled": "leg1-filled", "leg1_status": "leg1-order-status", "leg1_updates": "leg1-order-updates",
+                 "leg2_filled": "leg2-filled", "leg2_status": "leg2-order-status",
+                 "leg2_updates": "leg2-order1-updates"}
+
+# group by keys: columns and virtual ones
+GROUP_KEYS = ("symbol", "side", "depth", "state", "leg1_status", "leg2_status", "delta_bucket", "day")
+
+
+def report_time(report: dict):
+    value = report.get("time_created_utc")
+    if isinstance(value, datetime.datetime):
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    elif value:
+        value = datetime.datetime.fromisoformat(str(value)).replace(tzinfo=datetime.timezone.utc)
+    else:
+        return time.time()
+    return value.timestamp()
+
+
+def _number(value, default):
+    if value is None or value == "":
+        return default
+    return float(value)
+
+
+class HistoryStore(object):
+
+    MAX_DIRECT_GROUPS = 1 << 22  # groups are counted by their ids directly if the ids space is not larger
+
+    def __init__(self, directory: str, segment_rows: int = 65536, flush_interval: float = 600.0):
+        """
+        :param directory: store directory
+        :param segment_rows: rows of the buffer written as one segment
+        :param flush_interval: seconds after the first buffered row the buffer is written even if not full
+        """
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.flush_interval = flush_interval
+
+        self.dictionary = {c: list() for c, t in COLUMNS.items() if t == "cat"}  # type: Dict[str, List[str]]
+        self._codes = {c: dict() for c in self.dictionary}  # type: Dict[str, Dict[str, int]]
+        self.segments = list()  # type: List[dict]
+        self.imported = dict()  # type: Dict[str, int]  # csv file: byte offset of the imported lines
+
+        self._buffer = {c: list() for c in COLUMNS}
+        self._buffer_start = None
+        self._next_segment = 0
+
+    @property
+    def segments_directory(self):
+        return os.path.join(self.directory, "segments")
+
+    def open(self):
+        if not os.path.isdir(self.segments_directory):
+            os.makedirs(self.segments_directory)
+
+        state_file = os.path.join(self.directory, "store.json")
+        if os.path.isfile(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            if state.get("version") != HISTORY_VERSION:
+                raise ValueError("History store version {} is not supported".format(state.get("version")))
+
+            self.dictionary = state["dictionary"]
+            self._codes = {c: {v: i for i, v in enumerate(values)} for c, values in self.dictionary.items()}
+            self.imported = state.get("imported", dict())
+
+        self.segments = list()
+        names = sorted(os.listdir(self.segments_directory))
+        self._next_segment = int(names[-1]) + 1 if len(names) > 0 else 0
+
+        for name in names:
+            meta_file = os.path.join(self.segments_directory, name, "meta.json")
+            if os.path.isfile(meta_file):  # segments being written have no meta yet
+                with open(meta_file) as f:
+                    meta = json.load(f)
+                meta["name"] = name
+                self.segments.append(meta)
+
+        return self
+
+    def close(self):
+        self.flush()
+
+    def _write_state(self):
+        tmp_file = os.path.join(self.directory, "store.json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({"version": HISTORY_VERSION, "dictionary": self.dictionary, "imported": self.imported}, f)
+        os.replace(tmp_file, os.path.join(self.directory, "store.json"))
+
+    def code(self, column: str, value):
+        value = "" if value is None else str(value)
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.dictionary[column])
+            self.dictionary[column].append(value)
+        return code
+
+    @property
+    def buffered_rows(self):
+        return len(self._buffer["time"])
+
+    @property
+    def rows(self):
+        return sum([s["rows"] for s in self.segments]) + self.buffered_rows
+
+    def append_report(self, report: dict):
+        """
+        appends the closed scalp report (as made by report_close_scalp or read from the reports csv)
+        """
+        buffer = self._buffer
+        buffer["time"].append(report_time(report))
+
+        for column, field in REPORT_FIELDS.items():
+            value = report.get(field)
+            kind = COLUMNS[column]
+            if kind == "cat":
+                buffer[column].append(self.code(column, value))
+            elif kind == "i4":
+                buffer[column].append(int(_number(value, -1)))
+            else:
+                buffer[column].append(_number(value, math.nan))
+
+        if self._buffer_start is None:
+            self._buffer_start = time.monotonic()
+
+        if self.buffered_rows >= self.segment_rows or time.monotonic() - self._buffer_start >= self.flush_interval:
+            self.flush()
+
+    def append_reports(self, reports: List[dict]):
+        for report in reports:
+            self.append_report(report)
+
+    def flush(self):
+        """
+        writes the buffered rows as the new segment
+        """
+        if self.buffered_rows == 0:
+            return
+
+        columns = {c: np.asarray(values, dtype="i4" if COLUMNS[c] == "cat" else COLUMNS[c])
+                   for c, values in self._buffer.items()}
+        self._write_segment(columns)
+
+        self._buffer = {c: list() for c in COLUMNS}
+        self._buffer_start = None
+
+    def _write_segment(self, columns: Dict[str, np.ndarray]):
+        self._write_state()  # dictionary first: segment codes should be always decodable
+
+        name = "{:08d}".format(self._next_segment)
+        self._next_segment += 1
+        segment_dir = os.path.join(self.segments_directory, name)
+        os.makedirs(segment_dir)
+
+        for column, values in columns.items():
+            np.save(os.path.join(segment_dir, column + ".npy"), values)
+
+        meta = {"rows": int(len(columns["time"])), "time_min": float(columns["time"].min()),
+                "time_max": float(columns["time"].max()),
+                "symbols": sorted(set(int(s) for s in np.unique(columns["symbol"])))}
+
+        with open(os.path.join(segment_dir, "meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(segment_dir, "meta.json.tmp"), os.path.join(segment_dir, "meta.json"))
+
+        meta["name"] = name
+        self.segments.append(meta)
+
+    def compact(self):
+        """
+        rewrites the small segments into the segments of segment_rows
+        """
+        self.flush()
+        if len(self.segments) <= 1:
+            return
+
+        old_segments = self.segments
+        columns = self.columns(list(COLUMNS.keys()))
+        self.segments = list()
+
+        order = np.argsort(columns["time"], kind="stable")
+        for start in range(0, len(order), self.segment_rows):
+            part = order[start:start + self.segment_rows]
+            self._write_segment({c: values[part] for c, values in columns.items()})
+
+        for segment in old_segments:
+            shutil.rmtree(os.path.join(self.segments_directory, segment["name"]))
+
+    def _load_column(self, segment: dict, column: str):
+        return np.load(os.path.join(self.segments_directory, segment["name"], column + ".npy"), mmap_mode="r")
+
+    def columns(self, names: List[str], since: float = None, until: float = None, symbols: List[str] = None):
+        """
+        columns of the rows in the time range and of the symbols, buffered rows included
+
+        :param since: unix timestamp, inclusive
+        :param until: unix timestamp, exclusive
+        :return: dict of column name and np.ndarray
+        """
+        names = list(dict.fromkeys(["time", "symbol"] + list(names)))
+        symbol_codes = None
+        if symbols is not None:
+            symbol_codes = [self._codes["symbol"][s] for s in symbols if s in self._codes["symbol"]]
+
+        parts = {c: list() for c in names}
+
+        for segment in self.segments:
+            if since is not None and segment["time_max"] < since or until is not None and segment["time_min"] >= until \
+                    or symbol_codes is not None and not set(symbol_codes) & set(segment["symbols"]):
+                continue
+            for c in names:
+                parts[c].append(self._load_column(segment, c))
+
+        if self.buffered_rows > 0:
+            for c in names:
+                parts[c].append(np.asarray(self._buffer[c], dtype="i4" if COLUMNS[c] == "cat" else COLUMNS[c]))
+
+        columns = {c: np.concatenate(parts[c]) if len(parts[c]) > 0
+                   else np.zeros(0, dtype="i4" if COLUMNS[c] == "cat" else COLUMNS[c]) for c in names}
+
+        mask = np.ones(len(columns["time"]), dtype=bool)
+        if since is not None:
+            mask &= columns["time"] >= since
+        if until is not None:
+            mask &= columns["time"] < until
+        if symbol_codes is not None:
+            mask &= np.isin(columns["symbol"], symbol_codes)
+
+        if not mask.all():
+            columns = {c: values[mask] for c, values in columns.items()}
+        return columns
+
+    def aggregate(self, by: List[str], since: float = None, until: float = None, symbols: List[str] = None,
+                  delta_bucket: float = 0.001):
+        """
+        aggregates of the closed scalps grouped by the keys: symbol, side, depth, state, leg1_status, leg2_status,
+        delta_bucket (ma_short_long_rel_delta rounded down to delta_bucket) and day (utc date)
+
+        :return: list of dicts with the group keys values, count, result sum and mean, currencies diffs sums and legs
+        filled shares means, sorted by the group keys
+        """
+        for key in by:
+            if key not in GROUP_KEYS:
+                raise ValueError("Unknown group key {}, should be one of {}".format(key, GROUP_KEYS))
+
+        names = [k for k in by if k in COLUMNS] + ["ma_delta", "result", "cur1_diff", "cur2_diff", "leg1_filled",
+                                                   "leg2_filled"]
+        columns = self.columns(names, since, until, symbols)
+        rows = len(columns["time"])
+        if rows == 0:
+            return list()
+
+        # group id of every row: mixed radix of the keys' offsets from their min values
+        group_ids = np.zeros(rows, dtype=np.int64)
+        key_ranges = list()
+        for key in by:
+            if key == "delta_bucket":
+                raw = np.floor(np.nan_to_num(columns["ma_delta"]) / delta_bucket).astype(np.int64)
+            elif key == "day":
+                raw = np.floor(columns["time"] / 86400).astype(np.int64)
+            else:
+                raw = columns[key].astype(np.int64)
+            low, size = int(raw.min()), int(raw.max() - raw.min()) + 1
+            group_ids = group_ids * size + (raw - low)
+            key_ranges.append((low, size))
+
+        groups_space = int(np.prod([size for low, size in key_ranges]))
+        direct = groups_space <= self.MAX_DIRECT_GROUPS
+        if direct:
+            # ids are small: sums by ids directly, without sorting
+            inverse = group_ids
+            counts = np.bincount(inverse, minlength=groups_space)
+            groups = np.nonzero(counts)[0]
+        else:
+            groups, inverse = np.unique(group_ids, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(groups))
+            groups_space = len(groups)
+
+        def sums(values):
+            valid = ~np.isnan(values)
+            if valid.all():
+                return np.bincount(inverse, values, groups_space), counts
+            return np.bincount(inverse[valid], values[valid], groups_space), \
+                np.bincount(inverse[valid], minlength=groups_space)
+
+        result_sum, result_n = sums(columns["result"])
+        cur1_sum, _ = sums(columns["cur1_diff"])
+        cur2_sum, _ = sums(columns["cur2_diff"])
+        leg1_sum, leg1_n = sums(columns["leg1_filled"])
+        leg2_sum, leg2_n = sums(columns["leg2_filled"])
+
+        index = groups if direct else np.arange(len(groups))  # positions of the groups in the sums
+
+        aggregates = list()
+        for g, group_id in zip(index.tolist(), groups.tolist()):
+            record = dict()
+            for key, (low, size) in reversed(list(zip(by, key_ranges))):
+                value = low + group_id % size
+                group_id //= size
+                if key == "delta_bucket":
+                    record[key] = round(float(value) * delta_bucket, 12)
+                elif key == "day":
+                    day = datetime.datetime.fromtimestamp(int(value) * 86400, datetime.timezone.utc)
+                    record[key] = day.strftime("%Y-%m-%d")
+                elif COLUMNS[key] == "cat":
+                    record[key] = self.dictionary[key][int(value)]
+                else:
+                    record[key] = int(value)
+
+            record = {k: record[k] for k in by}
+            record["count"] = int(counts[g])
+            record["result_sum"] = float(result_sum[g])
+            record["result_mean"] = float(result_sum[g] / result_n[g]) if result_n[g] > 0 else math.nan
+            record["cur1_diff_sum"] = float(cur1_sum[g])
+            record["cur2_diff_sum"] = float(cur2_sum[g])
+            record["leg1_filled_mean"] = float(leg1_sum[g] / leg1_n[g]) if leg1_n[g] > 0 else math.nan
+            record["leg2_filled_mean"] = float(leg2_sum[g] / leg2_n[g]) if leg2_n[g] > 0 else math.nan
+            aggregates.append(record)
+
+        return aggregates
+
+    def import_csv(self, filenames: List[str]):
+        """
+        imports the closed scalps reports csv files (daily files of the report writer or per scalp files of
+        save_csv_report). The importer is meant for the reports written before the store existed or while the history
+        was disabled: reports of the bot with the history enabled are already appended to the store live and would be
+        duplicated by the import.
+
+        The byte offset of the last complete imported line is kept per file, so a file which grew since the last
+        import (e.g. today's daily file) is imported from that offset only. A file which became smaller than the
+        offset is considered to be a new one and imported from the start.
+
+        :return: number of imported rows
+        """
+        imported_rows = 0
+        for filename in filenames:
+            key = os.path.abspath(filename)
+            offset = self.imported.get(key, 0)
+            if os.path.getsize(filename) < offset:
+                offset = 0
+
+            with open(filename, "rb") as f:
+                header = f.readline()
+                if offset > 0:
+                    f.seek(offset)
+                else:
+                    offset = f.tell()
+                data = f.read()
+
+            data = data[:data.rfind(b"\n") + 1]  # the last line could be written at the moment
+            fieldnames = next(csv.reader([header.decode("utf-8")]), None)
+            if fieldnames and data:
+                for row in csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames):
+                    if "scalp-id" not in row or not row.get("symbol"):
+                        continue
+                    self.append_report(row)
+                    imported_rows += 1
+
+            self.imported[key] = offset + len(data)
+
+        self.flush()
+        self._write_state()
+        return imported_rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Closed scalps history store")
+    parser.add_argument("command", choices=["import", "query", "compact"])
+    parser.add_argument("files", nargs="*", help="reports csv files or glob patterns to import")
+    parser.add_argument("--history", default="_binance/history", help="history store directory")
+    parser.add_argument("--by", default="depth", help="comma separated group keys: {}".format(",".join(GROUP_KEYS)))
+    parser.add_argument("--days", type=float, default=None, help="last days only")
+    parser.add_argument("--symbol", action="append", default=None)
+    parser.add_argument("--delta-bucket", type=float, default=0.001)
+    args = parser.parse_args(sys.argv[1:])
+
+    store = HistoryStore(args.history).open()
+
+    if args.command == "import":
+        files = sorted(set([f for pattern in args.files for f in glob.glob(pattern)]))
+        start = time.monotonic()
+        rows = store.import_csv(files)
+        print("Imported {} rows from {} files in {:.2f} s".format(rows, len(files), time.monotonic() - start))
+
+    elif args.command == "compact":
+        store.compact()
+        print("Segments: {}, rows: {}".format(len(store.segments), store.rows))
+
+    else:
+        since = time.time() - args.days * 86400 if args.days is not None else None
+        by = args.by.split(",")
+        start = time.monotonic()
+        aggregates = store.aggregate(by, since, None, args.symbol, args.delta_bucket)
+        elapsed = time.monotonic() - start
+
+        fields = by + ["count", "result_sum", "result_mean", "cur1_diff_sum", "cur2_diff_sum", "leg1_filled_mean",
+                       "leg2_filled_mean"]
+        writer = csv.DictWriter(sys.stdout, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(aggregates)
+        print("{} rows scanned in {:.3f} s".format(store.rows, elapsed), file=sys.stderr)
+
+    sys.exit(0)
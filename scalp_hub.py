@@ -0,0 +1,367 @@
+"""
+Market data hub: one process loads the markets and polls (or streams) the tickers once for all the bots on the host and
+publishes them into the shared memory. Bots started with "feed_mode": "hub" take the markets and tickers from the hub
+instead of requesting the exchange, and fall back to polling if the hub is not running or stale.
+
+Shared memory layout (little endian):
+    header: magic, version, max_symbols, symbols_count, ring_size, markets_capacity, markets_len, markets_seq, heartbeat
+    symbols table: max_symbols * 32 bytes of utf-8 symbol names
+    tickers rings: per symbol head (ticks written) and ring_size entries of seq, bid, ask, timestamp
+    markets: json of the markets
+
+Ring entries and markets are written under the seqlock: sequence is odd while writing, so readers retry the read if
+the sequence was odd or changed during the read.
+
+Usage:
+    python3 scalp_hub.py [--config _config_default.json]
+"""
+import json
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, List, Tuple
+
+MAGIC = b"SCALPHUB"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sIIIIIQQd")
+_SYMBOL_SIZE = 32
+_HEAD = struct.Struct("<Q")
+_ENTRY = struct.Struct("<Qddd")
+_SEQ = struct.Struct("<Q")
+_HEARTBEAT_OFFSET = _HEADER.size - 8
+
+_created = set()  # hubs created by this process
+
+
+class HubLayout(object):
+
+    def __init__(self, max_symbols: int, ring_size: int, markets_capacity: int):
+        self.max_symbols = max_symbols
+        self.ring_size = ring_size
+        self.markets_capacity = markets_capacity
+
+        self.symbols_offset = _HEADER.size
+        self.rings_offset = self.symbols_offset + max_symbols * _SYMBOL_SIZE
+        self.ring_bytes = _HEAD.size + ring_size * _ENTRY.size
+        self.markets_offset = self.rings_offset + max_symbols * self.ring_bytes
+        self.size = self.markets_offset + markets_capacity
+
+    def head_offset(self, index: int):
+        return self.rings_offset + index * self.ring_bytes
+
+    def entry_offset(self, index: int, tick: int):
+        return self.head_offset(index) + _HEAD.size + (tick % self.ring_size) * _ENTRY.size
+
+
+class MarketDataHub(object):
+    """
+    Writer side: creates the shared memory and publishes the markets and tickers of the symbols
+    """
+
+    def __init__(self, name: str, symbols: List[str], ring_size: int = 256, markets_capacity: int = 16777216,
+                 max_symbols: int = 64):
+        if len(symbols) > max_symbols:
+            raise ValueError("Too many symbols for the hub: {} > {}".format(len(symbols), max_symbols))
+
+        self.name = name
+        self.symbols = list(symbols)
+        self.layout = HubLayout(max_symbols, ring_size, markets_capacity)
+        self.indexes = {s: i for i, s in enumerate(self.symbols)}
+
+        self.shm = None  # type: shared_memory.SharedMemory
+        self._heads = [0] * len(self.symbols)
+        self._markets_len = 0
+        self._markets_seq = 0
+
+    def create(self):
+        try:
+            stale = shared_memory.SharedMemory(self.name)  # left by the crashed hub
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        self.shm = shared_memory.SharedMemory(self.name, create=True, size=self.layout.size)
+        _created.add(self.name)
+
+        for i, symbol in enumerate(self.symbols):
+            offset = self.layout.symbols_offset + i * _SYMBOL_SIZE
+            self.shm.buf[offset:offset + _SYMBOL_SIZE] = symbol.encode()[:_SYMBOL_SIZE].ljust(_SYMBOL_SIZE, b"\0")
+
+        self._write_header()
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+            _created.discard(self.name)
+
+    def _write_header(self):
+        _HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, self.layout.max_symbols, len(self.symbols),
+                          self.layout.ring_size, self.layout.markets_capacity, self._markets_len, self._markets_seq,
+                          time.time())
+
+    def publish_markets(self, markets: dict):
+        """
+        writes the markets json. If all the markets do not fit the capacity only the hub symbols' markets are written.
+        """
+        data = json.dumps(markets, separators=(",", ":")).encode()
+        if len(data) > self.layout.markets_capacity:
+            data = json.dumps({s: markets[s] for s in self.symbols if s in markets}, separators=(",", ":")).encode()
+        if len(data) > self.layout.markets_capacity:
+            raise ValueError("Markets do not fit the hub: {} > {}".format(len(data), self.layout.markets_capacity))
+
+        self._markets_seq += 1  # odd: writing
+        self._write_header()
+        offset = self.layout.markets_offset
+        self.shm.buf[offset:offset + len(data)] = data
+        self._markets_len = len(data)
+        self._markets_seq += 1
+        self._write_header()
+
+    def publish(self, symbol: str, bid: float, ask: float, timestamp: float = None):
+        index = self.indexes[symbol]
+        tick = self._heads[index]
+        offset = self.layout.entry_offset(index, tick)
+        seq = 2 * (tick // self.layout.ring_size) + 1  # odd while writing, different on every ring lap
+
+        buf = self.shm.buf
+        _SEQ.pack_into(buf, offset, seq)
+        _ENTRY.pack_into(buf, offset, seq, bid, ask, timestamp if timestamp is not None else 0.0)
+        _SEQ.pack_into(buf, offset, seq + 1)
+
+        self._heads[index] = tick + 1
+        _HEAD.pack_into(buf, self.layout.head_offset(index), tick + 1)
+
+    def publish_tickers(self, tickers: Dict[str, dict]):
+        for symbol, ticker in tickers.items():
+            if symbol in self.indexes and ticker.get("bid") is not None and ticker.get("ask") is not None:
+                self.publish(symbol, ticker["bid"], ticker["ask"], ticker.get("timestamp"))
+
+    def heartbeat(self):
+        struct.pack_into("<d", self.shm.buf, _HEARTBEAT_OFFSET, time.time())
+
+
+class HubReader(object):
+    """
+    Reader side: attaches to the hub's shared memory and never writes to it
+    """
+
+    def __init__(self, name: str, retries: int = 3):
+        """
+        :param retries: read attempts of the entry or markets being written before giving up
+        """
+        self.name = name
+        self.retries = retries
+        self.shm = None  # type: shared_memory.SharedMemory
+        self.layout = None  # type: HubLayout
+        self.indexes = dict()  # type: Dict[str, int]
+
+    def attach(self):
+        """
+        :raises FileNotFoundError: if the hub is not running
+        :raises ValueError: if the shared memory is not the hub's or of the other version
+        """
+        self.shm = shared_memory.SharedMemory(self.name)
+        if self.name not in _created:
+            # readers should not unlink the hub's memory at exit
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        magic, version, max_symbols, symbols_count, ring_size, markets_capacity, _, _, _ = \
+            _HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.detach()
+            raise ValueError("Not a market data hub of version {}: {}".format(VERSION, self.name))
+
+        self.layout = HubLayout(max_symbols, ring_size, markets_capacity)
+        for i in range(symbols_count):
+            offset = self.layout.symbols_offset + i * _SYMBOL_SIZE
+            self.indexes[bytes(self.shm.buf[offset:offset + _SYMBOL_SIZE]).rstrip(b"\0").decode()] = i
+
+        return self
+
+    def detach(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+
+    @property
+    def symbols(self):
+        return list(self.indexes.keys())
+
+    def heartbeat_age(self):
+        return time.time() - struct.unpack_from("<d", self.shm.buf, _HEARTBEAT_OFFSET)[0]
+
+    def markets(self):
+        """
+        :return: markets dict or None if not published yet
+        """
+        for _ in range(self.retries):
+            header = _HEADER.unpack_from(self.shm.buf, 0)
+            markets_len, seq = header[6], header[7]
+            if seq == 0:
+                return None
+            if seq % 2 == 1:
+                time.sleep(0.001)
+                continue
+
+            offset = self.layout.markets_offset
+            data = bytes(self.shm.buf[offset:offset + markets_len])
+            if _HEADER.unpack_from(self.shm.buf, 0)[7] == seq:
+                return json.loads(data.decode())
+
+        return None
+
+    def head(self, symbol: str):
+        """
+        :return: number of ticks published for the symbol
+        """
+        return _HEAD.unpack_from(self.shm.buf, self.layout.head_offset(self.indexes[symbol]))[0]
+
+    def read_ticks(self, symbol: str, cursor: int) -> Tuple[List[Tuple[float, float, float]], int]:
+        """
+        ticks of the symbol published since the cursor. If the reader lags more than the ring size the oldest ticks
+        are lost.
+
+        :param cursor: head of the previous read, 0 for the first read
+        :return: list of (bid, ask, timestamp) and the new cursor
+        """
+        index = self.indexes[symbol]
+        head = self.head(symbol)
+        start = max(cursor, head - self.layout.ring_size + 1)
+
+        ticks = list()
+        for tick in range(start, head):
+            entry = self._read_entry(index, tick)
+            if entry is not None:
+                ticks.append(entry)
+
+        return ticks, head
+
+    def _read_entry(self, index: int, tick: int):
+        offset = self.layout.entry_offset(index, tick)
+        expected = 2 * (tick // self.layout.ring_size) + 2
+
+        for _ in range(self.retries):
+            seq, bid, ask, timestamp = _ENTRY.unpack_from(self.shm.buf, offset)
+            if seq == expected and _SEQ.unpack_from(self.shm.buf, offset)[0] == seq:
+                return bid, ask, timestamp
+            if seq > expected:
+                return None  # overwritten by the next lap
+        return None
+
+
+class HubFeed(object):
+    """
+    Tickers feed from the hub: latest ticker of the symbols which were published since the last call. Symbols not
+    published by the hub are requested by fetch_tickers once per fetch_interval.
+    """
+
+    def __init__(self, reader: HubReader, symbols: List[str], stale_timeout: float = 5.0,
+                 poll_interval: float = 0.001, fetch_tickers: Callable[[List[str]], dict] = None,
+                 fetch_interval: float = 1.0):
+        """
+        :param poll_interval: interval of checking the hub for the new ticks while waiting
+        :param fetch_tickers: function requesting the tickers of the symbols missing in the hub
+        :param fetch_interval: interval of requesting the missing symbols
+        """
+        self.reader = reader
+        self.symbols = [s for s in symbols if s in reader.indexes]
+        self.missing = [s for s in symbols if s not in reader.indexes]
+        self.stale_timeout = stale_timeout
+        self.poll_interval = poll_interval
+        self.fetch_tickers = fetch_tickers
+        self.fetch_interval = fetch_interval
+        self._cursors = {s: reader.head(s) for s in self.symbols}
+        self._next_fetch_time = 0.0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def healthy(self):
+        return self.reader.shm is not None and self.reader.heartbeat_age() < self.stale_timeout
+
+    def _fetch_due(self):
+        return len(self.missing) > 0 and self.fetch_tickers is not None \
+            and time.monotonic() >= self._next_fetch_time
+
+    def _changed(self):
+        return self._fetch_due() or any(self.reader.head(s) != self._cursors[s] for s in self.symbols)
+
+    def get_tickers(self, symbols: List[str]):
+        tickers = dict()
+        for symbol in self.symbols:
+            if symbol not in symbols:
+                continue
+
+            ticks, self._cursors[symbol] = self.reader.read_ticks(symbol, self._cursors[symbol])
+            if len(ticks) > 0:
+                bid, ask, timestamp = ticks[-1]
+                tickers[symbol] = {"bid": bid, "ask": ask, "timestamp": timestamp}
+
+        missing = [s for s in self.missing if s in symbols]
+        if len(missing) > 0 and self._fetch_due():
+            self._next_fetch_time = time.monotonic() + self.fetch_interval
+            fetched = self.fetch_tickers(missing) or dict()
+            tickers.update({s: fetched[s] for s in missing if s in fetched})
+
+        return tickers
+
+    def wait(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while not self._changed() and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+
+
+def hub_symbols(bot):
+    """
+    symbols of the bot's config lanes and "hub_symbols" list
+    """
+    symbols = [s["symbol"] for s in bot.symbols] if len(bot.symbols) > 0 else [bot.symbol]
+    return sorted(set(symbols + list(bot.hub_symbols)))
+
+
+if __name__ == "__main__":
+    from scalp_bot import ScalpBot
+    from scalp import init_feed
+
+    bot = ScalpBot("_config_default.json", "scalp_hub.log")
+    bot.set_from_cli(sys.argv[1:])
+    bot.load_config_from_file(bot.config_filename)
+    bot.feed_mode = bot.hub.get("feed_mode", "polling")  # hub's own feed: "polling" or "stream"
+
+    bot.init_exchange()
+    if bot.offline:
+        bot.offline_markets_file = "test_data/markets_binance.json"
+        bot.init_offline_mode()
+    bot.load_markets()
+
+    symbols = hub_symbols(bot)
+    hub = MarketDataHub(bot.hub["name"], symbols, int(bot.hub["ring_size"]), int(bot.hub["markets_capacity"]),
+                        int(bot.hub["max_symbols"]))
+    hub.create()
+    hub.publish_markets(getattr(bot, "markets", None) or dict())
+
+    feed = init_feed(bot, symbols)
+    bot.log(bot.LOG_INFO, "Market data hub {} for {} symbols, {} feed".format(hub.name, len(symbols), bot.feed_mode))
+
+    try:
+        while True:
+            hub.publish_tickers(feed.get_tickers(symbols))
+            hub.heartbeat()
+            feed.wait(bot.cycle_sleep())
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        feed.stop()
+        hub.close()
+
+    sys.exit(0)
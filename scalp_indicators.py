@@ -0,0 +1,161 @@
+import math
+from itertools import islice
+from typing import List
+
+
+class RollingMAPair(object):
+    """
+    Short and long simple moving averages over one price series. Values are kept in a ring buffer sized to the longest
+    window and both averages are maintained as running sums, so every update is O(1) and does not copy the history.
+    """
+
+    def __init__(self, short_window: int, long_window: int):
+        if short_window < 1 or long_window < 1:
+            raise ValueError("MA windows should be positive: short {} long {}".format(short_window, long_window))
+
+        self.short_window = short_window
+        self.long_window = long_window
+
+        self._size = max(short_window, long_window)
+        self._buffer = [0.0] * self._size  # type: List[float]
+        self._pos = 0  # index of the next write
+
+        self._short_sum = 0.0
+        self._long_sum = 0.0
+
+        self.count = 0  # total number of values received
+        self.last = None  # last received value
+
+    def update(self, value: float):
+        buffer = self._buffer
+        pos = self._pos
+
+        if self.count >= self.long_window:
+            self._long_sum -= buffer[(pos - self.long_window) % self._size]
+
+        if self.count >= self.short_window:
+            self._short_sum -= buffer[(pos - self.short_window) % self._size]
+
+        buffer[pos] = value
+        self._long_sum += value
+        self._short_sum += value
+
+        self.count += 1
+        self.last = value
+
+        pos += 1
+        if pos == self._size:
+            pos = 0
+            # re-sum once per buffer wrap so float errors of add/subtract do not accumulate (amortized O(1))
+            self._long_sum = self._window_sum(self.long_window)
+            self._short_sum = self._window_sum(self.short_window)
+        self._pos = pos
+
+    def _window_sum(self, window: int):
+        return math.fsum(islice(self._buffer, self._size - min(window, self.count), self._size))
+
+    def values(self):
+        """
+        returns list of buffered values from the oldest to the newest
+        :return: list
+        """
+        n = min(self.count, self._size)
+        return [self._buffer[(self._pos - n + i) % self._size] for i in range(n)]
+
+    @property
+    def ma_short(self):
+        return self._short_sum / self.short_window if self.count >= self.short_window else None
+
+    @property
+    def ma_long(self):
+        return self._long_sum / self.long_window if self.count >= self.long_window else None
+
+    @property
+    def rel_delta(self):
+        """
+        relative delta between short and long MAs: (ma_short - ma_long) / ma_short. None if could not be calculated.
+        """
+        ma_short = self.ma_short
+        ma_long = self.ma_long
+
+        if ma_short is None or ma_long is None or ma_short == 0:
+            return None
+
+        return (ma_short - ma_long) / ma_short
+
+
+class TickerMAIndicator(object):
+    """
+    Streaming MA indicator for ticker's ask and bid. Replaces recalculation of MAs over the whole tickers history on
+    every tick.
+    """
+
+    def __init__(self, short_window: int, long_window: int, warm_up_len: int = 0):
+        """
+        :param short_window: short MA window
+        :param long_window: long MA window
+        :param warm_up_len: number of tickers to collect before the indicator is considered as warmed up. Not less than
+        the longest MA window.
+        """
+        self.ask = RollingMAPair(short_window, long_window)
+        self.bid = RollingMAPair(short_window, long_window)
+
+        self.warm_up_len = max(warm_up_len, short_window, long_window)
+        self.ticks = 0
+
+    def update(self, ask: float, bid: float):
+        self.ask.update(ask)
+        self.bid.update(bid)
+        self.ticks += 1
+
+    def restore(self, asks: List[float], bids: List[float], ticks: int):
+        """
+        restores the indicator from the buffered values (RollingMAPair.values()) and the ticks counter
+        """
+        self.ask = RollingMAPair(self.ask.short_window, self.ask.long_window)
+        self.bid = RollingMAPair(self.bid.short_window, self.bid.long_window)
+
+        for ask, bid in zip(asks, bids):
+            self.ask.update(ask)
+            self.bid.update(bid)
+
+        self.ticks = ticks
+
+    @property
+    def warmed_up(self):
+        return self.ticks >= self.warm_up_len
+
+    def for_side(self, order1_side: str):
+        """
+        returns MAs which are used for the order1 side: ask for "buy" and bid for "sell"
+        :param order1_side: "buy" or "sell"
+        :return: RollingMAPair
+        """
+        return self.ask if order1_side == "buy" else self.bid
+
+    def rel_delta(self, order1_side: str):
+        return self.for_side(order1_side).rel_delta
+
+    def signal(self, order1_side: str, threshold: float):
+        """
+        checks if short MA is ahead of long MA more than relative threshold in the direction of order1: up for "buy"
+        and down for "sell".
+
+        :param order1_side: "buy" or "sell"
+        :param threshold: ma_short_long_threshold
+        :return: True if it's ok to add scalps
+        """
+        if not self.warmed_up:
+            return False
+
+        rel_delta = self.rel_delta(order1_side)
+        if rel_delta is None:
+            return False
+
+        if order1_side == "buy":
+            return rel_delta > threshold
+
+        if order1_side == "sell":
+            return rel_delta < -threshold
+
+        return False
@@ -0,0 +1,408 @@
+"""
+Crash-safe state of the scalp lanes: active scalps with their orders ids, lanes counters and MA indicators buffers.
+
+Changes are appended every cycle to the memory-mapped journal file and the compact snapshot of the whole state is
+written periodically, after that the journal is started over. On restart the state is rebuilt from the snapshot and
+the journal records made after it, live orders are re-attached to the order manager and the indicators are restored
+without warm-up.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+import scalp_bot
+from scalp_bot import SingleScalp, ScalpSignal, ScalpLane
+from typing import Dict, List
+
+JOURNAL_MAGIC = b"SCJ1"
+_HEADER = struct.Struct("<4sQ")  # magic, end offset of the records
+_RECORD_HEADER = struct.Struct("<II")  # payload length, crc32 of payload
+
+
+class RestoredOrder(object):
+    """
+    Completed order leg of the restored scalp: only the filled amounts are kept
+    """
+
+    __slots__ = ("symbol", "start_currency", "dest_currency", "filled_start_amount", "filled_dest_amount", "filled",
+                 "amount", "dest_amount", "status", "state", "orders_history", "price", "max_order_updates")
+
+    def __init__(self, symbol: str, start_currency: str, dest_currency: str, filled_start_amount: float,
+                 filled_dest_amount: float, price: float = None, max_order_updates: int = 0):
+        self.symbol = symbol
+        self.start_currency = start_currency
+        self.dest_currency = dest_currency
+        self.filled_start_amount = filled_start_amount
+        self.filled_dest_amount = filled_dest_amount
+        self.filled = filled_start_amount
+        self.amount = filled_start_amount
+        self.dest_amount = filled_dest_amount
+        self.status = "closed"
+        self.state = "restored"
+        self.orders_history = list()
+        self.price = price
+        self.max_order_updates = max_order_updates
+
+    def get_active_order(self):
+        """
+        the order has no trade order to update
+        """
+        return None
+
+
+def active_order_id(order):
+    if order is None or not hasattr(order, "get_active_order"):
+        return None
+
+    active_order = order.get_active_order()
+    return active_order.id if active_order is not None else None
+
+
+def reattach_order(order, trade_order_id):
+    """
+    sets the exchange's order id to the active trade order of the new action order, so the order manager continues to
+    update the live order instead of placing the new one
+    """
+    active_order = order.get_active_order()
+    active_order.id = trade_order_id
+    active_order.status = "open"
+    order.status = "open"
+
+    if hasattr(order, "order_command"):
+        order.order_command = "hold"
+
+    return order
+
+
+def _order_record(order):
+    if order is None:
+        return None
+
+    return {"id": active_order_id(order),
+            "filled_start_amount": getattr(order, "filled_start_amount", 0.0),
+            "filled_dest_amount": getattr(order, "filled_dest_amount", 0.0)}
+
+
+def scalp_record(scalp: SingleScalp):
+    signal = scalp.signal
+    return {"id": scalp.id,
+            "state": scalp.state,
+            "depth": scalp.depth,
+            "start_amount": scalp.start_amount,
+            "start_price": scalp.start_price,
+            "profit": scalp.profit,
+            "commission": scalp.commission,
+            "order1_max_updates": scalp.order1_max_updates,
+            "order2_max_updates_for_profit": scalp.order2_max_updates_for_profit,
+            "order2_max_updates_market": scalp.order2_max_updates_market,
+            "cancel_threshold": scalp.cancel_threshold,
+            "result_fact_diff": scalp.result_fact_diff,
+            "cur1_diff": scalp.cur1_diff,
+            "cur2_diff": scalp.cur2_diff,
+            "signal": [signal.order1_side, signal.ma_short, signal.ma_long, signal.ma_short_long_rel_delta,
+                       signal.time_created] if signal is not None else None,
+            "order1": _order_record(scalp.order1),
+            "order2": _order_record(scalp.order2)}
+
+
+def restore_scalp(lane: ScalpLane, record: dict):
+    """
+    creates the scalp of the lane from the record. Live orders are re-created and re-attached by the exchange's ids,
+    completed order 1 is restored with the filled amounts only.
+
+    :return: tuple of the scalp and the list of re-attached orders
+    """
+    scalp = SingleScalp(lane.symbol, lane.start_currency, record["start_amount"], record["depth"],
+                        record["start_price"], lane.dest_currency, record["profit"], record["commission"],
+                        record["order1_max_updates"], record["order2_max_updates_for_profit"],
+                        record["order2_max_updates_market"], record["cancel_threshold"])
+
+    scalp.id = record["id"]
+    scalp.result_fact_diff = record["result_fact_diff"]
+    scalp.cur1_diff = record["cur1_diff"]
+    scalp.cur2_diff = record["cur2_diff"]
+    if record["signal"] is not None:
+        scalp.signal = ScalpSignal(*record["signal"])
+
+    state = record["state"]
+    order1, order2 = record["order1"], record["order2"]
+    live_orders = list()
+
+    if state == "order1" and order1 is not None and order1["id"] is not None:
+        live_orders.append(reattach_order(scalp.create_order1(), order1["id"]))
+
+    elif state in ("order1_complete", "order2") and order1 is not None:
+        scalp.order1 = RestoredOrder(lane.symbol, lane.start_currency, lane.dest_currency,
+                                     order1["filled_start_amount"], order1["filled_dest_amount"],
+                                     record["start_price"], record["order1_max_updates"])
+        scalp.state = "order1_complete"
+
+        if state == "order2" and order2 is not None and order2["id"] is not None:
+            live_orders.append(reattach_order(scalp.create_order2(), order2["id"]))
+
+    else:
+        scalp.state = "new"  # order 1 was not placed yet
+
+    return scalp, live_orders
+
+
+class ScalpJournal(object):
+
+    def __init__(self, directory: str, size: int = 4 * 1024 * 1024, snapshot_interval: float = 60.0):
+        """
+        :param directory: directory of the journal and snapshot files
+        :param size: initial size of the journal file in bytes, the file is grown if needed
+        :param snapshot_interval: seconds between snapshots
+        """
+        self.directory = directory
+        self.journal_file = os.path.join(directory, "journal.bin")
+        self.snapshot_file = os.path.join(directory, "snapshot.json")
+        self.size = size
+        self.snapshot_interval = snapshot_interval
+
+        self.seq = 0  # sequence number of the last record
+        self.last_snapshot_time = 0.0
+        self.records_written = 0
+
+        self._file = None
+        self._mmap = None  # type: mmap.mmap
+        self._offset = _HEADER.size
+
+        self._scalps_keys = dict()  # type: Dict[str, Dict[int, tuple]]
+        self._lanes_keys = dict()  # type: Dict[str, tuple]
+        self._ticks = dict()  # type: Dict[str, int]
+
+    def open(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        if not os.path.isfile(self.journal_file) or os.path.getsize(self.journal_file) < _HEADER.size:
+            with open(self.journal_file, "wb") as f:
+                f.truncate(self.size)
+
+        self._file = open(self.journal_file, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+        magic, offset = _HEADER.unpack_from(self._mmap, 0)
+        self._offset = offset if magic == JOURNAL_MAGIC and _HEADER.size <= offset <= len(self._mmap) \
+            else _HEADER.size
+        self._write_header()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_header(self):
+        _HEADER.pack_into(self._mmap, 0, JOURNAL_MAGIC, self._offset)
+
+    def _grow(self, length: int):
+        new_size = max(len(self._mmap) * 2, self._offset + length)
+        self._mmap.close()
+        self._file.truncate(new_size)
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+    def append(self, record: dict):
+        """
+        appends the record to the journal. The record is in the journal as soon as the end offset in the header is
+        updated, so the torn record is never read back.
+        """
+        self.seq += 1
+        record["seq"] = self.seq
+
+        payload = json.dumps(record, separators=(",", ":")).encode()
+        length = _RECORD_HEADER.size + len(payload)
+
+        if self._offset + length > len(self._mmap):
+            self._grow(length)
+
+        _RECORD_HEADER.pack_into(self._mmap, self._offset, len(payload), zlib.crc32(payload))
+        self._mmap[self._offset + _RECORD_HEADER.size:self._offset + length] = payload
+        self._offset += length
+        self._write_header()
+
+        self.records_written += 1
+
+    def read_records(self):
+        """
+        :return: list of records of the journal
+        """
+        records = list()
+        offset = _HEADER.size
+        end = self._offset
+
+        while offset + _RECORD_HEADER.size <= end:
+            length, crc = _RECORD_HEADER.unpack_from(self._mmap, offset)
+            payload = bytes(self._mmap[offset + _RECORD_HEADER.size:offset + _RECORD_HEADER.size + length])
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+
+            records.append(json.loads(payload.decode()))
+            offset += _RECORD_HEADER.size + length
+
+        return records
+
+    @staticmethod
+    def _lane_record(lane: ScalpLane):
+        return {"run": lane.run, "scalps_added": lane.scalps_added, "total_result": lane.total_result,
+                "total_cur1_diff": lane.total_cur1_diff, "total_cur2_diff": lane.total_cur2_diff,
+                "scalps_order1_complete": lane.scalps.scalps_order1_complete}
+
+    def record_cycle(self, lanes: List[ScalpLane]):
+        """
+        appends changes of the lanes since the last call: new tickers, scalps with changed state or orders ids, removed
+        scalps and lanes counters. Makes the snapshot if snapshot interval has passed.
+        """
+        for lane in lanes:
+            self._record_ticks(lane)
+
+            scalps_keys = self._scalps_keys.setdefault(lane.id, dict())
+            active_scalps = lane.scalps.active_scalps
+
+            for scalp_id in [i for i in scalps_keys if i not in active_scalps]:
+                del scalps_keys[scalp_id]
+                self.append({"type": "removed", "lane": lane.id, "id": scalp_id})
+
+            for scalp in active_scalps.values():
+                key = (scalp.state, active_order_id(scalp.order1), active_order_id(scalp.order2))
+                if scalps_keys.get(scalp.id) != key:
+                    scalps_keys[scalp.id] = key
+                    self.append({"type": "scalp", "lane": lane.id, "scalp": scalp_record(scalp)})
+
+            lane_record = self._lane_record(lane)
+            lane_key = tuple(lane_record.values())
+            if self._lanes_keys.get(lane.id) != lane_key:
+                self._lanes_keys[lane.id] = lane_key
+                lane_record.update({"type": "lane", "lane": lane.id})
+                self.append(lane_record)
+
+        if time.monotonic() - self.last_snapshot_time >= self.snapshot_interval:
+            self.snapshot(lanes)
+
+    def _record_ticks(self, lane: ScalpLane):
+        indicator = lane.indicator
+        new_ticks = indicator.ticks - self._ticks.get(lane.id, 0)
+        if new_ticks <= 0:
+            return
+
+        self._ticks[lane.id] = indicator.ticks
+        asks, bids = indicator.ask.values(), indicator.bid.values()
+        new_ticks = min(new_ticks, len(asks))
+
+        self.append({"type": "ticks", "lane": lane.id, "ticks": indicator.ticks,
+                     "ask": asks[len(asks) - new_ticks:], "bid": bids[len(bids) - new_ticks:]})
+
+    def snapshot(self, lanes: List[ScalpLane]):
+        """
+        writes the state of the lanes to the snapshot file and starts the journal over
+        """
+        state = {"seq": self.seq, "time": time.time(), "lanes": dict()}
+
+        for lane in lanes:
+            state["lanes"][lane.id] = {
+                "counters": self._lane_record(lane),
+                "indicator": {"ticks": lane.indicator.ticks, "ask": lane.indicator.ask.values(),
+                              "bid": lane.indicator.bid.values()},
+                "scalps": [scalp_record(scalp) for scalp in lane.scalps.active_scalps.values()]}
+
+        tmp_file = self.snapshot_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)  # journal records up to seq are skipped if not started over below
+
+        self._offset = _HEADER.size
+        self._write_header()
+        self.last_snapshot_time = time.monotonic()
+
+    def load_state(self):
+        """
+        :return: dict of the lanes states from the snapshot with the journal records applied
+        """
+        lanes = dict()
+        seq = 0
+
+        if os.path.isfile(self.snapshot_file):
+            with open(self.snapshot_file) as f:
+                snapshot = json.load(f)
+            seq = snapshot["seq"]
+            for lane_id, lane_state in snapshot["lanes"].items():
+                lanes[lane_id] = {"counters": lane_state["counters"], "indicator": lane_state["indicator"],
+                                  "scalps": {s["id"]: s for s in lane_state["scalps"]}}
+
+        for record in self.read_records():
+            self.seq = max(self.seq, record["seq"])
+            if record["seq"] <= seq:
+                continue
+
+            lane_state = lanes.setdefault(record["lane"], {"counters": None,
+                                                           "indicator": {"ticks": 0, "ask": list(), "bid": list()},
+                                                           "scalps": dict()})
+            if record["type"] == "scalp":
+                lane_state["scalps"][record["scalp"]["id"]] = record["scalp"]
+            elif record["type"] == "removed":
+                lane_state["scalps"].pop(record["id"], None)
+            elif record["type"] == "lane":
+                lane_state["counters"] = {k: v for k, v in record.items() if k not in ("type", "lane", "seq")}
+            elif record["type"] == "ticks":
+                indicator = lane_state["indicator"]
+                indicator["ask"] = indicator["ask"] + record["ask"]
+                indicator["bid"] = indicator["bid"] + record["bid"]
+                indicator["ticks"] = record["ticks"]
+
+        self.seq = max(self.seq, seq)
+        return lanes
+
+    def restore(self, lanes: List[ScalpLane]):
+        """
+        restores the lanes from the journal
+
+        :return: list of live orders to be added to the order manager
+        """
+        state = self.load_state()
+        live_orders = list()
+        max_scalp_id = 0
+
+        for lane in lanes:
+            lane_state = state.get(lane.id)
+            if lane_state is None:
+                continue
+
+            indicator = lane_state["indicator"]
+            if hasattr(lane.indicator, "restore") and indicator["ticks"] > 0:
+                buffer_len = max(lane.indicator.ask.short_window, lane.indicator.ask.long_window)
+                lane.indicator.restore(indicator["ask"][-buffer_len:], indicator["bid"][-buffer_len:],
+                                       indicator["ticks"])
+                self._ticks[lane.id] = indicator["ticks"]
+
+            counters = lane_state["counters"]
+            if counters is not None:
+                self._lanes_keys[lane.id] = tuple(counters.values())
+                lane.run = counters["run"]
+                lane.scalps_added = counters["scalps_added"]
+                lane.total_result = counters["total_result"]
+                lane.total_cur1_diff = counters["total_cur1_diff"]
+                lane.total_cur2_diff = counters["total_cur2_diff"]
+                lane.scalps.scalps_order1_complete = counters["scalps_order1_complete"]
+
+            scalps = list()
+            for record in lane_state["scalps"].values():
+                scalp, orders = restore_scalp(lane, record)
+                scalps.append(scalp)
+                self._scalps_keys.setdefault(lane.id, dict())[scalp.id] = \
+                    (scalp.state, active_order_id(scalp.order1), active_order_id(scalp.order2))
+                live_orders.extend(orders)
+                max_scalp_id = max(max_scalp_id, scalp.id)
+
+            lane.scalps.add_scalps(scalps)
+
+        scalp_bot.skip_scalp_ids(max_scalp_id)
+        return live_orders
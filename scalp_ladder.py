@@ -0,0 +1,223 @@
+"""
+Ladder of the order 1 prices and target profits for the missed depth levels calculated in one vectorized step and
+rounded to the market's tick size. Optionally the levels are adjusted to the order book: placed just ahead of the
+volume walls and skipped if there is too much volume ahead of them.
+"""
+import time
+import numpy as np
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+# ccxt precision modes of the exchange (exchange.precisionMode)
+DECIMAL_PLACES = 2
+SIGNIFICANT_DIGITS = 3
+TICK_SIZE = 4
+
+
+def market_tick_size(market: dict, precision_mode: int = None):
+    """
+    price tick size of the ccxt market: PRICE_FILTER tickSize of binance-like markets info, or precision["price"] as
+    the tick size itself (TICK_SIZE precision mode) or as the decimal places (DECIMAL_PLACES mode).
+
+    :param precision_mode: precisionMode of the ccxt exchange. If not known the integer precision from 1 is taken as
+    the decimal places and other ones as the tick size.
+    :return: tick size or None if not available
+    """
+    if market is None:
+        return None
+
+    info = market.get("info")
+    if isinstance(info, dict):
+        for f in info.get("filters", list()):
+            if f.get("filterType") == "PRICE_FILTER" and float(f.get("tickSize", 0)) > 0:
+                return float(f["tickSize"])
+
+    precision = market.get("precision", dict()).get("price")
+    if precision is None:
+        return None
+
+    if precision_mode == DECIMAL_PLACES or (precision_mode is None and float(precision).is_integer()
+                                            and precision >= 1):
+        return 10.0 ** -int(precision)
+
+    if precision_mode not in (None, TICK_SIZE):
+        return None  # significant digits do not define the tick
+
+    return float(precision) if precision > 0 else None
+
+
+def tick_decimals(tick_size: float):
+    """
+    :return: decimal places of the tick size: 2 for 0.25, 6 for 0.000025
+    """
+    return max(0, -Decimal(str(tick_size)).normalize().as_tuple().exponent)
+
+
+def round_to_tick(prices: np.ndarray, tick_size: float, side: str):
+    """
+    rounds prices to the tick size: down for buy (not to pay more) and up for sell (not to get less)
+    """
+    if tick_size is None or tick_size <= 0:
+        return prices
+
+    ticks = prices / tick_size
+    ticks = np.floor(ticks + 1e-9) if side == "buy" else np.ceil(ticks - 1e-9)
+
+    return np.round(ticks * tick_size, tick_decimals(tick_size))
+
+
+def ladder(side: str, bid: float, ask: float, profit: float, profit_with_fee: float, depth_step_in_profits: float,
+           first_order_price_margin_in_profits_with_fees: float, depths: List[int],
+           tick_size: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    order 1 prices and target profits with fee for the depth levels. First level is shifted from the bid (for buy) or
+    ask (for sell) by margin in profits with fees and every next level is shifted by depth step in profits.
+
+    :param side: order 1 side
+    :param depths: depth levels, starting from 1
+    :param tick_size: prices are rounded to tick size if set
+    :return: tuple of np.ndarray of prices and target profits
+    """
+    depths = np.asarray(depths, dtype=np.float64)
+    shift = profit_with_fee * first_order_price_margin_in_profits_with_fees \
+        + (depths - 1) * depth_step_in_profits * profit
+
+    if side == "buy":
+        prices = bid * (1 - shift)
+    else:
+        prices = ask * (1 + shift)
+
+    profits = profit_with_fee + profit * depth_step_in_profits * (depths - 1)
+
+    return round_to_tick(prices, tick_size, side), profits
+
+
+class OrderBookIndex(object):
+    """
+    Cumulative volume index of one side of the order book: bids for the buy orders and asks for the sell orders.
+    Prices are kept as keys growing away from the spread (negated bids), so both sides are searched the same way.
+    """
+
+    def __init__(self, order_book: dict, side: str):
+        """
+        :param order_book: ccxt order book
+        :param side: side of the orders to place: "buy" indexes bids, "sell" - asks
+        """
+        self.side = side
+        levels = order_book.get("bids" if side == "buy" else "asks") or list()
+        levels = np.asarray([level[:2] for level in levels], dtype=np.float64).reshape(-1, 2)
+
+        self.prices = levels[:, 0]
+        self.volumes = levels[:, 1]
+        self.keys = -self.prices if side == "buy" else self.prices
+        self.cumulative = np.cumsum(self.volumes)
+        self.mean_volume = float(self.volumes.mean()) if len(self.volumes) > 0 else 0.0
+
+        opposite = order_book.get("asks" if side == "buy" else "bids") or list()
+        self.opposite_price = float(opposite[0][0]) if len(opposite) > 0 else None
+
+    def key(self, prices: np.ndarray):
+        return -prices if self.side == "buy" else prices
+
+    def queue_ahead(self, prices: np.ndarray):
+        """
+        volume to be traded before the orders at the prices are filled: the book levels at the same or better prices
+        """
+        idx = np.searchsorted(self.keys, self.key(prices), side="right")
+        return np.where(idx > 0, self.cumulative[np.maximum(idx - 1, 0)], 0.0) if len(self.keys) > 0 \
+            else np.zeros(len(prices))
+
+    def walls(self, wall_ratio: float):
+        """
+        :return: indexes of the levels with volume not less than wall_ratio of the mean level volume
+        """
+        if self.mean_volume <= 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.nonzero(self.volumes >= self.mean_volume * wall_ratio)[0]
+
+
+def book_ladder(prices: np.ndarray, band: np.ndarray, index: OrderBookIndex, tick_size: float = None,
+                wall_ratio: float = 3.0, max_queue_ratio: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    moves the ladder levels just ahead of the volume walls and marks the levels behind too much queue to skip. Level is
+    moved to one tick before the biggest wall within the band before it (towards the spread) but not across the spread.
+    If several levels are moved to the same price only the first of them is placed.
+
+    :param prices: ladder prices
+    :param band: distances from the levels' prices to search the walls in
+    :param wall_ratio: min volume of the wall level in mean level volumes
+    :param max_queue_ratio: levels with the volume ahead more than max_queue_ratio of mean level volumes are skipped,
+    no skipping if 0
+    :return: tuple of np.ndarray of adjusted prices and bool mask of the levels to place
+    """
+    prices = np.array(prices, dtype=np.float64)
+    keys = index.key(prices)
+    tick = tick_size if tick_size is not None and tick_size > 0 else 0.0
+
+    walls = index.walls(wall_ratio)
+    if len(walls) > 0:
+        wall_keys = index.keys[walls]
+        in_band = (wall_keys[np.newaxis, :] < keys[:, np.newaxis]) \
+            & (wall_keys[np.newaxis, :] >= (keys - band)[:, np.newaxis])
+        volumes = np.where(in_band, index.volumes[walls][np.newaxis, :], -1.0)
+        best = volumes.argmax(axis=1)
+        has_wall = in_band.any(axis=1)
+
+        wall_prices = index.prices[walls][best]
+        ahead = wall_prices + tick if index.side == "buy" else wall_prices - tick
+        if index.opposite_price is not None:
+            crosses = ahead >= index.opposite_price if index.side == "buy" else ahead <= index.opposite_price
+            ahead = np.where(crosses, wall_prices, ahead)
+
+        prices = np.where(has_wall, ahead, prices)
+        if tick > 0:
+            prices = round_to_tick(prices, tick, index.side)
+
+    if max_queue_ratio > 0 and index.mean_volume > 0:
+        mask = index.queue_ahead(prices) <= index.mean_volume * max_queue_ratio
+    else:
+        mask = np.ones(len(prices), dtype=bool)
+
+    # levels moved to the same wall: only the first one is placed
+    first = np.zeros(len(prices), dtype=bool)
+    first[np.unique(prices, return_index=True)[1]] = True
+    mask &= first
+
+    return prices, mask
+
+
+class OrderBookCache(object):
+    """
+    Order books of the symbols fetched at most once per max_age seconds and indexed for both sides.
+    """
+
+    def __init__(self, fetch_order_book: Callable[[str, int], dict], limit: int = 20, max_age: float = 1.0):
+        """
+        :param fetch_order_book: function of the symbol and limit requesting the order book
+        """
+        self.fetch_order_book = fetch_order_book
+        self.limit = limit
+        self.max_age = max_age
+
+        self.fetches = 0
+        self._books = dict()  # type: Dict[str, Tuple[float, dict, Dict[str, OrderBookIndex]]]
+
+    def index(self, symbol: str, side: str):
+        """
+        :return: OrderBookIndex of the symbol for the side of the orders or None if the order book is not available
+        """
+        cached = self._books.get(symbol)
+        if cached is None or time.monotonic() - cached[0] >= self.max_age:
+            order_book = self.fetch_order_book(symbol, self.limit)
+            self.fetches += 1
+
+            if order_book is None:
+                self._books.pop(symbol, None)
+                return None
+
+            cached = (time.monotonic(), order_book, dict())
+            self._books[symbol] = cached
+
+        if side not in cached[2]:
+            cached[2][side] = OrderBookIndex(cached[1], side)
+        return cached[2][side]
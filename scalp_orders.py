@@ -0,0 +1,409 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+class OrderPlacementError(Exception):
+    """
+    order was rejected in the batch placement request
+    """
+    pass
+
+
+class OrderRefreshScheduler(object):
+    """
+    Cadence of the order updates by the distance of the order's price from the market. Orders within near_levels depth
+    steps from the best bid (buy) or ask (sell) are updated every orders cycle, farther orders every 2, 4, 8... cycles
+    (the interval is doubled with every doubling of the distance) up to max_interval. Between the updates the last
+    update of the order is served from the cache. Orders of the symbols without the market or the depth step, orders
+    requested to cancel and orders which were never updated are updated every cycle.
+    """
+
+    def __init__(self, near_levels: float = 2.0, max_interval: int = 16):
+        self.near_levels = near_levels
+        self.max_interval = max(1, int(max_interval))
+
+        self.markets = dict()  # type: Dict[str, tuple]  # symbol: (bid, ask)
+        self.depth_steps = dict()  # type: Dict[str, float]  # symbol: depth step relative to the price
+        self.cycle = 0
+
+        self._updates = dict()  # type: Dict[str, dict]  # order id: last update
+        self._updated_cycle = dict()  # type: Dict[str, int]
+        self._canceling = set()
+
+    def set_depth_step(self, symbol: str, depth_step: float):
+        """
+        sets the relative price step between the ladder levels of the symbol. The smallest step is kept if there are
+        several lanes of the symbol.
+        """
+        if depth_step > 0 and depth_step < self.depth_steps.get(symbol, float("inf")):
+            self.depth_steps[symbol] = depth_step
+
+    def update_market(self, symbol: str, bid: float, ask: float):
+        self.markets[symbol] = (bid, ask)
+
+    def interval(self, order):
+        """
+        :return: orders cycles between the updates of the trade order
+        """
+        depth_step = self.depth_steps.get(order.symbol)
+        market = self.markets.get(order.symbol)
+        price = getattr(order, "price", None)
+        if depth_step is None or market is None or not price:
+            return 1
+
+        bid, ask = market
+        distance = (bid - price) / bid if order.side == "buy" else (price - ask) / ask
+        near_distances = distance / (depth_step * self.near_levels)
+        if near_distances < 1:
+            return 1
+
+        return min(2 << int(math.log2(near_distances)), self.max_interval)
+
+    def due(self, order):
+        """
+        :return: True if the trade order should be updated from the exchange in the current cycle
+        """
+        return order.id not in self._updates or order.id in self._canceling \
+            or self.cycle - self._updated_cycle[order.id] >= self.interval(order)
+
+    def cached_update(self, order):
+        """
+        :return: last update of the order if the order is not due to be updated in the current cycle or None
+        """
+        if self.due(order):
+            return None
+
+        return dict(self._updates[order.id])
+
+    def updated(self, order, update):
+        """
+        caches the update of the open order, the closed orders are forgotten
+        """
+        if isinstance(update, dict) and update.get("status") == "open":
+            self._updates[order.id] = update
+            self._updated_cycle[order.id] = self.cycle
+        else:
+            self.forget(order.id)
+
+    def cancel_requested(self, order_id):
+        """
+        the order is updated every cycle until it's closed
+        """
+        self._canceling.add(order_id)
+        self._updates.pop(order_id, None)
+
+    def forget(self, order_id):
+        self._updates.pop(order_id, None)
+        self._updated_cycle.pop(order_id, None)
+        self._canceling.discard(order_id)
+
+    def next_cycle(self):
+        self.cycle += 1
+
+
+class BatchedOrdersExchange(object):
+    """
+    Proxy of the bot's exchange for the order manager. Before the orders are proceeded the statuses of all the open
+    orders are fetched by one fetch_open_orders request per symbol and get_order_update() answers from them. Orders
+    which are not in the open orders (filled or canceled since the last update) are fetched one by one as usual.
+
+    With the refresh scheduler the orders far from the market are updated less often, get_order_update() returns their
+    cached updates in the cycles between.
+
+    New orders of the cycle (e.g. all the levels of the ladder) are placed together before the orders are proceeded:
+    by one create_orders request per symbol if ccxt exchange supports it or concurrently otherwise, and
+    place_limit_order() of the order manager gets the result of the placement. Orders could be canceled in bulk by
+    cancel_orders().
+
+    All other exchange's attributes are taken from the wrapped exchange.
+    """
+
+    def __init__(self, exchange, placement_workers: int = 8, refresh: OrderRefreshScheduler = None):
+        """
+        :param exchange: bot's exchange
+        :param placement_workers: max concurrent requests for placement and cancellation if batch requests are not
+        supported by the exchange
+        :param refresh: cadence of the order updates by the distance from the market, every order is updated every
+        cycle if None
+        """
+        self.exchange = exchange
+        self.placement_workers = placement_workers
+        self.refresh = refresh
+
+        self._open_orders = dict()  # type: Dict[str, dict]
+        self._prefetched_symbols = set()
+
+        # id() of trade order: (action order, trade order, exchange response, exception). The trade order is kept to
+        # hold its id() until the result is taken by place_limit_order() or the action order leaves the order manager
+        self._placed = dict()
+
+        self.cycle_stats = dict()  # stats of the current orders cycle
+        self.last_cycle_stats = dict()
+        self.total_requests_saved = 0
+
+        self.last_placement_stats = dict()
+        self.last_cancel_stats = dict()
+
+        self._reset_cycle_stats()
+
+    def __getattr__(self, item):
+        return getattr(self.exchange, item)
+
+    def _reset_cycle_stats(self):
+        self.cycle_stats = {"order_updates": 0,  # requests in per order updates path
+                            "batch_requests": 0,
+                            "single_requests": 0,
+                            "cached_updates": 0,
+                            "requests_saved": 0}
+
+    def batch_available(self):
+        ccxt_exchange = getattr(self.exchange, "_ccxt", None)
+        return not getattr(self.exchange, "offline", False) and ccxt_exchange is not None \
+            and ccxt_exchange.has.get("fetchOpenOrders", False)
+
+    def prefetch_open_orders(self, orders: List):
+        """
+        fetches open orders for the symbols which have more than one order to update (due to be updated if there
+        is the refresh scheduler).
+
+        :param orders: open orders of the order manager (ActionOrders)
+        """
+        self._reset_cycle_stats()
+
+        self._open_orders = dict()
+        self._prefetched_symbols = set()
+
+        if not self.batch_available():
+            return
+
+        symbols_orders = dict()
+        for order in orders:
+            active_order = order.get_active_order()
+            if active_order is not None and active_order.id is not None \
+                    and (self.refresh is None or self.refresh.due(active_order)):
+                symbols_orders[order.symbol] = symbols_orders.get(order.symbol, 0) + 1
+
+        for symbol, orders_count in symbols_orders.items():
+            if orders_count < 2:
+                continue
+
+            self.cycle_stats["batch_requests"] += 1
+            try:
+                open_orders = self.exchange._ccxt.fetch_open_orders(symbol)
+            except Exception:
+                continue
+
+            for open_order in open_orders:
+                self._open_orders[str(open_order["id"])] = open_order
+            self._prefetched_symbols.add(symbol)
+
+    def get_order_update(self, order):
+        self.cycle_stats["order_updates"] += 1
+
+        if order.symbol in self._prefetched_symbols:
+            update = self._open_orders.get(str(order.id))
+            if update is not None:
+                if self.refresh is not None:
+                    self.refresh.updated(order, update)
+                return update
+
+            # not in the open orders: filled or canceled since the last update, the cached update is stale
+            if self.refresh is not None:
+                self.refresh.forget(order.id)
+
+        elif self.refresh is not None:
+            update = self.refresh.cached_update(order)
+            if update is not None:
+                self.cycle_stats["cached_updates"] += 1
+                return update
+
+        self.cycle_stats["single_requests"] += 1
+        update = self.exchange.get_order_update(order)
+
+        if self.refresh is not None:
+            self.refresh.updated(order, update)
+        return update
+
+    def cancel_order(self, order):
+        if self.refresh is not None:
+            self.refresh.cancel_requested(order.id)
+        return self.exchange.cancel_order(order)
+
+    def finish_cycle(self):
+        """
+        closes the stats of the orders cycle
+        :return: dict of the cycle stats
+        """
+        stats = self.cycle_stats
+        stats["requests_saved"] = stats["order_updates"] - stats["batch_requests"] - stats["single_requests"]
+        self.total_requests_saved += stats["requests_saved"]
+        self.last_cycle_stats = dict(stats)
+        self._reset_cycle_stats()
+
+        self._open_orders = dict()
+        self._prefetched_symbols = set()
+
+        if self.refresh is not None:
+            self.refresh.next_cycle()
+        return self.last_cycle_stats
+
+    def placement_available(self):
+        return not getattr(self.exchange, "offline", False) and getattr(self.exchange, "_ccxt", None) is not None
+
+    def _ccxt_has(self, feature: str):
+        ccxt_exchange = getattr(self.exchange, "_ccxt", None)
+        return ccxt_exchange is not None and bool(getattr(ccxt_exchange, "has", dict()).get(feature, False))
+
+    def _concurrently(self, method, items: List):
+        """
+        calls method for every item in the thread pool
+        :return: list of (result, exception) in the items order
+        """
+        def call(item):
+            try:
+                return method(item), None
+            except Exception as e:
+                return None, e
+
+        if len(items) == 1:
+            return [call(items[0])]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.placement_workers, len(items)))) as executor:
+            return list(executor.map(call, items))
+
+    def _orphaned_placements(self, orders: List):
+        """
+        removes the results of the bulk placement not taken by the order manager while their action orders are not
+        open any more (or have the other active trade order)
+
+        :param orders: open orders of the order manager (ActionOrders)
+        :return: list of the trade orders placed on the exchange, with the exchange's ids set
+        """
+        open_orders = {id(order): order for order in orders}
+        orphaned = list()
+
+        for key, (order, trade_order, response, exception) in list(self._placed.items()):
+            if open_orders.get(id(order)) is order and order.get_active_order() is trade_order:
+                continue
+
+            del self._placed[key]
+            if exception is None:
+                trade_order.id = response["id"]
+                orphaned.append(trade_order)
+
+        return orphaned
+
+    def place_orders(self, orders: List):
+        """
+        places the new trade orders of the order manager's orders in bulk. Exchange responses are returned to the
+        order manager by place_limit_order(). Orders placed in bulk but left by the order manager before they were
+        taken are canceled.
+
+        :param orders: open orders of the order manager (ActionOrders)
+        :return: dict of the placement stats
+        """
+        orphaned = self._orphaned_placements(orders)
+        if len(orphaned) > 0:
+            self.cancel_orders(orphaned)
+
+        action_orders = dict()  # id() of trade order: action order
+        trade_orders = list()
+        for order in orders:
+            active_order = order.get_active_order()
+            if active_order is not None and active_order.id is None and id(active_order) not in self._placed:
+                trade_orders.append(active_order)
+                action_orders[id(active_order)] = order
+
+        stats = {"orders": len(trade_orders), "batch_requests": 0, "single_requests": 0, "errors": 0,
+                 "latency": 0.0, "orphaned": len(orphaned)}
+
+        if len(trade_orders) == 0 or not self.placement_available():
+            return stats
+
+        start = time.monotonic()
+        results = list()
+
+        if self._ccxt_has("createOrders"):
+            symbols_orders = dict()
+            for trade_order in trade_orders:
+                symbols_orders.setdefault(trade_order.symbol, list()).append(trade_order)
+
+            for symbol, symbol_orders in symbols_orders.items():
+                stats["batch_requests"] += 1
+                try:
+                    responses = self.exchange._ccxt.create_orders([{"symbol": o.symbol, "type": "limit",
+                                                                    "side": o.side, "amount": o.amount,
+                                                                    "price": o.price} for o in symbol_orders])
+                    # orders rejected in the batch have no ids
+                    results.extend([(o, (r, None)) if isinstance(r, dict) and r.get("id") is not None
+                                    else (o, (None, OrderPlacementError("Order was not placed: {}".format(r))))
+                                    for o, r in zip(symbol_orders, responses)])
+                except Exception as e:
+                    results.extend([(o, (None, e)) for o in symbol_orders])
+        else:
+            stats["single_requests"] = len(trade_orders)
+            results = list(zip(trade_orders, self._concurrently(self.exchange.place_limit_order, trade_orders)))
+
+        for trade_order, result in results:
+            self._placed[id(trade_order)] = (action_orders[id(trade_order)], trade_order) + result
+            if result[1] is not None:
+                stats["errors"] += 1
+
+        stats["latency"] = time.monotonic() - start
+        self.last_placement_stats = stats
+        return stats
+
+    def place_limit_order(self, order):
+        """
+        returns the result of bulk placement of the order or places the order if it was not placed in bulk
+        """
+        placed = self._placed.get(id(order))
+        if placed is not None and placed[1] is order:
+            del self._placed[id(order)]
+            action_order, trade_order, response, exception = placed
+            if exception is not None:
+                raise exception
+            return response
+
+        return self.exchange.place_limit_order(order)
+
+    def cancel_orders(self, trade_orders: List):
+        """
+        cancels trade orders in bulk: by one cancel_orders request per symbol if ccxt exchange supports it or
+        concurrently otherwise. Order manager gets the canceled status on the next order update.
+
+        :return: dict of the cancellation stats
+        """
+        stats = {"orders": len(trade_orders), "batch_requests": 0, "single_requests": 0, "errors": 0,
+                 "latency": 0.0}
+
+        if len(trade_orders) == 0:
+            return stats
+
+        if self.refresh is not None:
+            for trade_order in trade_orders:
+                self.refresh.cancel_requested(trade_order.id)
+
+        start = time.monotonic()
+
+        if self._ccxt_has("cancelOrders") and self.placement_available():
+            symbols_orders = dict()
+            for trade_order in trade_orders:
+                symbols_orders.setdefault(trade_order.symbol, list()).append(trade_order)
+
+            for symbol, symbol_orders in symbols_orders.items():
+                stats["batch_requests"] += 1
+                try:
+                    self.exchange._ccxt.cancel_orders([o.id for o in symbol_orders], symbol)
+                except Exception:
+                    stats["errors"] += len(symbol_orders)
+        else:
+            stats["single_requests"] = len(trade_orders)
+            results = self._concurrently(self.exchange.cancel_order, trade_orders)
+            stats["errors"] = len([e for r, e in results if e is not None])
+
+        stats["latency"] = time.monotonic() - start
+        self.last_cancel_stats = stats
+        return stats
@@ -0,0 +1,277 @@
+"""
+Hot path profiling of the main loop: monotonic timers around the cycle phases (tickers, MA, scalps, orders, journal,
+sleep), log-linear (HDR-style) latency histograms and exchange requests counted per phase. Aggregates are exported
+periodically as metrics points through the report writer.
+
+cProfile of the main thread is toggled by SIGUSR1 (the stats are dumped to the file on stop) and the stacks of all the
+threads are dumped by SIGUSR2.
+"""
+import cProfile
+import faulthandler
+import os
+import signal
+import time
+from typing import Dict, List
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear histogram of the durations in nanoseconds: values below 2**sub_bucket_bits are exact and larger values
+    fall into 2**(sub_bucket_bits - 1) sub-buckets of every power of 2, so the relative error is less than
+    1 / 2**(sub_bucket_bits - 1).
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = dict()  # type: Dict[int, int]
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int):
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value
+        return (shift << self.sub_bucket_bits) | (value >> shift)
+
+    def _value(self, index: int):
+        """
+        middle of the bucket
+        """
+        shift = index >> self.sub_bucket_bits
+        if shift == 0:
+            return index
+        mantissa = index & ((1 << self.sub_bucket_bits) - 1)
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record_ns(self, value: int):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile_ns(self, percentile: float):
+        """
+        :param percentile: 0..100
+        :return: value at percentile or 0 if empty
+        """
+        if self.count == 0:
+            return 0
+
+        rank = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    @property
+    def mean_ns(self):
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        self.counts = dict()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+class _Phase(object):
+    __slots__ = ("profiler", "name", "start", "parent")
+
+    def __init__(self, profiler: "PhaseProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.parent = self.profiler.current_phase
+        self.profiler.current_phase = self.name
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profiler.record_ns(self.name, time.perf_counter_ns() - self.start)
+        self.profiler.current_phase = self.parent
+        return False
+
+
+class _NoPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NO_PHASE = _NoPhase()
+
+
+class PhaseProfiler(object):
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.histograms = dict()  # type: Dict[str, LatencyHistogram]
+        self.requests = dict()  # type: Dict[str, int]
+        self.current_phase = None
+        self.interval_start = time.monotonic()
+
+    def phase(self, name: str):
+        """
+        context manager timing the phase. Requests made inside the phase are counted to it (to the innermost one for
+        nested phases).
+        """
+        return _Phase(self, name)
+
+    def record_ns(self, name: str, duration: int):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram(self.sub_bucket_bits)
+        histogram.record_ns(duration)
+
+    def count_request(self, requests: int = 1):
+        phase = self.current_phase if self.current_phase is not None else "other"
+        self.requests[phase] = self.requests.get(phase, 0) + requests
+
+    def points(self):
+        """
+        aggregates of the phases since the last reset, latencies in microseconds
+        :return: list of dicts, one per phase
+        """
+        interval = time.monotonic() - self.interval_start
+        points = list()
+
+        for name in sorted(set(self.histograms) | set(self.requests)):
+            h = self.histograms.get(name, LatencyHistogram(self.sub_bucket_bits))
+            points.append({"phase": name, "interval": interval, "count": h.count,
+                           "mean-us": h.mean_ns / 1000, "p50-us": h.percentile_ns(50) / 1000,
+                           "p90-us": h.percentile_ns(90) / 1000, "p99-us": h.percentile_ns(99) / 1000,
+                           "max-us": h.max / 1000, "total-ms": h.total / 1e6,
+                           "requests": self.requests.get(name, 0)})
+        return points
+
+    def summary(self, points: List[dict] = None):
+        points = points if points is not None else self.points()
+        return "Profile: " + "; ".join(["{phase} n={count} p50={p50-us:.0f}us p99={p99-us:.0f}us max={max-us:.0f}us "
+                                         "req={requests}".format(**p) for p in points])
+
+    def reset(self):
+        self.histograms = dict()
+        self.requests = dict()
+        self.interval_start = time.monotonic()
+
+
+class ProfiledExchange(object):
+    """
+    Proxy of the exchange which counts the requests to the profiler's current phase. The ccxt exchange of the wrapper
+    (_ccxt) is counted too.
+    """
+
+    REQUEST_METHODS = {"place_limit_order", "create_order", "create_orders", "cancel_order", "cancel_orders",
+                       "get_order_update", "fetch_order", "fetch_orders", "fetch_open_orders", "get_trades",
+                       "fetch_my_trades", "fetch_tickers", "fetch_ticker", "fetch_order_book", "get_tickers",
+                       "load_markets", "fetch_balance"}
+
+    _own_attributes = ("exchange", "profiler")
+
+    def __init__(self, exchange, profiler: PhaseProfiler):
+        object.__setattr__(self, "exchange", exchange)
+        object.__setattr__(self, "profiler", profiler)
+
+    def __getattr__(self, item):
+        attr = getattr(self.exchange, item)
+
+        if item == "_ccxt":
+            return ProfiledExchange(attr, self.profiler)
+
+        if item not in self.REQUEST_METHODS or not callable(attr):
+            return attr
+
+        profiler = self.profiler
+
+        def counted(*args, **kwargs):
+            profiler.count_request()
+            return attr(*args, **kwargs)
+
+        return counted
+
+    def __setattr__(self, key, value):
+        if key in self._own_attributes:
+            object.__setattr__(self, key, value)
+        else:
+            setattr(self.exchange, key, value)
+
+
+class ProfileSignals(object):
+    """
+    SIGUSR1 starts cProfile of the main thread and the next SIGUSR1 stops it and dumps the stats to
+    "{directory}/profile_{time}.prof". SIGUSR2 dumps the stacks of all threads to "{directory}/stacks.txt".
+    """
+
+    def __init__(self, directory: str, log=None):
+        """
+        :param log: function of the message to log
+        """
+        self.directory = directory
+        self.log = log
+        self.profile = None  # type: cProfile.Profile
+        self.dumps = list()
+        self._stacks_file = None
+
+    def install(self):
+        """
+        :return: False if the platform has no SIGUSR1/SIGUSR2
+        """
+        if not hasattr(signal, "SIGUSR1") or not hasattr(signal, "SIGUSR2"):
+            return False
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        signal.signal(signal.SIGUSR1, self._toggle)
+        self._stacks_file = open(os.path.join(self.directory, "stacks.txt"), "a")
+        faulthandler.register(signal.SIGUSR2, self._stacks_file, all_threads=True)
+        return True
+
+    def uninstall(self):
+        if self._stacks_file is None:
+            return
+
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        faulthandler.unregister(signal.SIGUSR2)
+        self._stacks_file.close()
+        self._stacks_file = None
+        if self.profile is not None:
+            self.toggle()
+
+    def _toggle(self, signum, frame):
+        self.toggle()
+
+    def toggle(self):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            self._log("cProfile started")
+            return None
+
+        self.profile.disable()
+        filename = os.path.join(self.directory, "profile_{}.prof".format(time.strftime("%Y%m%d_%H%M%S")))
+        self.profile.dump_stats(filename)
+        self.profile = None
+        self.dumps.append(filename)
+        self._log("cProfile stats dumped to {}".format(filename))
+        return filename
+
+    def _log(self, msg: str):
+        if self.log is not None:
+            self.log(msg)
@@ -0,0 +1,321 @@
+"""
+Recovery worker for the stalled order 2 legs. The bot hands the live order 2 over the local socket (recovery_server
+host and port) and frees the scalp's ladder slot. The worker manages the order on its own requests budget: waits for
+the fill at the target price for order2_max_updates_for_profit updates and then re-places the rest of the amount at the
+best price every order2_max_updates_market updates until it's filled.
+
+Usage:
+    python3 scalp_recovery.py [--config _config_default.json]
+"""
+import json
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, List
+
+
+class RecoveryClient(object):
+    """
+    Bot's side of the handoff: one connection per request, newline delimited json.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 2.0, retry_interval: float = 0.0):
+        """
+        :param retry_interval: seconds to skip the handoffs after the worker was not reachable
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+
+        self.failures = 0
+        self._retry_time = 0.0
+
+    def available(self):
+        """
+        :return: False while backing off after the failed handoff
+        """
+        return time.monotonic() >= self._retry_time
+
+    def request(self, message: dict):
+        with socket.create_connection((self.host, self.port), self.timeout) as s:
+            s.sendall((json.dumps(message) + "\n").encode())
+            with s.makefile("r") as f:
+                return json.loads(f.readline())
+
+    def handoff(self, leg: dict):
+        """
+        hands the leg over to the recovery worker
+        :return: True if the worker has taken the leg
+        """
+        if not self.available():
+            return False
+
+        try:
+            return self.request({"cmd": "handoff", "leg": leg}).get("ok", False)
+        except (OSError, ValueError):
+            self.failures += 1
+            self._retry_time = time.monotonic() + self.retry_interval
+            return False
+
+    def status(self):
+        return self.request({"cmd": "status"})
+
+
+class RecoveryLeg(object):
+    """
+    Order 2 leg in the recovery worker. Amounts are in the base currency of the symbol, cost - in the quote.
+    """
+
+    def __init__(self, leg_id: str, symbol: str, side: str, order_id: str, amount: float, price: float,
+                 filled: float = 0.0, cost: float = 0.0):
+        self.leg_id = leg_id
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.price = price
+
+        self.order_id = order_id  # current exchange order
+        self.order_filled = filled
+        self.order_cost = cost
+        self.updates = 0
+
+        self.filled = 0.0  # filled by the finished orders
+        self.cost = 0.0
+        self.orders = 1
+
+        self.phase = "profit"  # "profit", "market", "done"
+        self.time_received = time.time()
+
+    @classmethod
+    def from_dict(cls, leg: dict):
+        return cls(str(leg["leg_id"]), leg["symbol"], leg["side"], str(leg["order_id"]), float(leg["amount"]),
+                   float(leg["price"]), float(leg.get("filled", 0.0)), float(leg.get("cost", 0.0)))
+
+    @property
+    def total_filled(self):
+        return self.filled + self.order_filled
+
+    @property
+    def total_cost(self):
+        return self.cost + self.order_cost
+
+    @property
+    def remaining(self):
+        return self.amount - self.total_filled
+
+    def update_order(self, order: dict):
+        self.order_filled = float(order.get("filled") or 0.0)
+        cost = order.get("cost")
+        if cost is None and order.get("average") is not None:
+            cost = order["average"] * self.order_filled
+        self.order_cost = float(cost) if cost is not None else self.order_filled * self.price
+
+    def finish_order(self):
+        self.filled += self.order_filled
+        self.cost += self.order_cost
+        self.order_filled, self.order_cost = 0.0, 0.0
+        self.order_id = None
+        self.updates = 0
+
+    def result(self):
+        return {"leg-id": self.leg_id, "symbol": self.symbol, "side": self.side, "amount": self.amount,
+                "filled": self.total_filled, "cost": self.total_cost, "orders": self.orders,
+                "dest-amount": self.total_cost if self.side == "sell" else self.total_filled,
+                "recovery-time": time.time() - self.time_received}
+
+
+class _HandoffHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        worker = self.server.worker  # type: RecoveryWorker
+        try:
+            message = json.loads(self.rfile.readline().decode())
+            response = worker.handle_message(message)
+        except Exception as e:
+            response = {"ok": False, "error": "{} {}".format(type(e).__name__, e.args)}
+
+        self.wfile.write((json.dumps(response) + "\n").encode())
+
+
+class RecoveryWorker(object):
+
+    def __init__(self, bot, exchange, host: str = "localhost", port: int = 8080,
+                 max_updates_for_profit: int = 50, max_updates_market: int = 5, markets: dict = None):
+        """
+        :param bot: bot for logging, reports and cycle sleep
+        :param exchange: ccxt exchange (or exchange with the same interface: fetch_order, cancel_order, create_order,
+        fetch_ticker)
+        :param host: host to listen
+        :param port: port to listen, 0 for any free port
+        :param max_updates_for_profit: updates of the handed over order before it's re-placed at the best price
+        :param max_updates_market: updates of the order at the best price before it's re-placed
+        :param markets: ccxt markets for the min amounts
+        """
+        self.bot = bot
+        self.exchange = exchange
+        self.host = host
+        self.port = port
+        self.max_updates_for_profit = max_updates_for_profit
+        self.max_updates_market = max_updates_market
+        self.markets = markets if markets is not None else dict()
+
+        self.legs = dict()  # type: Dict[str, RecoveryLeg]
+        self.completed = list()  # type: List[dict]
+
+        self._new_legs = queue.Queue()
+        self._server = None  # type: socketserver.ThreadingTCPServer
+        self._server_thread = None  # type: threading.Thread
+        self._stop = threading.Event()
+
+    def start_server(self):
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), _HandoffHandler)
+        self._server.daemon_threads = True
+        self._server.worker = self
+        self.port = self._server.server_address[1]
+
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="RecoveryServer",
+                                               daemon=True)
+        self._server_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle_message(self, message: dict):
+        if message.get("cmd") == "handoff":
+            leg = RecoveryLeg.from_dict(message["leg"])
+            self._new_legs.put(leg)
+            return {"ok": True, "leg_id": leg.leg_id}
+
+        if message.get("cmd") == "status":
+            return {"ok": True, "legs": len(self.legs) + self._new_legs.qsize(), "completed": len(self.completed)}
+
+        return {"ok": False, "error": "Unknown command"}
+
+    def min_amount(self, symbol: str):
+        try:
+            return float(self.markets[symbol]["limits"]["amount"]["min"] or 0.0)
+        except (KeyError, TypeError):
+            return 0.0
+
+    def best_price(self, leg: RecoveryLeg):
+        ticker = self.exchange.fetch_ticker(leg.symbol)
+        return ticker["bid"] if leg.side == "sell" else ticker["ask"]
+
+    def place(self, leg: RecoveryLeg):
+        """
+        places the rest of the leg's amount at the best price or completes the leg if the rest is less than min amount
+        """
+        if leg.remaining <= max(self.min_amount(leg.symbol), 0.0) or leg.remaining <= leg.amount * 1e-9:
+            self.complete(leg)
+            return
+
+        price = self.best_price(leg)
+        order = self.exchange.create_order(leg.symbol, "limit", leg.side, leg.remaining, price)
+        leg.order_id = str(order["id"])
+        leg.price = price
+        leg.orders += 1
+        leg.phase = "market"
+        if order.get("filled") is not None:
+            leg.update_order(order)
+
+    def cancel(self, leg: RecoveryLeg):
+        try:
+            self.exchange.cancel_order(leg.order_id, leg.symbol)
+        except Exception as e:
+            self.bot.log(self.bot.LOG_ERROR, "Leg {}. Error canceling order {}: {} {}".format(
+                leg.leg_id, leg.order_id, type(e).__name__, e.args))
+
+        leg.update_order(self.exchange.fetch_order(leg.order_id, leg.symbol))
+        leg.finish_order()
+
+    def complete(self, leg: RecoveryLeg):
+        leg.phase = "done"
+        self.legs.pop(leg.leg_id, None)
+
+        result = leg.result()
+        self.completed.append(result)
+        self.bot.log(self.bot.LOG_INFO, "Leg {} recovered: filled {}/{} {} in {} orders".format(
+            leg.leg_id, result["filled"], leg.amount, leg.symbol, leg.orders))
+        self.bot.send_remote_report(result)
+
+    def proceed_leg(self, leg: RecoveryLeg):
+        if leg.order_id is None:
+            self.place(leg)
+            return
+
+        order = self.exchange.fetch_order(leg.order_id, leg.symbol)
+        leg.update_order(order)
+        leg.updates += 1
+
+        if order.get("status") == "closed" or leg.remaining <= leg.amount * 1e-9:
+            leg.finish_order()
+            self.complete(leg)
+            return
+
+        if order.get("status") == "canceled":
+            leg.finish_order()
+            self.place(leg)
+            return
+
+        max_updates = self.max_updates_for_profit if leg.phase == "profit" else self.max_updates_market
+        if leg.updates >= max_updates:
+            self.cancel(leg)
+            self.place(leg)
+
+    def proceed(self):
+        """
+        one cycle of the worker: takes the new legs and updates all the legs
+        """
+        while not self._new_legs.empty():
+            leg = self._new_legs.get_nowait()
+            self.legs[leg.leg_id] = leg
+            self.bot.log(self.bot.LOG_INFO, "Leg {} received: {} {} {} order {}".format(
+                leg.leg_id, leg.side, leg.amount, leg.symbol, leg.order_id))
+
+        for leg in list(self.legs.values()):
+            try:
+                self.proceed_leg(leg)
+            except Exception as e:
+                self.bot.log(self.bot.LOG_ERROR, "Leg {}. Error: {} {}".format(leg.leg_id, type(e).__name__,
+                                                                              e.args))
+
+    def run(self):
+        self.start_server()
+        self.bot.log(self.bot.LOG_INFO, "Recovery worker is listening on {}:{}".format(self.host, self.port))
+
+        while not self._stop.is_set():
+            self.proceed()
+            self._stop.wait(self.bot.cycle_sleep() if len(self.legs) > 0 else self.bot.om_proceed_sleep)
+
+
+if __name__ == "__main__":
+    from scalp_bot import ScalpBot
+
+    bot = ScalpBot("_config_default.json", "scalp_recovery.log")
+    bot.set_from_cli(sys.argv[1:])
+    bot.load_config_from_file(bot.config_filename)
+
+    if bot.recovery_max_requests_per_lap > 0:
+        bot.max_requests_per_lap = bot.recovery_max_requests_per_lap  # worker's own requests budget
+
+    bot.init_exchange()
+    bot.init_remote_reports()
+    bot.load_markets()
+
+    worker = RecoveryWorker(bot, bot.exchange._ccxt, bot.recovery_server["host"], bot.recovery_server["port"],
+                            bot.order2_max_updates_for_profit, bot.order2_max_updates_market,
+                            getattr(bot, "markets", None))
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+    sys.exit(0)
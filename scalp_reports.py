@@ -0,0 +1,226 @@
+import csv
+import datetime
+import os
+import queue
+import threading
+import time
+from typing import List
+
+
+class ReportWriter(object):
+    """
+    Background writer of the closed scalps reports. Reports are queued from the trading loop and the worker thread
+    writes them in bulk to one rolling csv file per day and sends them to InfluxDB in batches, when batch size is
+    reached or flush interval passed. So reports I/O never blocks orders handling.
+
+    If InfluxDB client is not installed or "influxdb" is not configured the reports are sent by the bot's
+    send_remote_report() from the worker thread.
+    """
+
+    def __init__(self, bot, directory: str = None, batch_size: int = 100, flush_interval: float = 5.0,
+                 influxdb: dict = None, history=None):
+        """
+        :param bot: ScalpBot
+        :param directory: directory for the csv files. "_{exchange_id}" by default
+        :param batch_size: max reports in batch
+        :param flush_interval: max seconds between report queued and written
+        :param influxdb: dict with "host", "port", "db" and "measurement"
+        :param history: HistoryStore the reports are appended to
+        """
+        self.bot = bot
+        self.directory = directory if directory is not None else "_{}".format(bot.exchange_id)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.influxdb = influxdb
+        self.history = history
+
+        self.reports_written = 0
+        self.batches_written = 0
+        self.errors = 0
+
+        self._queue = queue.Queue()
+        self._thread = None  # type: threading.Thread
+        self._stop = threading.Event()
+
+        self._file = None
+        self._file_name = None
+        self._writer = None  # type: csv.DictWriter
+        self._fieldnames = None  # type: List[str]
+
+        self._influx_client = None
+        self._influx_client_failed = False
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ReportWriter", daemon=True)
+        self._thread.start()
+
+    def put(self, report: dict):
+        """
+        queues the report. Never blocks.
+        """
+        self._queue.put_nowait((report, list(self.bot.report_fields)))
+
+    def put_metrics(self, points: List[dict]):
+        """
+        queues the metrics points (e.g. profiling aggregates). They are sent to remote reports only, not to csv.
+        """
+        for point in points:
+            self._queue.put_nowait((point, None))
+
+    def stop(self, timeout: float = None):
+        """
+        writes all the queued reports and stops the worker thread
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        self._close_file()
+
+    def _run(self):
+        batch = list()
+        batch_start = None
+
+        while True:
+            try:
+                timeout = self.flush_interval if batch_start is None \
+                    else max(0.0, self.flush_interval - (time.monotonic() - batch_start))
+                batch.append(self._queue.get(timeout=timeout if not self._stop.is_set() else 0.0))
+                if batch_start is None:
+                    batch_start = time.monotonic()
+
+            except queue.Empty:
+                if self._stop.is_set():
+                    self.flush(batch)
+                    return
+
+            if len(batch) >= self.batch_size or \
+                    (batch_start is not None and time.monotonic() - batch_start >= self.flush_interval):
+                self.flush(batch)
+                batch = list()
+                batch_start = None
+
+    def flush(self, batch: list):
+        """
+        writes the batch of (report, report_fields) to csv file and remote reports
+        """
+        if len(batch) == 0:
+            return
+
+        try:
+            self.write_csv(batch)
+        except Exception as e:
+            self.errors += 1
+            self.bot.log(self.bot.LOG_ERROR, "Error writing reports csv: {} {}".format(type(e).__name__, e.args))
+
+        if self.history is not None:
+            try:
+                self.history.append_reports([report for report, fieldnames in batch if fieldnames is not None])
+            except Exception as e:
+                self.errors += 1
+                self.bot.log(self.bot.LOG_ERROR, "Error writing reports history: {} {}".format(type(e).__name__,
+                                                                                               e.args))
+
+        try:
+            self.send_remote(batch)
+        except Exception as e:
+            self.errors += 1
+            self.bot.log(self.bot.LOG_ERROR, "Error sending remote reports: {} {}".format(type(e).__name__, e.args))
+
+        self.reports_written += len(batch)
+        self.batches_written += 1
+
+    def _open_file(self, fieldnames: List[str]):
+        """
+        opens the csv file of the current day. New part of the file is started if report fields were changed.
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        day = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d")
+        base_name = os.path.join(self.directory, "scalps_{}".format(day))
+        file_name = "{}.csv".format(base_name)
+        part = 0
+
+        while os.path.isfile(file_name) and not self._header_matches(file_name, fieldnames):
+            part += 1
+            file_name = "{}_{}.csv".format(base_name, part)
+
+        write_header = not os.path.isfile(file_name)
+
+        self._file = open(file_name, "a", newline="")
+        self._file_name = file_name
+        self._fieldnames = fieldnames
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+        if write_header:
+            self._writer.writeheader()
+
+    @staticmethod
+    def _header_matches(file_name: str, fieldnames: List[str]):
+        with open(file_name, newline="") as f:
+            header = next(csv.reader(f), None)
+        return header == fieldnames
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._file_name = None
+
+    def write_csv(self, batch: list):
+        batch = [(report, fieldnames) for report, fieldnames in batch if fieldnames is not None]
+        if len(batch) == 0:
+            return
+
+        for report, fieldnames in batch:
+            day_file = "scalps_{}".format(datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d"))
+
+            if self._file is None or fieldnames != self._fieldnames \
+                    or not os.path.basename(self._file_name).startswith(day_file):
+                self._close_file()
+                self._open_file(fieldnames)
+
+            self._writer.writerow(report)
+
+        self._file.flush()
+
+    def _get_influx_client(self):
+        if self._influx_client is not None or self._influx_client_failed or not self.influxdb:
+            return self._influx_client
+
+        try:
+            from influxdb import InfluxDBClient
+            self._influx_client = InfluxDBClient(self.influxdb["host"], self.influxdb["port"],
+                                                 database=self.influxdb["db"])
+        except Exception as e:
+            self._influx_client_failed = True
+            self.bot.log(self.bot.LOG_ERROR, "InfluxDB client is not available: {} {}. Reports will be sent one by "
+                                             "one".format(type(e).__name__, e.args))
+        return self._influx_client
+
+    def influx_point(self, report: dict, metrics: bool = False):
+        """
+        :param metrics: metrics point goes to the "{measurement}_metrics" measurement with its phase as the tag
+        """
+        tags = {"server_id": getattr(self.bot, "server_id", ""),
+                "script_id": getattr(self.bot, "script_id", ""),
+                "exchange_id": self.bot.exchange_id}
+        tag_field = "phase" if metrics else "symbol"
+        tags[tag_field] = report.get(tag_field, "")
+
+        return {"measurement": self.influxdb["measurement"] + ("_metrics" if metrics else ""),
+                "tags": tags,
+                "fields": {k: v for k, v in report.items()
+                           if isinstance(v, (int, float, str)) and not isinstance(v, bool) and k != tag_field}}
+
+    def send_remote(self, batch: list):
+        client = self._get_influx_client()
+
+        if client is None:
+            for report, fieldnames in batch:
+                self.bot.send_remote_report(report)
+            return
+
+        client.write_points([self.influx_point(report, fieldnames is None) for report, fieldnames in batch])
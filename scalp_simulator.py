@@ -0,0 +1,564 @@
+"""
+In-process exchange simulator for load testing of the order path without network. It's used as the ccxt exchange of
+the bot's exchange wrapper (_ccxt), so the order manager, batched orders and the recovery worker make their usual
+requests to it.
+
+The market is replayed from the tickers csv (the offline tickers file format) or generated by the seeded random walk.
+Limit orders are matched against the best bid and ask of every tick: the order at the best price waits for the market
+volume ahead of it in the queue and gets partial fills from the traded volume, the order inside the spread is the new
+best price and gets the traded volume first, the order crossed by the opposite side of the market is filled completely.
+The virtual clock is advanced by the modeled latency of every request, the market moves by one tick every tick_interval
+of the virtual time (or on fetch_tickers if the market did not move since the last one). Requests could fail by the
+injected error rates and the orders could be scripted by the offline orders files (test_data/orders_*.json).
+With the same seed and requests the results are the same.
+"""
+import bisect
+import copy
+import csv
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+try:
+    # errors are ccxt ones, so the exchange wrapper and the order manager handle them as the exchange's errors
+    from ccxt.base.errors import NetworkError as _CcxtNetworkError, ExchangeError as _CcxtExchangeError, \
+        OrderNotFound as _CcxtOrderNotFound, InvalidOrder as _CcxtInvalidOrder
+except ImportError:
+    _CcxtNetworkError = _CcxtExchangeError = _CcxtOrderNotFound = _CcxtInvalidOrder = Exception
+
+
+class SimulatorError(Exception):
+    pass
+
+
+class NetworkError(SimulatorError, _CcxtNetworkError):
+    """
+    request failed before reaching the matching engine
+    """
+    pass
+
+
+class ExchangeError(SimulatorError, _CcxtExchangeError):
+    pass
+
+
+class OrderNotFound(ExchangeError, _CcxtOrderNotFound):
+    pass
+
+
+class InvalidOrder(ExchangeError, _CcxtInvalidOrder):
+    pass
+
+
+def replay_tickers_csv(filename: str) -> Iterator[Dict[str, tuple]]:
+    """
+    ticks from the tickers csv: fetch_id, timestamp, symbol, ask, bid, askVolume, bidVolume. Rows of the same fetch_id
+    are one tick.
+
+    :return: iterator of dicts symbol: (timestamp, bid, ask, bidVolume, askVolume)
+    """
+    with open(filename, newline="") as f:
+        tick = dict()
+        fetch_id = None
+        for row in csv.DictReader(f):
+            if row["fetch_id"] != fetch_id and len(tick) > 0:
+                yield tick
+                tick = dict()
+            fetch_id = row["fetch_id"]
+            tick[row["symbol"]] = (int(row["timestamp"]), float(row["bid"]), float(row["ask"]),
+                                   float(row["bidVolume"]), float(row["askVolume"]))
+        if len(tick) > 0:
+            yield tick
+
+
+def random_walk_tickers(prices: Dict[str, float], tick_sizes: Dict[str, float], volatility: float = 1.0,
+                        volume: float = 10.0, seed: int = 0, start_timestamp: int = 1527000000000,
+                        tick_interval: float = 1.0) -> Iterator[Dict[str, tuple]]:
+    """
+    endless ticks of the symbols: the mid price of every symbol moves by the random number of ticks (normal with the
+    volatility deviation) and the spread is one tick.
+
+    :param prices: symbol: start price
+    :param tick_sizes: symbol: price tick
+    :param volume: mean volume of the best bid and ask
+    """
+    rng = random.Random(seed)
+    levels = {symbol: int(round(price / tick_sizes[symbol])) for symbol, price in prices.items()}
+    step = 0
+
+    while True:
+        timestamp = start_timestamp + int(step * tick_interval * 1000)
+        tick = dict()
+        for symbol in sorted(levels):
+            levels[symbol] = max(1, levels[symbol] + int(round(rng.gauss(0.0, volatility))))
+            tick_size = tick_sizes[symbol]
+            tick[symbol] = (timestamp, levels[symbol] * tick_size, (levels[symbol] + 1) * tick_size,
+                            volume * 2 * rng.random(), volume * 2 * rng.random())
+        yield tick
+        step += 1
+
+
+class LatencyModel(object):
+    """
+    Latency of the requests in seconds: base + jitter * uniform(0, 1) of the request's method or of the "default".
+    """
+
+    def __init__(self, latency: Dict[str, List[float]] = None, seed: int = 0):
+        """
+        :param latency: method: [base, jitter]
+        """
+        self.latency = dict(latency) if latency is not None else dict()
+        self.default = self.latency.get("default", [0.0, 0.0])
+        self._random = random.Random(seed).random
+
+    def sample(self, method: str):
+        base, jitter = self.latency.get(method, self.default)
+        return base + jitter * self._random() if jitter > 0 else base
+
+
+class _SimOrder(object):
+    __slots__ = ("id", "symbol", "side", "price", "level", "amount", "filled", "cost", "status", "timestamp",
+                 "queue_ahead", "script", "response")
+
+    def __init__(self, order_id: str, symbol: str, side: str, price: float, amount: float, timestamp: int):
+        self.id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.level = round(price, 10)
+        self.amount = amount
+        self.filled = 0.0
+        self.cost = 0.0
+        self.status = "open"
+        self.timestamp = timestamp
+        self.queue_ahead = 0.0
+        self.script = None  # type: deque
+        self.response = None  # type: dict
+
+    @property
+    def remaining(self):
+        return self.amount - self.filled
+
+
+class SimulatedExchange(object):
+    """
+    ccxt-like exchange on the simulated matching engine. Thread safe, requests are processed one by one.
+    """
+
+    def __init__(self, markets: dict, ticks: Iterator[Dict[str, tuple]], exchange_id: str = "simulator",
+                 latency: Dict[str, List[float]] = None, errors: Dict[str, float] = None, seed: int = 0,
+                 tick_interval: float = 1.0, trade_ratio: float = 0.5, level_volume: float = 10.0,
+                 fee: float = 0.001, realtime: bool = False):
+        """
+        :param markets: ccxt markets
+        :param ticks: market ticks, see replay_tickers_csv()
+        :param latency: method: [base, jitter] in seconds, "default" for the methods not set
+        :param errors: method: rate of the NetworkError, "default" for the methods not set
+        :param tick_interval: virtual seconds between the ticks, the market moves only on fetch_tickers if 0
+        :param trade_ratio: traded volume at the best price per tick as the part of the best price's volume
+        :param level_volume: market volume ahead of the order placed behind the best price
+        :param realtime: sleep for the latency of the request (otherwise only the virtual clock is advanced)
+        """
+        self.id = exchange_id
+        self.markets = dict()
+        self.symbols = list()
+        self.set_markets(list(markets.values()))
+
+        self.has = {"fetchTickers": True, "fetchOrderBook": True, "fetchOpenOrders": True, "fetchMyTrades": True,
+                    "createOrders": True, "cancelOrders": True}
+
+        self.latency = LatencyModel(latency, seed)
+        self.errors = dict(errors) if errors is not None else dict()
+        self._error_random = random.Random(seed + 1).random
+        self.tick_interval = tick_interval
+        self.trade_ratio = trade_ratio
+        self.level_volume = level_volume
+        self.fee = fee
+        self.realtime = realtime
+
+        self.clock = 0.0  # virtual seconds since the start
+        self._ticks = iter(ticks)
+        self.tick = dict()  # type: Dict[str, tuple]
+        self.tick_index = -1
+        self.ticks_exhausted = False
+        self._fetched_tick_index = -1
+        self.start_timestamp = None
+
+        self.orders = dict()  # type: Dict[str, _SimOrder]
+        self._levels = dict()  # (symbol, side): {level: [orders]}
+        self._prices = dict()  # (symbol, side): sorted levels
+        self.trades = dict()  # type: Dict[str, List[dict]]
+        self._next_id = 1
+        self._next_trade_id = 1
+        self._scripts = deque()
+
+        self.requests = dict()  # type: Dict[str, int]
+        self.request_errors = dict()  # type: Dict[str, int]
+        self.latency_total = 0.0
+        self.fills = 0
+
+        self._lock = threading.RLock()
+        self._advance_tick()
+
+    @classmethod
+    def from_files(cls, markets_file: str, tickers_file: str, **kwargs):
+        with open(markets_file) as f:
+            markets = json.load(f)
+        return cls(markets, replay_tickers_csv(tickers_file), **kwargs)
+
+    # markets
+
+    def set_markets(self, markets: List[dict], currencies=None):
+        self.markets = {m["symbol"]: m for m in markets}
+        self.symbols = sorted(self.markets)
+        return self.markets
+
+    def load_markets(self, reload: bool = False, params: dict = None):
+        with self._request("load_markets"):
+            return self.markets
+
+    def _precision(self, symbol: str, key: str):
+        market = self.markets.get(symbol)
+        precision = market.get("precision", dict()).get(key) if market is not None else None
+        return precision if precision is not None else 8
+
+    def amount_to_precision(self, symbol: str, amount: float):
+        digits = 10 ** self._precision(symbol, "amount")
+        return str(math.floor(float(amount) * digits + 1e-9) / digits)
+
+    def price_to_precision(self, symbol: str, price: float):
+        return str(round(float(price), self._precision(symbol, "price")))
+
+    # virtual clock and market
+
+    @property
+    def timestamp(self):
+        return self.start_timestamp + int(self.clock * 1000)
+
+    @contextmanager
+    def _request(self, method: str):
+        latency = self.latency.sample(method)
+        if self.realtime and latency > 0:
+            time.sleep(latency)
+
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            self.latency_total += latency
+            self.clock += latency
+            self._advance_market()
+
+            rate = self.errors.get(method, self.errors.get("default", 0.0))
+            if rate > 0 and self._error_random() < rate:
+                self.request_errors[method] = self.request_errors.get(method, 0) + 1
+                raise NetworkError("{} {}: simulated network error".format(self.id, method))
+
+            yield
+
+    def advance(self, seconds: float):
+        """
+        advances the virtual clock and the market
+        """
+        with self._lock:
+            self.clock += seconds
+            self._advance_market()
+
+    def _advance_market(self):
+        if self.tick_interval <= 0:
+            return
+
+        target = int(self.clock / self.tick_interval)
+        while self.tick_index < target and not self.ticks_exhausted:
+            self._advance_tick()
+
+    def _advance_tick(self):
+        try:
+            tick = next(self._ticks)
+        except StopIteration:
+            self.ticks_exhausted = True
+            return False
+
+        self.tick_index += 1
+        self.tick.update(tick)
+        if self.start_timestamp is None:
+            self.start_timestamp = min([t[0] for t in tick.values()]) if len(tick) > 0 else 0
+
+        for symbol, (timestamp, bid, ask, bid_volume, ask_volume) in tick.items():
+            bid, ask = round(bid, 10), round(ask, 10)
+            self._match(symbol, "buy", bid, ask, bid_volume * self.trade_ratio)
+            self._match(symbol, "sell", ask, bid, ask_volume * self.trade_ratio)
+        return True
+
+    def _match(self, symbol: str, side: str, best: float, opposite: float, traded: float):
+        """
+        fills the resting orders of the side crossed by the opposite side of the market (buy at or above the ask, sell
+        at or below the bid) completely. Orders inside the spread are the new best price: they get the traded volume
+        first and then the orders at the best price after the volume ahead of them in the queue.
+        """
+        prices = self._prices.get((symbol, side))
+        if not prices:
+            return
+
+        levels = self._levels[(symbol, side)]
+
+        if side == "buy":
+            crossed = prices[bisect.bisect_left(prices, opposite):]
+            top = prices[bisect.bisect_left(prices, best):bisect.bisect_left(prices, opposite)][::-1]
+        else:
+            crossed = prices[:bisect.bisect_right(prices, opposite)]
+            top = prices[bisect.bisect_right(prices, opposite):bisect.bisect_right(prices, best)]
+
+        for level in crossed:
+            for order in list(levels[level]):
+                self._fill(order, order.remaining, order.price)
+
+        if traded <= 0:
+            return
+
+        budget = traded
+        for level in top:
+            available = budget
+            for order in list(levels[level]):
+                if level != best:
+                    order.queue_ahead = 0.0  # nothing ahead of the order improving the best price
+                past_queue = available - order.queue_ahead
+                order.queue_ahead = max(0.0, order.queue_ahead - available)
+                if past_queue <= 0 or budget <= 0:
+                    continue
+                amount = min(order.remaining, past_queue, budget)
+                budget -= amount
+                self._fill(order, amount, order.price)
+
+            if budget <= 0:
+                break
+
+    def _fill(self, order: _SimOrder, amount: float, price: float):
+        order.filled += amount
+        order.cost += amount * price
+        self.fills += 1
+
+        self.trades.setdefault(order.symbol, list()).append({
+            "id": str(self._next_trade_id), "order": order.id, "symbol": order.symbol, "side": order.side,
+            "price": price, "amount": amount, "cost": amount * price, "timestamp": self.timestamp,
+            "fee": {"cost": amount * price * self.fee, "currency": order.symbol.split("/")[1]}})
+        self._next_trade_id += 1
+
+        if order.remaining <= order.amount * 1e-9:
+            order.filled = order.amount
+            order.status = "closed"
+            self._unrest(order)
+
+    def _rest(self, order: _SimOrder):
+        key = (order.symbol, order.side)
+        levels = self._levels.setdefault(key, dict())
+        level_orders = levels.get(order.level)
+        if level_orders is None:
+            level_orders = levels[order.level] = list()
+            bisect.insort(self._prices.setdefault(key, list()), order.level)
+        level_orders.append(order)
+
+    def _unrest(self, order: _SimOrder):
+        key = (order.symbol, order.side)
+        levels = self._levels.get(key)
+        level_orders = levels.get(order.level) if levels is not None else None
+        if level_orders is None or order not in level_orders:
+            return
+
+        level_orders.remove(order)
+        if len(level_orders) == 0:
+            del levels[order.level]
+            prices = self._prices[key]
+            del prices[bisect.bisect_left(prices, order.level)]
+
+    # orders
+
+    def script_orders(self, filename: str, count: int = 1):
+        """
+        next created orders are answered by the offline orders file: the "create" response and then the "updates" one
+        by one for fetch_order. ExchangeError is raised when the updates are over (test_data/orders_binance_error.json).
+        """
+        with open(filename) as f:
+            script = json.load(f)
+        for i in range(count):
+            self._scripts.append(script)
+
+    def _scripted_response(self, order: _SimOrder, response: dict):
+        response = copy.deepcopy(response)
+        response["id"] = order.id
+        order.response = response
+        return response
+
+    def _create_order(self, symbol: str, order_type: str, side: str, amount: float, price: float = None):
+        if symbol not in self.markets:
+            raise ExchangeError("{} does not have market symbol {}".format(self.id, symbol))
+        if order_type != "limit" or price is None or price <= 0:
+            raise InvalidOrder("{} supports limit orders only".format(self.id))
+        if side not in ("buy", "sell") or amount <= 0:
+            raise InvalidOrder("{} invalid order {} {}".format(self.id, side, amount))
+
+        order = _SimOrder(str(self._next_id), symbol, side, float(price), float(amount), self.timestamp)
+        self._next_id += 1
+        self.orders[order.id] = order
+
+        if len(self._scripts) > 0:
+            script = self._scripts.popleft()
+            order.script = deque(script.get("updates", list()))
+            return self._scripted_response(order, script["create"])
+
+        ticker = self.tick.get(symbol)
+        if ticker is not None:
+            timestamp, bid, ask, bid_volume, ask_volume = ticker
+            if side == "buy" and order.price >= ask:
+                self._fill(order, min(order.remaining, ask_volume), ask)
+            elif side == "sell" and order.price <= bid:
+                self._fill(order, min(order.remaining, bid_volume), bid)
+
+            if order.status == "open":
+                best, best_volume = (round(bid, 10), bid_volume) if side == "buy" else (round(ask, 10), ask_volume)
+                if order.level == best:
+                    order.queue_ahead = best_volume
+                elif (order.level > best) == (side == "buy"):
+                    order.queue_ahead = 0.0  # inside the spread: the new best price
+                else:
+                    order.queue_ahead = self.level_volume
+
+        if order.status == "open":
+            self._rest(order)
+
+        return self._order_response(order)
+
+    def _order_response(self, order: _SimOrder):
+        if order.script is not None:
+            return order.response
+
+        return {"id": order.id, "symbol": order.symbol, "type": "limit", "side": order.side, "price": order.price,
+                "amount": order.amount, "filled": order.filled, "remaining": order.remaining, "cost": order.cost,
+                "average": order.cost / order.filled if order.filled > 0 else None, "status": order.status,
+                "timestamp": order.timestamp, "datetime": None, "lastTradeTimestamp": None, "fee": None,
+                "info": {"queue_ahead": order.queue_ahead}}
+
+    def _get_order(self, order_id):
+        order = self.orders.get(str(order_id))
+        if order is None:
+            raise OrderNotFound("{} order {} not found".format(self.id, order_id))
+        return order
+
+    def create_order(self, symbol: str, type: str, side: str, amount: float, price: float = None, params: dict = None):
+        with self._request("create_order"):
+            return self._create_order(symbol, type, side, amount, price)
+
+    def create_orders(self, orders: List[dict], params: dict = None):
+        """
+        orders of one request are placed at the same time, the failed ones are returned with the "rejected" status
+        """
+        with self._request("create_orders"):
+            responses = list()
+            for o in orders:
+                try:
+                    responses.append(self._create_order(o["symbol"], o["type"], o["side"], o["amount"],
+                                                        o.get("price")))
+                except ExchangeError as e:
+                    responses.append({"id": None, "symbol": o["symbol"], "status": "rejected", "info": str(e)})
+            return responses
+
+    def fetch_order(self, id: str, symbol: str = None, params: dict = None):
+        with self._request("fetch_order"):
+            order = self._get_order(id)
+            if order.script is None:
+                return self._order_response(order)
+
+            if len(order.script) == 0:
+                raise ExchangeError("{} order {}: no more updates".format(self.id, order.id))
+            return self._scripted_response(order, order.script.popleft())
+
+    def fetch_open_orders(self, symbol: str = None, since: int = None, limit: int = None, params: dict = None):
+        with self._request("fetch_open_orders"):
+            return [self._order_response(o) for o in self.orders.values()
+                    if o.status == "open" and o.script is None and (symbol is None or o.symbol == symbol)]
+
+    def _cancel_order(self, id: str):
+        order = self._get_order(id)
+        if order.script is not None:
+            return order.response
+
+        if order.status != "open":
+            raise OrderNotFound("{} order {} is {}".format(self.id, order.id, order.status))
+
+        order.status = "canceled"
+        self._unrest(order)
+        return self._order_response(order)
+
+    def cancel_order(self, id: str, symbol: str = None, params: dict = None):
+        with self._request("cancel_order"):
+            return self._cancel_order(id)
+
+    def cancel_orders(self, ids: List[str], symbol: str = None, params: dict = None):
+        with self._request("cancel_orders"):
+            responses = list()
+            for order_id in ids:
+                try:
+                    responses.append(self._cancel_order(order_id))
+                except ExchangeError as e:
+                    responses.append({"id": order_id, "status": "rejected", "info": str(e)})
+            return responses
+
+    def fetch_my_trades(self, symbol: str = None, since: int = None, limit: int = None, params: dict = None):
+        with self._request("fetch_my_trades"):
+            trades = self.trades.get(symbol, list()) if symbol is not None \
+                else [t for symbol_trades in self.trades.values() for t in symbol_trades]
+            if since is not None:
+                trades = [t for t in trades if t["timestamp"] >= since]
+            return trades[-limit:] if limit else list(trades)
+
+    # market data
+
+    def _ticker(self, symbol: str):
+        timestamp, bid, ask, bid_volume, ask_volume = self.tick[symbol]
+        return {"symbol": symbol, "timestamp": self.timestamp, "datetime": None, "bid": bid, "ask": ask,
+                "bidVolume": bid_volume, "askVolume": ask_volume, "last": (bid + ask) / 2}
+
+    def fetch_tickers(self, symbols: List[str] = None, params: dict = None):
+        """
+        the market moves at least by one tick since the last fetch_tickers, as the offline tickers
+        """
+        with self._request("fetch_tickers"):
+            if self.tick_index == self._fetched_tick_index and not self.ticks_exhausted:
+                self.clock = max(self.clock, (self.tick_index + 1) * self.tick_interval)
+                self._advance_tick()
+            self._fetched_tick_index = self.tick_index
+
+            symbols = symbols if symbols is not None else list(self.tick)
+            return {symbol: self._ticker(symbol) for symbol in symbols if symbol in self.tick}
+
+    def fetch_ticker(self, symbol: str, params: dict = None):
+        with self._request("fetch_ticker"):
+            if symbol not in self.tick:
+                raise ExchangeError("{} has no ticker of {}".format(self.id, symbol))
+            return self._ticker(symbol)
+
+    def fetch_order_book(self, symbol: str, limit: int = None, params: dict = None):
+        """
+        best bid and ask of the tick and the deeper levels of level_volume every price tick
+        """
+        with self._request("fetch_order_book"):
+            if symbol not in self.tick:
+                raise ExchangeError("{} has no ticker of {}".format(self.id, symbol))
+
+            timestamp, bid, ask, bid_volume, ask_volume = self.tick[symbol]
+            tick_size = 10 ** -self._precision(symbol, "price")
+            depth = limit if limit else 20
+            return {"symbol": symbol, "timestamp": self.timestamp,
+                    "bids": [[bid - i * tick_size, bid_volume if i == 0 else self.level_volume] for i in range(depth)],
+                    "asks": [[ask + i * tick_size, ask_volume if i == 0 else self.level_volume] for i in range(depth)]}
+
+    def stats(self):
+        with self._lock:
+            return {"requests": sum(self.requests.values()), "errors": sum(self.request_errors.values()),
+                    "latency": self.latency_total, "clock": self.clock, "tick": self.tick_index,
+                    "orders": len(self.orders), "fills": self.fills,
+                    "open_orders": sum([len(o) for levels in self._levels.values() for o in levels.values()])}
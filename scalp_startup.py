@@ -0,0 +1,96 @@
+"""
+Fast startup: markets are taken from the local versioned binary cache instead of the full markets download (stale
+cache is refreshed in the background) and the startup phases are timed.
+"""
+import os
+import pickle
+import struct
+import time
+from typing import List, Tuple
+
+MARKETS_CACHE_MAGIC = b"SCALPMKT"
+MARKETS_CACHE_VERSION = 1
+_HEADER = struct.Struct("<8sHHd")  # magic, version, length of exchange id, saved time
+
+
+class MarketsCache(object):
+    """
+    Markets of the exchange pickled with the header: magic, format version, exchange id and the time when saved. The
+    cache of the other version or exchange is ignored.
+    """
+
+    def __init__(self, filename: str, exchange_id: str):
+        self.filename = filename
+        self.exchange_id = exchange_id
+
+    def load(self):
+        """
+        :return: tuple of markets and the time when they were saved or None if there is no valid cache
+        """
+        try:
+            with open(self.filename, "rb") as f:
+                magic, version, id_len, saved_time = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != MARKETS_CACHE_MAGIC or version != MARKETS_CACHE_VERSION \
+                        or f.read(id_len).decode() != self.exchange_id:
+                    return None
+
+                return pickle.load(f), saved_time
+
+        except (OSError, struct.error, pickle.UnpicklingError, EOFError, UnicodeDecodeError):
+            return None
+
+    def save(self, markets: dict):
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        exchange_id = self.exchange_id.encode()
+        tmp_file = self.filename + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(_HEADER.pack(MARKETS_CACHE_MAGIC, MARKETS_CACHE_VERSION, len(exchange_id), time.time()))
+            f.write(exchange_id)
+            pickle.dump(markets, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_file, self.filename)
+
+
+class StartupTimings(object):
+    """
+    Durations of the startup phases
+    """
+
+    def __init__(self):
+        self.phases = list()  # type: List[Tuple[str, float]]
+
+    def add(self, phase: str, duration: float):
+        self.phases.append((phase, duration))
+
+    def phase(self, name: str):
+        """
+        context manager timing the phase
+        """
+        return _Phase(self, name)
+
+    @property
+    def total(self):
+        return sum([d for p, d in self.phases])
+
+    def summary(self):
+        return "Startup {:.1f} ms: {}".format(self.total * 1000,
+                                              ", ".join(["{} {:.1f}".format(p, d * 1000) for p, d in self.phases]))
+
+
+class _Phase(object):
+
+    def __init__(self, timings: StartupTimings, name: str):
+        self.timings = timings
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.timings.add(self.name, time.monotonic() - self.start)
+        return False
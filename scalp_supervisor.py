@@ -0,0 +1,296 @@
+"""
+Supervisor of the bot's shards: every shard (exchange, account and its symbols) is run by the own ScalpBot in the
+worker process with the own requests budget, log file and data directory. Crashed workers are restarted with the
+exponential backoff, health and PnL points of the shards are merged into one stream: logged and appended to the
+supervisor's metrics file.
+
+Shards are taken from the "shards" list of the config, every item overrides the bot's config parameters:
+    {"name": "binance-main", "exchange_id": "binance", "api_key": {...}, "max_requests_per_lap": 1000,
+     "symbols": [{"symbol": "ETH/BTC", "start_currency": "BTC", "dest_currency": "ETH"}]}
+
+Usage:
+    python3 scalp_supervisor.py [--config _config_default.json]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Dict, List
+
+logger = logging.getLogger("scalp_supervisor")
+
+
+def run_shard(shard: dict, config_filename: str, metrics_queue):
+    """
+    worker process: runs the shard's bot until its lanes are done. Health points of the lanes are put to the
+    metrics queue with the shard's name.
+    """
+    import scalp
+
+    name = shard["name"]
+    overrides = {k: v for k, v in shard.items() if k != "name"}
+    overrides.setdefault("data_dir", os.path.join("_shards", name))
+
+    bot = scalp.init_bot(["--config", config_filename], overrides, "scalp_{}.log".format(name))
+    bot.health_sink = lambda point: metrics_queue.put(dict(point, shard=name))
+    signal.signal(signal.SIGINT, _interrupt_once)
+
+    try:
+        scalp.run_bot(bot)
+    except KeyboardInterrupt:
+        bot.log(bot.LOG_INFO, "Shard {}: stopped by the supervisor".format(name))
+
+
+def _interrupt_once(signum, frame):
+    """
+    SIGINT handler of the worker: the repeated signals (e.g. Ctrl-C of the terminal and then the supervisor's stop) do
+    not interrupt closing the journal and reports
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def merge_health(points: Dict[str, dict]):
+    """
+    merges the last health points of the shards: counts are summed, results and balance changes are summed by currency
+
+    :param points: shard name: last health point
+    """
+    merged = {"active_scalps": 0, "order1": 0, "order2": 0, "open_orders": 0, "lanes": 0, "lanes_done": 0,
+              "result": dict(), "balance_diff": dict()}
+
+    for point in points.values():
+        for key in ("active_scalps", "order1", "order2", "open_orders", "lanes", "lanes_done"):
+            merged[key] += point.get(key, 0)
+
+        for key in ("result", "balance_diff"):
+            for currency, amount in point.get(key, dict()).items():
+                merged[key][currency] = merged[key].get(currency, 0.0) + amount
+
+    return merged
+
+
+class ShardWorker(object):
+    """
+    Worker process of the shard and its restarts
+    """
+
+    def __init__(self, shard: dict):
+        self.shard = shard
+        self.name = shard["name"]
+        self.process = None  # type: multiprocessing.Process
+        self.started_time = 0.0
+        self.next_start_time = 0.0
+        self.restarts = 0  # total
+        self.failures = 0  # in a row, the backoff is taken by them
+        self.finished = False  # lanes are done
+        self.failed = False  # max_restarts reached
+        self.health = None  # type: dict
+        self.health_time = 0.0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class ShardSupervisor(object):
+
+    def __init__(self, shards: List[dict], config_filename: str, max_restarts: int = 10,
+                 restart_backoff: float = 1.0, restart_backoff_max: float = 60.0, stable_time: float = 300.0,
+                 metrics_interval: float = 10.0, metrics_file: str = None, start_method: str = "spawn",
+                 target=run_shard, on_metrics=None):
+        """
+        :param shards: list of the shards' config overrides with the unique "name"
+        :param max_restarts: restarts of the shard failed in a row before it's given up
+        :param restart_backoff: delay of the first restart, doubled by every failure in a row up to restart_backoff_max
+        :param stable_time: seconds of the worker's run after which its failures in a row are reset
+        :param metrics_interval: seconds between the merged points
+        :param metrics_file: json lines file of the merged points
+        :param start_method: multiprocessing start method of the workers
+        :param target: worker function of (shard, config_filename, metrics_queue)
+        :param on_metrics: function of the merged point
+        """
+        names = [shard["name"] for shard in shards]
+        if len(set(names)) != len(names):
+            raise ValueError("Shards names should be unique: {}".format(names))
+
+        self.workers = [ShardWorker(shard) for shard in shards]
+        self.config_filename = os.path.abspath(config_filename)
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.restart_backoff_max = restart_backoff_max
+        self.stable_time = stable_time
+        self.metrics_interval = metrics_interval
+        self.metrics_file = metrics_file
+        self.target = target
+        self.on_metrics = on_metrics
+
+        self._context = multiprocessing.get_context(start_method)
+        self.metrics_queue = self._context.Queue()
+        self.next_metrics_time = 0.0
+
+    def start_worker(self, worker: ShardWorker):
+        worker.process = self._context.Process(target=self.target, name="shard-{}".format(worker.name),
+                                               args=(worker.shard, self.config_filename, self.metrics_queue),
+                                               daemon=False)
+        worker.process.start()
+        worker.started_time = time.monotonic()
+        logger.info("Shard {}: worker started, pid {}".format(worker.name, worker.process.pid))
+
+    def check_workers(self):
+        """
+        starts the workers which are due and schedules the restarts of the crashed ones
+        """
+        now = time.monotonic()
+
+        for worker in self.workers:
+            if worker.finished or worker.failed:
+                continue
+
+            if worker.process is not None and not worker.process.is_alive():
+                exitcode = worker.process.exitcode
+                worker.process.join()
+                worker.process = None
+
+                if exitcode == 0:
+                    worker.finished = True
+                    logger.info("Shard {}: lanes are done".format(worker.name))
+                    continue
+
+                if now - worker.started_time >= self.stable_time:
+                    worker.failures = 0
+
+                if worker.failures >= self.max_restarts:
+                    worker.failed = True
+                    logger.error("Shard {}: worker exited with code {}, max restarts {} reached".format(
+                        worker.name, exitcode, self.max_restarts))
+                    continue
+
+                delay = min(self.restart_backoff * 2 ** worker.failures, self.restart_backoff_max)
+                worker.failures += 1
+                worker.restarts += 1
+                worker.next_start_time = now + delay
+                logger.error("Shard {}: worker exited with code {}, restart in {:.1f} s".format(
+                    worker.name, exitcode, delay))
+
+            if worker.process is None and now >= worker.next_start_time:
+                self.start_worker(worker)
+
+    def drain_metrics(self):
+        """
+        takes the health points from the workers
+        """
+        workers = {worker.name: worker for worker in self.workers}
+        while True:
+            try:
+                point = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            worker = workers.get(point.get("shard"))
+            if worker is not None:
+                worker.health = point
+                worker.health_time = time.monotonic()
+
+    def merged_point(self):
+        """
+        merged health of the shards with the shards' states and last points
+        """
+        now = time.monotonic()
+        point = merge_health({w.name: w.health for w in self.workers if w.health is not None})
+        point.update({"time": time.time(),
+                      "shards": len(self.workers),
+                      "running": len([w for w in self.workers if w.running]),
+                      "finished": len([w for w in self.workers if w.finished]),
+                      "failed": len([w for w in self.workers if w.failed]),
+                      "restarts": sum([w.restarts for w in self.workers]),
+                      "stale": [w.name for w in self.workers if w.running and w.health is not None
+                                and now - w.health_time > 3 * self.metrics_interval],
+                      "by_shard": {w.name: w.health for w in self.workers}})
+        return point
+
+    def report_metrics(self, force: bool = False):
+        if not force and time.monotonic() < self.next_metrics_time:
+            return None
+
+        self.next_metrics_time = time.monotonic() + self.metrics_interval
+        point = self.merged_point()
+
+        logger.info("Shards {shards}: running {running}, finished {finished}, failed {failed}, restarts {restarts}. "
+                    "Active scalps {active_scalps}, open orders {open_orders}. Result {result}".format(**point))
+
+        if self.metrics_file is not None:
+            directory = os.path.dirname(self.metrics_file)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.metrics_file, "a") as f:
+                f.write(json.dumps(point, default=str) + "\n")
+
+        if self.on_metrics is not None:
+            self.on_metrics(point)
+
+        return point
+
+    @property
+    def done(self):
+        return all([w.finished or w.failed for w in self.workers])
+
+    def run(self, poll_interval: float = 0.2):
+        """
+        runs the shards until all of them are finished or given up
+        """
+        try:
+            while not self.done:
+                self.check_workers()
+                self.drain_metrics()
+                self.report_metrics()
+                time.sleep(poll_interval)
+        finally:
+            self.stop()
+            self.drain_metrics()
+            self.report_metrics(True)
+
+    def stop(self, timeout: float = 10.0):
+        """
+        stops the running workers by SIGINT, so they close the journal and the reports, and terminates the workers not
+        stopped in timeout seconds
+        """
+        for worker in self.workers:
+            if worker.running:
+                os.kill(worker.process.pid, signal.SIGINT)
+
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.error("Shard {}: worker is not stopped in {:.1f} s, terminated".format(worker.name, timeout))
+                worker.process.terminate()
+                worker.process.join()
+            worker.process = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="_config_default.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s",
+                        handlers=[logging.StreamHandler(), logging.FileHandler("scalp_supervisor.log")])
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    if len(config.get("shards", list())) == 0:
+        logger.error("No shards in the config {}".format(args.config))
+        raise SystemExit(1)
+
+    params = config.get("supervisor", dict())
+    supervisor = ShardSupervisor(config["shards"], args.config, **params)
+    supervisor.run()
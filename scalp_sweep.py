@@ -0,0 +1,279 @@
+"""
+Parameters sweep on the tickers history: profit, depth step, first order margin, MA windows and MA threshold.
+Tickers are loaded into arrays once, MAs for all the windows are calculated in bulk and every config of the grid is
+backtested in the process pool with the precalculated signal.
+
+Usage:
+    python3 scalp_sweep.py --tickers test_data/counter_order_tickers.csv --symbol AE/ETH --profit 0.001,0.002
+    --ma-short 3,5 --ma-long 5,10,20 --threshold 0.00005,0.0001
+"""
+from scalp_bot import ScalpBot, ScalpLane
+from scalp_backtest import ScalpBacktest, read_tickers_csv
+import numpy as np
+import argparse
+import csv
+import itertools
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+# tickers and signals of the sweep, set in the workers by _init_worker()
+_sweep_data = dict()
+
+
+class SignalSeries(object):
+    """
+    Indicator with the precalculated signal for every tick. Could be used in the lane instead of TickerMAIndicator.
+    """
+
+    def __init__(self, signals: List[bool], warm_up_len: int):
+        self.signals = signals
+        self.warm_up_len = warm_up_len
+        self.ticks = 0
+
+    def update(self, ask: float, bid: float):
+        self.ticks += 1
+
+    @property
+    def warmed_up(self):
+        return self.ticks >= self.warm_up_len
+
+    def signal(self, order1_side: str, threshold: float):
+        return self.signals[self.ticks - 1]
+
+
+def load_tickers(filename: str, symbol: str):
+    """
+    loads tickers of the symbol from csv file into arrays
+    :return: tuple of np.ndarray ask and bid
+    """
+    tickers = [(ask, bid) for _, ask, bid in read_tickers_csv(filename, symbol) if ask > 0 and bid > 0]
+    prices = np.array(tickers, dtype=np.float64).reshape(-1, 2)
+    return prices[:, 0].copy(), prices[:, 1].copy()
+
+
+def moving_averages(values: np.ndarray, windows: List[int]):
+    """
+    simple moving averages of the values for all the windows at once. MA of window w at index i is the mean of
+    values[i-w+1:i+1] and it's NaN for i < w-1.
+
+    :return: dict of window: np.ndarray of the same length as values
+    """
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    mas = dict()
+
+    for window in set(windows):
+        ma = np.full(len(values), np.nan)
+        if window <= len(values):
+            ma[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+        mas[window] = ma
+
+    return mas
+
+
+def ma_signals(values: np.ndarray, order1_side: str, windows: List[tuple], thresholds: List[float],
+               ma_count: int = 0):
+    """
+    signals of the ma_short_long_rel_delta for every (short window, long window) and threshold. Tick is considered
+    as warmed up as TickerMAIndicator does: after ma_long_window + ma_count tickers.
+
+    :param values: ask prices for "buy" order1 side or bid for "sell"
+    :param windows: list of (ma_short_window, ma_long_window)
+    :return: dict of (ma_short_window, ma_long_window, threshold): np.ndarray of bool
+    """
+    mas = moving_averages(values, [w for pair in windows for w in pair])
+    index = np.arange(len(values))
+    signals = dict()
+
+    for short_window, long_window in windows:
+        ma_short, ma_long = mas[short_window], mas[long_window]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_delta = (ma_short - ma_long) / ma_short
+
+        warmed_up = index + 1 >= max(short_window, long_window + ma_count)
+        rel_delta = np.where(warmed_up & np.isfinite(rel_delta), rel_delta, np.nan)
+
+        for threshold in thresholds:
+            with np.errstate(invalid="ignore"):
+                signal = rel_delta > threshold if order1_side == "buy" else rel_delta < -threshold
+            signals[(short_window, long_window, threshold)] = signal
+
+    return signals
+
+
+def _init_worker(data: dict):
+    global _sweep_data
+    _sweep_data = data
+
+
+def _evaluate(config: dict):
+    data = _sweep_data
+    params = data["params"]
+
+    signal = data["signals"][(config["ma_short_window"], config["ma_long_window"],
+                              config["ma_short_long_threshold"])]
+
+    indicator = SignalSeries(signal.tolist(), 1)
+    lane = ScalpLane(params["symbol"], params["start_currency"], params["dest_currency"], params["start_amount"],
+                     config["profit"], config["profit_with_fee"], params["max_active_scalps"], indicator,
+                     config["depth_step_in_profits"], config["first_order_price_margin_in_profits_with_fees"])
+
+    backtest = ScalpBacktest([lane], params["commission"], config["ma_short_long_threshold"],
+                             params["order1_max_updates"], params["order2_max_updates_for_profit"],
+                             params["order2_max_updates_market"], params["cancel_threshold"], params["max_runs"])
+
+    symbol = params["symbol"]
+    result = backtest.run(zip(itertools.repeat(symbol), data["ask"], data["bid"]))[0]
+
+    # value the leftover of dest currency at the last price
+    if lane.order1_side == "buy":
+        pnl = result.cur1_diff + result.cur2_diff * data["bid"][-1]
+    else:
+        pnl = result.cur1_diff + result.cur2_diff / data["ask"][-1]
+
+    report = dict(config)
+    report.pop("profit_with_fee")
+    report.update(result.report())
+    report["pnl"] = pnl
+    report.pop("lane")
+    return report
+
+
+class ScalpSweep(object):
+    """
+    Backtests the grid of configs for the single lane of the bot on the tickers history.
+    """
+
+    def __init__(self, bot: ScalpBot, ask: np.ndarray, bid: np.ndarray, max_runs: int = None):
+        self.bot = bot
+        self.lane = bot.create_scalp_lanes()[0]
+        self.ask = ask
+        self.bid = bid
+        self.max_runs = max_runs
+
+    def grid(self, profits: List[float], depth_steps: List[float], margins: List[float], ma_short_windows: List[int],
+             ma_long_windows: List[int], thresholds: List[float]):
+        """
+        :return: list of configs dicts for all the combinations of the parameters
+        """
+        configs = list()
+        for profit, depth_step, margin, short_window, long_window, threshold in itertools.product(
+                profits, depth_steps, margins, ma_short_windows, ma_long_windows, thresholds):
+
+            configs.append({"profit": profit,
+                            "profit_with_fee": self.bot.target_single_order_profit(profit, self.bot.commission),
+                            "depth_step_in_profits": depth_step,
+                            "first_order_price_margin_in_profits_with_fees": margin,
+                            "ma_short_window": short_window,
+                            "ma_long_window": long_window,
+                            "ma_short_long_threshold": threshold})
+        return configs
+
+    def run(self, configs: List[dict], workers: int = None):
+        """
+        backtests configs in the process pool
+        :return: list of reports sorted by pnl
+        """
+        bot = self.bot
+        lane = self.lane
+
+        windows = sorted(set([(c["ma_short_window"], c["ma_long_window"]) for c in configs]))
+        thresholds = sorted(set([c["ma_short_long_threshold"] for c in configs]))
+        values = self.ask if lane.order1_side == "buy" else self.bid
+
+        data = {"ask": self.ask.tolist(),
+                "bid": self.bid.tolist(),
+                "signals": ma_signals(values, lane.order1_side, windows, thresholds, bot.ma_count),
+                "params": {"symbol": lane.symbol,
+                           "start_currency": lane.start_currency,
+                           "dest_currency": lane.dest_currency,
+                           "start_amount": lane.start_amount,
+                           "max_active_scalps": lane.max_active_scalps,
+                           "commission": bot.commission,
+                           "order1_max_updates": bot.order1_max_updates,
+                           "order2_max_updates_for_profit": bot.order2_max_updates_for_profit,
+                           "order2_max_updates_market": bot.order2_max_updates_market,
+                           "cancel_threshold": bot.cancel_threshold,
+                           "max_runs": self.max_runs}}
+
+        if workers == 1:
+            _init_worker(data)
+            reports = [_evaluate(c) for c in configs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as executor:
+                reports = list(executor.map(_evaluate, configs, chunksize=max(1, len(configs) // 64)))
+
+        return sorted(reports, key=lambda r: r["pnl"], reverse=True)
+
+
+def _floats(value: str):
+    return [float(v) for v in value.split(",")]
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scalp bot parameters sweep on the tickers from csv file")
+    parser.add_argument("--config", default="_config_default.json")
+    parser.add_argument("--tickers", default="test_data/tickers_many.csv")
+    parser.add_argument("--symbol", default=None, help="symbol to sweep instead of the configured one")
+    parser.add_argument("--start-currency", default=None)
+    parser.add_argument("--dest-currency", default=None)
+    parser.add_argument("--profit", type=_floats, default=None)
+    parser.add_argument("--depth-step", type=_floats, default=None)
+    parser.add_argument("--margin", type=_floats, default=None)
+    parser.add_argument("--ma-short", type=_ints, default=None)
+    parser.add_argument("--ma-long", type=_ints, default=None)
+    parser.add_argument("--threshold", type=_floats, default=None)
+    parser.add_argument("--max-runs", type=int, default=None, help="max runs per config. No limit by default")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes. CPU count by default")
+    parser.add_argument("--top", type=int, default=20, help="number of best configs to print")
+    parser.add_argument("--output", default=None, help="csv file for the whole ranked table")
+    args = parser.parse_args()
+
+    bot = ScalpBot(args.config)
+    bot.load_config_from_file(args.config)
+
+    if args.symbol is not None:
+        bot.symbols = [{"symbol": args.symbol,
+                        "start_currency": args.start_currency if args.start_currency is not None
+                        else args.symbol.split("/")[1],
+                        "dest_currency": args.dest_currency if args.dest_currency is not None
+                        else args.symbol.split("/")[0]}]
+
+    time_start = time.perf_counter()
+    lane = bot.create_scalp_lanes()[0]
+    ask, bid = load_tickers(args.tickers, lane.symbol)
+
+    sweep = ScalpSweep(bot, ask, bid, args.max_runs)
+    configs = sweep.grid(args.profit or [bot.profit],
+                         args.depth_step or [bot.depth_step_in_profits],
+                         args.margin or [bot.first_order_price_margin_in_profits_with_fees],
+                         args.ma_short or [bot.ma_short_window],
+                         args.ma_long or [bot.ma_long_window],
+                         args.threshold or [bot.ma_short_long_threshold])
+
+    reports = sweep.run(configs, args.workers)
+
+    columns = ["pnl", "result-fact-diff", "profit", "depth_step_in_profits",
+               "first_order_price_margin_in_profits_with_fees", "ma_short_window", "ma_long_window",
+               "ma_short_long_threshold", "scalps-closed", "order1-fill-rate", "order2-fill-rate",
+               "avg-lifetime-ticks"]
+
+    print("\t".join(columns))
+    for report in reports[:args.top]:
+        print("\t".join(["{:.8g}".format(report[c]) if isinstance(report[c], float) else str(report[c])
+                         for c in columns]))
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(reports[0].keys()))
+            writer.writeheader()
+            writer.writerows(reports)
+
+    print("{} configs on {} tickers in {:.2f}s".format(len(configs), len(ask), time.perf_counter() - time_start))
+    sys.exit(0)
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+
+
+class RequestScheduler(object):
+    """
+    Token bucket of exchange requests: max_requests per period seconds. Orders requests (create and cancel) could take
+    any available tokens, orders updates could not take the reserve for orders and tickers (and other market data)
+    requests could not take the reserve for orders and updates, so market data polling never delays orders.
+    Thread safe.
+    """
+
+    PRIORITY_ORDERS = 0
+    PRIORITY_ORDER_UPDATES = 1
+    PRIORITY_TICKERS = 2
+
+    def __init__(self, max_requests: int, period: float, orders_reserve: float = 0.2):
+        """
+        :param max_requests: requests per period
+        :param period: period in seconds (lap_time)
+        :param orders_reserve: share of the bucket reserved for the orders requests. Orders updates could take a half
+        of the reserve and tickers could not take it at all.
+        """
+        self.max_requests = max_requests
+        self.period = period
+        self.capacity = float(max_requests)
+        self.rate = max_requests / period if period > 0 else 0.0  # tokens per second
+
+        self._reserve = {self.PRIORITY_ORDERS: 0.0,
+                         self.PRIORITY_ORDER_UPDATES: self.capacity * orders_reserve / 2,
+                         self.PRIORITY_TICKERS: self.capacity * orders_reserve}
+
+        self.tokens = self.capacity
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._history = deque()  # (time, requests, priority) for the last period
+        self.total_requests = 0
+        self.total_wait_time = 0.0
+
+        self._cycle_requests = 0
+        self.requests_per_cycle = 0.0  # exponential moving average
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_time) * self.rate)
+        self._last_time = now
+
+    def _wait_time(self, requests: int, priority: int):
+        need = min(self._reserve[priority] + requests, self.capacity) - self.tokens
+        return need / self.rate if need > 0 else 0.0
+
+    def wait_time(self, requests: int = 1, priority: int = PRIORITY_ORDERS):
+        """
+        :return: seconds to wait until requests of the priority could be made
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._wait_time(requests, priority)
+
+    def try_acquire(self, requests: int = 1, priority: int = PRIORITY_ORDERS):
+        """
+        takes tokens for the requests if they are available for the priority
+        :return: True if tokens were taken
+        """
+        if self.rate <= 0:
+            return True
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if self._wait_time(requests, priority) > 0:
+                return False
+
+            self.tokens -= requests
+            self._record(now, requests, priority)
+            return True
+
+    def acquire(self, requests: int = 1, priority: int = PRIORITY_ORDERS):
+        """
+        waits (sleeps) until the tokens for requests of the priority are available and takes them
+        :return: time waited
+        """
+        waited = 0.0
+
+        while not self.try_acquire(requests, priority):
+            wait = max(self.wait_time(requests, priority), 0.001)
+            time.sleep(wait)
+            waited += wait
+
+        self.total_wait_time += waited
+        return waited
+
+    def _record(self, now: float, requests: int, priority: int):
+        self.total_requests += requests
+        self._cycle_requests += requests
+
+        self._history.append((now, requests, priority))
+        while len(self._history) > 0 and self._history[0][0] < now - self.period:
+            self._history.popleft()
+
+    def utilization(self):
+        """
+        :return: requests made during the last period relative to max_requests
+        """
+        if self.max_requests <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            requests = sum([r for t, r, p in self._history if t >= now - self.period])
+
+        return requests / self.max_requests
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            requests = {self.PRIORITY_ORDERS: 0, self.PRIORITY_ORDER_UPDATES: 0, self.PRIORITY_TICKERS: 0}
+            for t, r, p in self._history:
+                if t >= now - self.period:
+                    requests[p] += r
+
+            return {"tokens": self.tokens,
+                    "requests_last_period": sum(requests.values()),
+                    "orders_requests": requests[self.PRIORITY_ORDERS],
+                    "order_updates_requests": requests[self.PRIORITY_ORDER_UPDATES],
+                    "tickers_requests": requests[self.PRIORITY_TICKERS],
+                    "utilization": sum(requests.values()) / self.max_requests if self.max_requests > 0 else 0.0,
+                    "requests_per_cycle": self.requests_per_cycle,
+                    "total_wait_time": self.total_wait_time}
+
+    def cycle_sleep(self, max_sleep: float):
+        """
+        sleep time before the next cycle of the main loop: zero while there are spare tokens for the next cycle's
+        requests above the orders reserve, so the spare budget is used to poll faster, or the time needed to refill
+        them otherwise. Average requests per cycle is updated on every call.
+
+        :param max_sleep: upper limit of the sleep
+        :return: seconds to sleep
+        """
+        self.requests_per_cycle = self._cycle_requests if self.requests_per_cycle == 0 \
+            else 0.8 * self.requests_per_cycle + 0.2 * self._cycle_requests
+        self._cycle_requests = 0
+
+        if self.rate <= 0:
+            return max_sleep
+
+        return min(max_sleep, self.wait_time(max(1, int(round(self.requests_per_cycle))), self.PRIORITY_TICKERS))
+
+
+class ThrottledExchange(object):
+    """
+    Proxy of the exchange (ztom's exchange wrapper or ccxt exchange) which takes every request through the requests
+    scheduler with the priority of the request's method. Other attributes are taken from the wrapped exchange. The
+    ccxt exchange of the wrapper (_ccxt) is throttled too.
+    """
+
+    METHODS_PRIORITY = {"place_limit_order": RequestScheduler.PRIORITY_ORDERS,
+                        "create_order": RequestScheduler.PRIORITY_ORDERS,
+                        "create_orders": RequestScheduler.PRIORITY_ORDERS,
+                        "cancel_order": RequestScheduler.PRIORITY_ORDERS,
+                        "cancel_orders": RequestScheduler.PRIORITY_ORDERS,
+                        "get_order_update": RequestScheduler.PRIORITY_ORDER_UPDATES,
+                        "fetch_order": RequestScheduler.PRIORITY_ORDER_UPDATES,
+                        "fetch_orders": RequestScheduler.PRIORITY_ORDER_UPDATES,
+                        "fetch_open_orders": RequestScheduler.PRIORITY_ORDER_UPDATES,
+                        "get_trades": RequestScheduler.PRIORITY_ORDER_UPDATES,
+                        "fetch_my_trades": RequestScheduler.PRIORITY_ORDER_UPDATES,
+                        "fetch_tickers": RequestScheduler.PRIORITY_TICKERS,
+                        "fetch_ticker": RequestScheduler.PRIORITY_TICKERS,
+                        "fetch_order_book": RequestScheduler.PRIORITY_TICKERS,
+                        "get_tickers": RequestScheduler.PRIORITY_TICKERS,
+                        "load_markets": RequestScheduler.PRIORITY_TICKERS,
+                        "fetch_balance": RequestScheduler.PRIORITY_ORDER_UPDATES}
+
+    _own_attributes = ("exchange", "scheduler")
+
+    def __init__(self, exchange, scheduler: RequestScheduler):
+        object.__setattr__(self, "exchange", exchange)
+        object.__setattr__(self, "scheduler", scheduler)
+
+    def __getattr__(self, item):
+        attr = getattr(self.exchange, item)
+
+        if item == "_ccxt":
+            return ThrottledExchange(attr, self.scheduler)
+
+        if item not in self.METHODS_PRIORITY or not callable(attr):
+            return attr
+
+        priority = self.METHODS_PRIORITY[item]
+        scheduler = self.scheduler
+
+        def throttled(*args, **kwargs):
+            scheduler.acquire(1, priority)
+            return attr(*args, **kwargs)
+
+        return throttled
+
+    def __setattr__(self, key, value):
+        if key in self._own_attributes:
+            object.__setattr__(self, key, value)
+        else:
+            setattr(self.exchange, key, value)
@@ -4,4 +4,21 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import scalp_bot
\ No newline at end of file
+import scalp_bot
+import scalp_indicators
+import scalp_backtest
+import scalp_sweep
+import scalp_async
+import scalp_orders
+import scalp_throttle
+import scalp_reports
+import scalp_ladder
+import scalp_journal
+import scalp_recovery
+import scalp_feed
+import scalp_hub
+import scalp_startup
+import scalp_profiler
+import scalp_history
+import scalp_simulator
+import scalp_supervisor
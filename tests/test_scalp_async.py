@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_async
+from scalp_async import acquire, AsyncScalpRunner
+from scalp_throttle import RequestScheduler
+from unittest import mock
+import asyncio
+import logging
+import threading
+import time
+import unittest
+
+
+class FakeOrder(object):
+    def __init__(self, name):
+        self.name = name
+        self.status = "open"
+
+
+class FakeOrderManager(object):
+    def __init__(self):
+        self.exchange = object()
+        self.orders = list()
+
+    def add_order(self, order):
+        self.orders.append(order)
+
+    def get_open_orders(self):
+        return [o for o in self.orders if o.status != "closed"]
+
+
+class FakeBot(object):
+    LOG_INFO = logging.INFO
+    LOG_ERROR = logging.ERROR
+
+    def __init__(self):
+        self.offline = True
+        self.request_scheduler = None
+        self.request_sleep = 0.005
+        self.om_proceed_sleep = 0.005
+        self.journal = None
+
+    def cycle_sleep(self):
+        return 0.005
+
+    def log(self, level, msg):
+        pass
+
+
+class FakeLane(object):
+    def __init__(self):
+        self.id = "ETH/BTC-buy"
+        self.symbol = "ETH/BTC"
+        self.cycles = 0
+        self.total_result = self.total_cur1_diff = self.total_cur2_diff = 0.0
+
+
+class ScalpAsyncTestSuite(unittest.TestCase):
+
+    def test_acquire(self):
+        scheduler = RequestScheduler(10, 1, 0.0)
+
+        async def acquire_requests():
+            time_start = time.monotonic()
+            await acquire(scheduler, 10)
+            time_burst = time.monotonic() - time_start
+
+            await acquire(scheduler, 2)
+            return time_burst, time.monotonic() - time_start
+
+        time_burst, time_total = asyncio.run(acquire_requests())
+
+        self.assertLess(time_burst, 0.05)
+        self.assertGreaterEqual(time_total, 0.15)
+        self.assertLess(scheduler.tokens, 1)
+        self.assertEqual(12, scheduler.total_requests)
+
+    def test_acquire_no_scheduler(self):
+        asyncio.run(acquire(None))
+
+    def test_runner_threads(self):
+        """
+        lanes and the order manager are proceeded in the same thread out of the event loop, one at a time. Orders
+        added and released by the lanes are applied to the order manager before the orders are proceeded.
+        """
+        bot, om, lane = FakeBot(), FakeOrderManager(), FakeLane()
+        calls = list()
+        busy = threading.Lock()
+        loop_thread = threading.get_ident()
+
+        def call(name):
+            self.assertTrue(busy.acquire(blocking=False))  # not concurrent
+            calls.append((name, threading.get_ident()))
+            time.sleep(0.002)
+            busy.release()
+
+        def proceed_lane(_bot, _om, _lane, _ticker):
+            call("lane")
+            _lane.cycles += 1
+            if _lane.cycles == 1:
+                _om.add_order(FakeOrder("order1"))
+                _om.add_order(FakeOrder("order2"))
+            elif _lane.cycles == 3:
+                self.assertEqual(2, len(om.orders))
+                _om.release_order(om.orders[1])
+                self.assertEqual(2, len(om.orders))  # deferred
+
+        def proceed_orders(_bot, _om):
+            call("orders")
+
+        runner = AsyncScalpRunner(bot, om, [lane])
+        with mock.patch("scalp_async.proceed_lane", proceed_lane), \
+                mock.patch("scalp_async.proceed_orders", proceed_orders), \
+                mock.patch("scalp_async.fetch_lanes_tickers", lambda _bot, _symbols: {"ETH/BTC": {}}), \
+                mock.patch("scalp_async.lane_done", lambda _bot, _lane: _lane.cycles >= 8):
+            asyncio.run(runner.run())
+
+        self.assertListEqual(["order1"], [o.name for o in om.orders])
+        self.assertIn("orders", [name for name, thread in calls])
+        self.assertEqual(1, len(set([thread for name, thread in calls])))
+        self.assertNotEqual(loop_thread, calls[0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_backtest
+from scalp_bot import ScalpLane
+from scalp_indicators import TickerMAIndicator
+from scalp_backtest import ScalpBacktest, BacktestOrder, read_tickers_csv
+import unittest
+
+
+class ScalpBacktestTestSuite(unittest.TestCase):
+
+    def test_backtest_order(self):
+        order = BacktestOrder.create_from_start_amount("ETH/BTC", "BTC", 1, "ETH", 0.08, 0.0, 2)
+        self.assertEqual("buy", order.side)
+        self.assertAlmostEqual(12.5, order.amount)
+
+        self.assertFalse(order.proceed(0.081, 0.0801, 0.0))
+        self.assertTrue(order.proceed(0.081, 0.0801, 0.0))
+        self.assertEqual("closed", order.status)
+        self.assertEqual(0.0, order.filled)
+
+        order = BacktestOrder.create_from_start_amount("ETH/BTC", "ETH", 2, "BTC", 0.08, 0.0, 2)
+        self.assertEqual("sell", order.side)
+        self.assertTrue(order.proceed(0.081, 0.0801, 0.001))
+        self.assertEqual(2, order.filled)
+        self.assertAlmostEqual(0.16 * 0.999, order.filled_dest_amount)
+
+    def test_backtest_scalp(self):
+        lane = ScalpLane("ETH/BTC", "BTC", "ETH", 1, 0.01, 0.01, 1, TickerMAIndicator(2, 3))
+        backtest = ScalpBacktest([lane], 0.0, 0.0, 5, 5)
+
+        tickers = [("ETH/BTC", 100, 99), ("ETH/BTC", 101, 100), ("ETH/BTC", 102, 101),  # warm up and signal
+                   ("ETH/BTC", 101, 100),  # order 1 filled
+                   ("ETH/BTC", 101, 100),  # order 2 created
+                   ("ETH/BTC", 104, 103),  # order 2 filled
+                   ("ETH/BTC", 104, 103),  # scalp closed
+                   ("BTC/USDT", 1, 1)]
+
+        result = backtest.run(tickers)[0]
+
+        self.assertEqual(7, result.ticks)
+        self.assertEqual(1, result.scalps_closed)
+        self.assertEqual(1, result.order1_filled)
+        self.assertEqual(1, result.order2_filled)
+        self.assertAlmostEqual(0.01, result.result_fact_diff)
+        self.assertAlmostEqual(0.01, lane.total_result)
+        self.assertEqual(4, result.avg_lifetime_ticks)
+
+    def test_read_tickers_csv(self):
+        tickers = list(read_tickers_csv("../test_data/tickers_many.csv", "ETH/BTC"))
+        self.assertEqual(67, len(tickers))
+        self.assertEqual(("ETH/BTC", 0.082975, 0.082923), tickers[0])
+
+        tickers = list(read_tickers_csv("../test_data/counter_order_tickers.csv", "AE/ETH"))
+        self.assertEqual(600, len(tickers))
+        self.assertTrue(all([t[1] >= t[2] for t in tickers]))
+
+
+if __name__ == '__main__':
+    unittest.main()
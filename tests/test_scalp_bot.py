@@ -1,8 +1,34 @@
 # -*- coding: utf-8 -*-
 # from . import context
 from .context import scalp_bot
-from scalp_bot import ScalpBot, ScalpsCollection, SingleScalp
+from scalp_bot import ScalpBot, ScalpsCollection, SingleScalp, ScalpSignal, ScalpState, ScalpOrderEvents
 import unittest
+import logging
+
+
+class _EventsOrder(ScalpOrderEvents):
+
+    def __init__(self, symbol, start_currency, amount_start, dest_currency, price):
+        self.symbol = symbol
+        self.status = "open"
+        self.filled = 0.0
+        self.filled_start_amount = 0.0
+        self.filled_dest_amount = 0.0
+
+    @classmethod
+    def create_from_start_amount(cls, symbol, start_currency, amount_start, dest_currency, target_price,
+                                 cancel_threshold=0.0, max_order_updates=5):
+        return cls(symbol, start_currency, amount_start, dest_currency, target_price)
+
+    def fill(self, start_amount, dest_amount):
+        self.filled = start_amount
+        self.filled_start_amount = start_amount
+        self.filled_dest_amount = dest_amount
+        self.status = "closed"
+
+
+class _EventsScalp(SingleScalp):
+    order_class = _EventsOrder
 
 
 class ScalpsBotTestSuite(unittest.TestCase):
@@ -58,7 +84,149 @@ class ScalpsBotTestSuite(unittest.TestCase):
         self.assertListEqual([1, 2, 3, 4, 11], missed_scalps)
 
 
+    def test_scalps_collection_indexes(self):
+        scalps = ScalpsCollection(300)
+
+        for i in range(1, 301):
+            scalps.add_scalp(SingleScalp("BTC/USDT", "USDT", 1, i, 1, "BTC", 0.001))
+
+        self.assertEqual(300, scalps.count("new"))
+        self.assertListEqual([], scalps.missed_scalps_depth("order1", 300))
+
+        for scalp in list(scalps.active_scalps.values()):
+            scalp.state = "order1" if scalp.depth <= 200 else "order2"
+
+        self.assertEqual(0, scalps.count("new"))
+        self.assertEqual(200, scalps.count("order1"))
+        self.assertEqual(100, scalps.count("order2"))
+
+        for scalp in scalps.scalps_in_state("order1"):
+            if scalp.depth in (3, 150):
+                scalp.state = "closed"
+                scalps.remove_scalp(scalp.id)
+
+        self.assertEqual(198, scalps.count("order1"))
+        self.assertEqual(0, scalps.count("closed"))
+        self.assertListEqual([3, 150], scalps.missed_scalps_depth("order1", 300))
+        self.assertEqual(198, len(scalps.depth_list("order1")))
+
+        scalps.max_scalps = 305
+        self.assertListEqual([3, 150, 201, 202, 203, 204, 205], scalps.missed_scalps_depth("order1", 305))
+
+    def test_scalp_state_machine(self):
+        scalps = ScalpsCollection(10)
+        scalp = _EventsScalp("ETH/BTC", "BTC", 0.01, 1, 0.08, "ETH", 0.001)
+        other = _EventsScalp("ETH/BTC", "BTC", 0.01, 2, 0.079, "ETH", 0.001)
+        scalps.add_scalps([scalp, other])
+
+        self.assertListEqual([scalp, other], scalps.pop_changed())
+        self.assertListEqual([], scalps.pop_changed())
+
+        scalp.create_order1()
+        other.create_order1()
+        self.assertIs(ScalpState.ORDER1, scalp.state)
+        self.assertEqual("order1", scalp.state)
+        self.assertEqual("order1", str(scalp.state))
+        self.assertEqual("state order1", "state {}".format(scalp.state))
+        self.assertEqual(2, scalps.count("order1"))
+        self.assertListEqual([], scalps.pop_changed())  # orders are not changed yet
+        self.assertIsNone(scalp.update_state(scalp.order1.status, ""))
+
+        scalp.order1.fill(0.01, 0.125)
+        scalp.order1.status = "closed"
+        self.assertListEqual([scalp], scalps.pop_changed())  # once per change
+        self.assertIs(ScalpState.ORDER1_COMPLETE, scalp.update_state(scalp.order1.status, ""))
+        self.assertEqual(-0.01, scalp.cur1_diff)
+
+        scalp.create_order2()
+        self.assertIs(ScalpState.ORDER2, scalp.state)
+        scalp.order2.fill(0.125, 0.0101)
+        other.order1.status = "closed"
+        self.assertListEqual([scalp, other], scalps.pop_changed())
+
+        self.assertIs(ScalpState.CLOSED, scalp.update_state("closed", scalp.order2.status))
+        self.assertAlmostEqual(0.0001, scalp.result_fact_diff)
+        self.assertIs(ScalpState.CLOSED, other.update_state(other.order1.status, ""))  # not filled
+
+        scalps.remove_scalp(scalp.id)
+        scalp.order2.status = "canceled"
+        self.assertListEqual([], scalps.pop_changed())  # removed scalps are not proceeded
+
+        other.state = "new"  # restored from the journal by the string
+        self.assertIs(ScalpState.NEW, other.state)
+        self.assertEqual(1, scalps.count(ScalpState.NEW))
+
+    def test_scalp_compact(self):
+        signal = ScalpSignal("buy", 1.1, 1.0, 0.1, 0)
+        scalp1 = SingleScalp("BTC/USDT", "USDT", 1, 1, 0.9, "BTC", 0.001)
+        scalp2 = SingleScalp("BTC/USDT", "USDT", 1, 2, 0.8, "BTC", 0.001)
+
+        self.assertFalse(hasattr(scalp1, "__dict__"))
+        self.assertIsInstance(scalp1.id, int)
+        self.assertNotEqual(scalp1.id, scalp2.id)
+        self.assertDictEqual(dict(), scalp1.supplementary)
+
+        scalp1.signal = signal
+        scalp2.signal = signal
+        self.assertEqual(0.9, scalp1.supplementary["ticker_price"])
+        self.assertEqual(0.8, scalp2.supplementary["ticker_price"])
+        self.assertEqual("buy", scalp2.supplementary["order1_side"])
+        self.assertEqual(1970, scalp1.supplementary["time_created_utc"].year)
+        self.assertEqual(0.0, scalp1.supplementary["time_created_utc"].utcoffset().total_seconds())
+
+    def test_create_scalp_lanes(self):
+        bot = ScalpBot("../_config_default.json")
+        bot.symbol, bot.start_currency, bot.dest_currency = "ETH/BTC", "BTC", "ETH"
+        bot.start_amount, bot.profit, bot.commission = 0.01, 0.001, 0.00075
+        bot.ma_short_window, bot.ma_long_window, bot.ma_count = 3, 5, 10
+        bot.max_active_scalps = 10
+
+        lanes = bot.create_scalp_lanes()
+        self.assertEqual(1, len(lanes))
+        self.assertEqual("buy", lanes[0].order1_side)
+        self.assertEqual(15, lanes[0].indicator.warm_up_len)
+        self.assertEqual(bot.target_single_order_profit(), lanes[0].profit_with_fee)
+
+        bot.symbols = [{"symbol": "ETH/BTC", "start_currency": "BTC", "dest_currency": "ETH"},
+                       {"symbol": "ETH/BTC", "start_currency": "ETH", "dest_currency": "BTC", "start_amount": 0.1,
+                        "max_active_scalps": 3}]
+
+        lanes = bot.create_scalp_lanes()
+        self.assertEqual(2, len(lanes))
+        self.assertEqual("sell", lanes[1].order1_side)
+        self.assertEqual(0.1, lanes[1].start_amount)
+        self.assertEqual(3, lanes[1].scalps.max_scalps)
+        self.assertIsNot(lanes[0].indicator, lanes[1].indicator)
+
+    def test_hot_path_log(self):
+        bot = ScalpBot("../_config_default.json")
+        bot.logger = logging.getLogger("test_hot_path_log")
+        bot.logger.setLevel(logging.INFO)
+
+        class _Arg(object):
+            formatted = 0
+
+            def __format__(self, format_spec):
+                _Arg.formatted += 1
+                return "arg"
+
+        bot.hot_path_log_level = "INFO"
+        self.assertTrue(bot.log_enabled(bot.LOG_INFO))
+        with self.assertLogs(bot.logger, logging.INFO):
+            bot.hot_log(bot.LOG_INFO, "message {}", _Arg())
+        self.assertEqual(1, _Arg.formatted)
+
+        bot.hot_path_log_level = "WARNING"
+        self.assertFalse(bot.log_enabled(bot.LOG_INFO))
+        self.assertTrue(bot.log_enabled(bot.LOG_ERROR))
+        bot.hot_log(bot.LOG_INFO, "message {}", _Arg())
+        self.assertEqual(1, _Arg.formatted)
+
+        bot.scalp_status_log_sample_rate = 0.25
+        self.assertEqual(2, sum([bot.scalp_status_log_sampled() for i in range(8)]))
 
+        bot.scalp_status_log_sample_rate = 0
+        self.assertFalse(bot.scalp_status_log_sampled())
 
 
 if __name__ == '__main__':
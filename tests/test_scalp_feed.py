@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_feed
+from scalp_feed import FeedServer, StreamFeed, PollingFeed, FallbackFeed
+import time
+import unittest
+
+
+def wait_until(condition, timeout=5.0):
+    start = time.monotonic()
+    while not condition():
+        if time.monotonic() - start > timeout:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class ScalpFeedTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FeedServer("localhost", 0)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stream_feed(self):
+        feed = StreamFeed("localhost", self.server.port, ["ETH/BTC"], stale_timeout=5.0, reconnect_interval=0.05)
+        feed.start()
+        self.assertTrue(wait_until(lambda: self.server.clients_count() == 1))
+
+        self.server.publish("ETH/BTC", 0.03, 0.031, 1)
+        self.server.publish("XRP/BTC", 0.0001, 0.00011, 1)  # not subscribed
+        self.server.publish("ETH/BTC", 0.0301, 0.0311, 2)
+
+        self.assertTrue(wait_until(lambda: feed.messages == 2))
+        self.assertTrue(feed.healthy())
+
+        tickers = feed.get_tickers(["ETH/BTC"])
+        self.assertDictEqual({"ETH/BTC": {"bid": 0.0301, "ask": 0.0311, "timestamp": 2}}, tickers)
+
+        # only changed since the last call
+        self.assertDictEqual(dict(), feed.get_tickers(["ETH/BTC"]))
+
+        start = time.monotonic()
+        feed.wait(0.1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+        self.server.publish("ETH/BTC", 0.0302, 0.0312, 3)
+        feed.wait(5.0)
+        self.assertEqual(0.0302, feed.get_tickers(["ETH/BTC"])["ETH/BTC"]["bid"])
+
+        feed.stop()
+        self.assertFalse(feed.connected)
+
+    def test_heartbeats(self):
+        server = FeedServer("localhost", 0, heartbeat_interval=0.05)
+        server.start()
+        feed = StreamFeed("localhost", server.port, ["ETH/BTC"], stale_timeout=0.3, reconnect_interval=0.05)
+        feed.start()
+        try:
+            self.assertTrue(wait_until(lambda: server.clients_count() == 1))
+
+            # market does not change: the stream is kept healthy by the heartbeats
+            time.sleep(0.5)
+            self.assertTrue(feed.healthy())
+            self.assertGreater(feed.heartbeats, 0)
+            self.assertEqual(0, feed.messages)
+            self.assertDictEqual(dict(), feed.get_tickers(["ETH/BTC"]))
+
+        finally:
+            feed.stop()
+            server.stop()
+
+    def test_fallback_to_polling(self):
+        polls = list()
+
+        def fetch(symbols):
+            polls.append(symbols)
+            return {"ETH/BTC": {"bid": 1.0, "ask": 1.1}}
+
+        switches = list()
+        stream = StreamFeed("localhost", self.server.port, ["ETH/BTC"], stale_timeout=0.2, reconnect_interval=0.05)
+        feed = FallbackFeed(stream, PollingFeed(fetch), switches.append)
+        feed.start()
+        self.assertTrue(wait_until(lambda: self.server.clients_count() == 1))
+
+        self.server.publish("ETH/BTC", 0.03, 0.031)
+        self.assertTrue(wait_until(lambda: stream.messages == 1))
+        self.assertEqual(0.03, feed.get_tickers(["ETH/BTC"])["ETH/BTC"]["bid"])
+        self.assertEqual("stream", feed.mode)
+
+        # stale stream
+        time.sleep(0.25)
+        self.assertEqual(1.0, feed.get_tickers(["ETH/BTC"])["ETH/BTC"]["bid"])
+        self.assertEqual("polling", feed.mode)
+        self.assertEqual(1, len(polls))
+
+        # stream is back
+        self.server.publish("ETH/BTC", 0.04, 0.041)
+        self.assertTrue(wait_until(lambda: stream.messages == 2))
+        self.assertEqual(0.04, feed.get_tickers(["ETH/BTC"])["ETH/BTC"]["bid"])
+
+        # server is down
+        self.server.stop()
+        self.assertTrue(wait_until(lambda: not stream.connected))
+        self.assertEqual(1.0, feed.get_tickers(["ETH/BTC"])["ETH/BTC"]["bid"])
+
+        self.assertListEqual(["stream", "polling", "stream", "polling"], switches)
+        self.assertEqual(3, feed.switches)
+        feed.stop()
+
+    def test_reconnect(self):
+        stream = StreamFeed("localhost", self.server.port, ["ETH/BTC"], reconnect_interval=0.05)
+        stream.start()
+        self.assertTrue(wait_until(lambda: self.server.clients_count() == 1))
+
+        port = self.server.port
+        self.server.stop()
+        self.assertTrue(wait_until(lambda: not stream.connected))
+
+        self.server = FeedServer("localhost", port)
+        self.server.start()
+        self.assertTrue(wait_until(lambda: stream.connected and self.server.clients_count() == 1))
+        self.assertGreater(stream.reconnects, 0)
+
+        self.server.publish("ETH/BTC", 0.03, 0.031)
+        self.assertTrue(wait_until(lambda: stream.messages == 1))
+        stream.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
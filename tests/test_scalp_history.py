@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_history
+from scalp_history import HistoryStore
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def scalp_report(i, symbol="ETH/BTC", side="buy", depth=1, delta=0.0015, result=0.001, day=1, state="closed"):
+    return {"scalp-id": "s-{}".format(i), "symbol": symbol, "order1_side": side, "depth": depth, "state": state,
+            "start-qty": 0.01, "ticker_price": 0.08, "ma_short_long_rel_delta": delta, "result-fact-diff": result,
+            "cur1-diff": result, "cur2-diff": 0.0,
+            "time_created_utc": datetime.datetime(2026, 10, day, 12, 0, 0, i),
+            "leg1-filled": 1.0, "leg1-order-status": "closed", "leg1-order-updates": 3,
+            "leg2-filled": 0.5 if state == "handed_over" else 1.0, "leg2-order-status": "closed",
+            "leg2-order1-updates": None}
+
+
+class ScalpHistoryTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, store):
+        for i in range(10):
+            store.append_report(scalp_report(i, depth=1 + i % 3, result=0.001 * (1 + i % 3), day=1 + i % 2))
+        for i in range(10, 15):
+            store.append_report(scalp_report(i, "XRP/BTC", "sell", 2, 0.0025, -0.002, 3, "handed_over"))
+
+    def test_append_and_aggregate(self):
+        store = HistoryStore(os.path.join(self.directory, "history"), segment_rows=4).open()
+        self.fill(store)
+        self.assertEqual(3, len(store.segments))  # 12 rows in segments and 3 buffered
+        self.assertEqual(15, store.rows)
+
+        by_depth = store.aggregate(["depth"])
+        self.assertListEqual([1, 2, 3], [a["depth"] for a in by_depth])
+        self.assertListEqual([4, 8, 3], [a["count"] for a in by_depth])
+        self.assertAlmostEqual(3 * 0.002 - 5 * 0.002, by_depth[1]["result_sum"])
+
+        by_side = {(a["symbol"], a["side"]): a for a in store.aggregate(["symbol", "side"])}
+        self.assertEqual(10, by_side[("ETH/BTC", "buy")]["count"])
+        self.assertAlmostEqual(0.5, by_side[("XRP/BTC", "sell")]["leg2_filled_mean"])
+        self.assertAlmostEqual(-0.002, by_side[("XRP/BTC", "sell")]["result_mean"])
+
+        by_delta = store.aggregate(["delta_bucket", "state"], delta_bucket=0.001)
+        self.assertListEqual([(0.001, "closed", 10), (0.002, "handed_over", 5)],
+                             [(a["delta_bucket"], a["state"], a["count"]) for a in by_delta])
+
+        by_day = store.aggregate(["day"])
+        self.assertListEqual(["2026-10-01", "2026-10-02", "2026-10-03"], [a["day"] for a in by_day])
+
+        store.MAX_DIRECT_GROUPS = 0  # sorted groups
+        self.assertListEqual(by_depth, store.aggregate(["depth"]))
+        self.assertListEqual(by_day, store.aggregate(["day"]))
+        del store.MAX_DIRECT_GROUPS
+
+        since = datetime.datetime(2026, 10, 2, tzinfo=datetime.timezone.utc).timestamp()
+        self.assertListEqual([5, 5], [a["count"] for a in store.aggregate(["day"], since=since)])
+        self.assertEqual(5, store.aggregate(["leg1_status"], symbols=["XRP/BTC"])[0]["count"])
+        self.assertListEqual([], store.aggregate(["depth"], symbols=["LTC/BTC"]))
+
+        with self.assertRaises(ValueError):
+            store.aggregate(["price"])
+
+        store.close()
+        reopened = HistoryStore(os.path.join(self.directory, "history"), segment_rows=4).open()
+        self.assertEqual(15, reopened.rows)
+        self.assertListEqual(by_depth, reopened.aggregate(["depth"]))
+        self.assertEqual(-1, reopened.columns(["leg2_updates"])["leg2_updates"][0])
+
+        reopened.compact()
+        self.assertEqual(4, len(reopened.segments))
+        self.assertListEqual(by_depth, reopened.aggregate(["depth"]))
+        self.assertEqual(4, len(os.listdir(reopened.segments_directory)))
+
+    def test_import_csv(self):
+        fields = ["scalp-id", "result-fact-diff", "start-qty", "cur1", "cur2", "symbol", "state", "depth",
+                  "ma_short_long_rel_delta", "time_created_utc", "order1_side", "leg1-filled", "leg2-filled",
+                  "leg1-order-status", "leg2-order-status", "leg1-order-updates", "leg2-order1-updates", "cur1-diff",
+                  "cur2-diff"]
+        filename = os.path.join(self.directory, "scalps_20261001.csv")
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            for i in range(6):
+                writer.writerow(scalp_report(i, depth=1 + i % 2))
+
+        store = HistoryStore(os.path.join(self.directory, "history")).open()
+        self.assertEqual(6, store.import_csv([filename]))
+        self.assertEqual(0, store.import_csv([filename]))  # already imported
+
+        by_depth = store.aggregate(["depth", "day"])
+        self.assertListEqual([(1, "2026-10-01", 3), (2, "2026-10-01", 3)],
+                             [(a["depth"], a["day"], a["count"]) for a in by_depth])
+        self.assertAlmostEqual(0.003, by_depth[0]["result_sum"])
+        self.assertAlmostEqual(1.0, by_depth[0]["leg2_filled_mean"])
+
+        # daily file grows: only the new complete lines are imported, the partially written line is left for later
+        with open(filename, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writerow(scalp_report(6, depth=1))
+            f.write("s-7,0.001")
+
+        self.assertEqual(1, store.import_csv([filename]))
+        with open(filename, "a", newline="") as f:
+            f.write(",0.01,,,ETH/BTC,closed,2,0.0015,2026-10-01 12:00:00,buy,1.0,1.0,closed,closed,3,,0.001,0.0\r\n")
+        self.assertEqual(1, store.import_csv([filename]))
+        self.assertEqual(0, store.import_csv([filename]))
+
+        reopened = HistoryStore(os.path.join(self.directory, "history")).open()
+        self.assertEqual(0, reopened.import_csv([filename]))
+        self.assertEqual(8, reopened.rows)
+        self.assertListEqual([(1, 4), (2, 4)], [(a["depth"], a["count"]) for a in reopened.aggregate(["depth"])])
+
+
+if __name__ == '__main__':
+    unittest.main()
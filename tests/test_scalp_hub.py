@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_hub
+from scalp_hub import MarketDataHub, HubReader, HubFeed
+import json
+import os
+import time
+import unittest
+
+
+class ScalpHubTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.name = "scalp_hub_test_{}".format(os.getpid())
+        self.hub = MarketDataHub(self.name, ["ETH/BTC", "TRX/BTC"], ring_size=4, markets_capacity=4096,
+                                 max_symbols=4)
+        self.hub.create()
+        self.reader = HubReader(self.name).attach()
+
+    def tearDown(self):
+        self.reader.detach()
+        self.hub.close()
+
+    def test_markets(self):
+        self.assertIsNone(self.reader.markets())
+
+        with open("../test_data/markets_binance.json") as f:
+            markets = json.load(f)
+
+        # all the markets do not fit: only hub's symbols
+        self.hub.publish_markets(markets)
+        self.assertListEqual(["ETH/BTC", "TRX/BTC"], sorted(self.reader.markets().keys()))
+        self.assertDictEqual(markets["ETH/BTC"], self.reader.markets()["ETH/BTC"])
+
+        self.hub.publish_markets({"ETH/BTC": {"symbol": "ETH/BTC"}})
+        self.assertDictEqual({"ETH/BTC": {"symbol": "ETH/BTC"}}, self.reader.markets())
+
+        with self.assertRaises(ValueError):
+            MarketDataHub("x", ["A/B"] * 5, max_symbols=4)
+
+    def test_ticks_ring(self):
+        self.assertListEqual(["ETH/BTC", "TRX/BTC"], self.reader.symbols)
+
+        self.hub.publish("ETH/BTC", 0.1, 0.11, 1)
+        self.hub.publish("ETH/BTC", 0.2, 0.21, 2)
+        ticks, cursor = self.reader.read_ticks("ETH/BTC", 0)
+        self.assertListEqual([(0.1, 0.11, 1.0), (0.2, 0.21, 2.0)], ticks)
+        self.assertEqual(2, cursor)
+
+        ticks, cursor = self.reader.read_ticks("ETH/BTC", cursor)
+        self.assertListEqual([], ticks)
+
+        # reader lags more than the ring: the oldest ticks are lost
+        for i in range(3, 10):
+            self.hub.publish("ETH/BTC", i / 10, i / 10 + 0.01, i)
+        ticks, cursor = self.reader.read_ticks("ETH/BTC", cursor)
+        self.assertListEqual([7.0, 8.0, 9.0], [t[2] for t in ticks])
+        self.assertEqual(9, cursor)
+
+        self.assertListEqual([], self.reader.read_ticks("TRX/BTC", 0)[0])
+
+    def test_hub_feed(self):
+        self.hub.publish("ETH/BTC", 0.1, 0.11, 1)  # before the feed is created
+        feed = HubFeed(self.reader, ["ETH/BTC", "TRX/BTC", "LTC/BTC"], stale_timeout=0.2)
+        self.assertListEqual(["ETH/BTC", "TRX/BTC"], feed.symbols)
+        self.assertListEqual(["LTC/BTC"], feed.missing)
+
+        self.hub.heartbeat()
+        self.assertTrue(feed.healthy())
+        self.assertDictEqual(dict(), feed.get_tickers(["ETH/BTC", "TRX/BTC", "LTC/BTC"]))
+
+        start = time.monotonic()
+        feed.wait(0.05)
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        self.hub.publish_tickers({"ETH/BTC": {"bid": 0.2, "ask": 0.21, "timestamp": 2},
+                                  "TRX/BTC": {"bid": 0.3, "ask": None},
+                                  "LTC/BTC": {"bid": 0.4, "ask": 0.41}})
+        self.hub.publish("ETH/BTC", 0.3, 0.31, 3)
+        feed.wait(5.0)
+        self.assertDictEqual({"ETH/BTC": {"bid": 0.3, "ask": 0.31, "timestamp": 3.0}},
+                             feed.get_tickers(["ETH/BTC", "TRX/BTC"]))
+
+        time.sleep(0.25)
+        self.assertFalse(feed.healthy())
+
+    def test_hub_feed_missing_symbols(self):
+        requests = list()
+
+        def fetch_tickers(symbols):
+            requests.append(symbols)
+            return {s: {"bid": 0.4, "ask": 0.41} for s in symbols}
+
+        feed = HubFeed(self.reader, ["ETH/BTC", "LTC/BTC"], fetch_tickers=fetch_tickers, fetch_interval=0.1)
+        self.hub.publish("ETH/BTC", 0.1, 0.11, 1)
+
+        # missing symbol is requested along with the hub's ticks and then once per fetch interval
+        self.assertDictEqual({"ETH/BTC": {"bid": 0.1, "ask": 0.11, "timestamp": 1.0},
+                              "LTC/BTC": {"bid": 0.4, "ask": 0.41}}, feed.get_tickers(["ETH/BTC", "LTC/BTC"]))
+        self.assertDictEqual(dict(), feed.get_tickers(["ETH/BTC", "LTC/BTC"]))
+        self.assertListEqual([["LTC/BTC"]], requests)
+
+        start = time.monotonic()
+        feed.wait(5.0)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertListEqual(["LTC/BTC"], list(feed.get_tickers(["ETH/BTC", "LTC/BTC"])))
+        self.assertEqual(2, len(requests))
+
+    def test_attach(self):
+        with self.assertRaises(FileNotFoundError):
+            HubReader("scalp_hub_test_missing").attach()
+
+
+if __name__ == '__main__':
+    unittest.main()
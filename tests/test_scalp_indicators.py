@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_indicators
+from scalp_indicators import RollingMAPair, TickerMAIndicator
+import unittest
+
+
+class ScalpIndicatorsTestSuite(unittest.TestCase):
+
+    def test_rolling_ma_pair(self):
+        values = [1.0, 2.0, 4.0, 3.0, 5.0, 7.0, 6.0, 2.0, 9.0, 1.0, 0.5, 3.3]
+        ma = RollingMAPair(3, 5)
+
+        for i, value in enumerate(values):
+            ma.update(value)
+
+            if i + 1 < 3:
+                self.assertIsNone(ma.ma_short)
+            else:
+                self.assertAlmostEqual(sum(values[i - 2:i + 1]) / 3, ma.ma_short, 12)
+
+            if i + 1 < 5:
+                self.assertIsNone(ma.ma_long)
+                self.assertIsNone(ma.rel_delta)
+            else:
+                self.assertAlmostEqual(sum(values[i - 4:i + 1]) / 5, ma.ma_long, 12)
+                self.assertAlmostEqual((ma.ma_short - ma.ma_long) / ma.ma_short, ma.rel_delta, 12)
+
+        self.assertEqual(values[-1], ma.last)
+        self.assertListEqual(values[-5:], ma.values())
+
+    def test_ticker_indicator_signal(self):
+        indicator = TickerMAIndicator(2, 3, 4)
+
+        for ask, bid in [(10, 9), (10, 9), (10, 9)]:
+            indicator.update(ask, bid)
+
+        self.assertFalse(indicator.warmed_up)
+        self.assertFalse(indicator.signal("buy", 0.0))
+
+        indicator.update(13, 8)
+        self.assertTrue(indicator.warmed_up)
+
+        # ask goes up: short ma of ask is above long one
+        self.assertAlmostEqual((11.5 - 11) / 11.5, indicator.rel_delta("buy"), 12)
+        self.assertTrue(indicator.signal("buy", 0.01))
+        self.assertFalse(indicator.signal("buy", 0.1))
+
+        # bid goes down: short ma of bid is below long one
+        self.assertAlmostEqual((8.5 - 26 / 3) / 8.5, indicator.rel_delta("sell"), 12)
+        self.assertTrue(indicator.signal("sell", 0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_journal
+from scalp_journal import ScalpJournal
+from scalp_bot import ScalpLane, SingleScalp, ScalpSignal
+from scalp_bot import ScalpBot
+from scalp_indicators import TickerMAIndicator
+from scalp import proceed_scalps, log_scalp_status
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class FakeTradeOrder(object):
+    def __init__(self):
+        self.id = None
+        self.status = "new"
+
+
+class FakeOrder(object):
+
+    def __init__(self, symbol, start_currency, start_amount, dest_currency, price):
+        self.symbol = symbol
+        self.start_currency = start_currency
+        self.start_amount = start_amount
+        self.dest_currency = dest_currency
+        self.price = price
+        self.status = "new"
+        self.state = "fok"
+        self.max_order_updates = 5
+        self.filled = 0.0
+        self.amount = start_amount
+        self.filled_start_amount = 0.0
+        self.filled_dest_amount = 0.0
+        self.trade_order = FakeTradeOrder()
+
+    @classmethod
+    def create_from_start_amount(cls, symbol, start_currency, amount_start, dest_currency, target_price,
+                                 cancel_threshold=0.0, max_order_updates=5):
+        return cls(symbol, start_currency, amount_start, dest_currency, target_price)
+
+    def get_active_order(self):
+        return self.trade_order
+
+
+class FakeOrderManager(object):
+
+    def __init__(self):
+        self.orders = list()
+
+    def add_order(self, order):
+        self.orders.append(order)
+
+
+class ScalpJournalTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.order_class = SingleScalp.order_class
+        SingleScalp.order_class = FakeOrder
+
+    def tearDown(self):
+        SingleScalp.order_class = self.order_class
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def create_lane():
+        return ScalpLane("ETH/BTC", "BTC", "ETH", 0.01, 0.001, 0.0025, 5, TickerMAIndicator(2, 3, 10))
+
+    def test_restore(self):
+        journal = ScalpJournal(self.directory, 1024, 3600)
+        journal.open()
+
+        lane = self.create_lane()
+        for i in range(12):
+            lane.indicator.update(0.08 + i * 0.0001, 0.08 + i * 0.0001 - 0.00005)
+
+        scalps = [SingleScalp("ETH/BTC", "BTC", 0.01, depth, 0.08, "ETH", 0.0025) for depth in range(1, 6)]
+        for scalp in scalps:
+            scalp.signal = ScalpSignal("buy", 0.081, 0.08, 0.001, 1.0)
+        lane.scalps.add_scalps(scalps)
+
+        scalps[0].create_order1().trade_order.id = "o1"
+        scalps[1].create_order1().trade_order.id = "o2"
+        journal.record_cycle([lane])  # first cycle makes snapshot
+
+        scalps[1].order1.filled_start_amount = 0.01
+        scalps[1].order1.filled_dest_amount = 0.125
+        scalps[1].state = "order1_complete"
+        scalps[1].create_order2().trade_order.id = "o3"
+        scalps[1].cur1_diff = -0.01
+
+        scalps[4].create_order1().trade_order.id = "o5"
+        scalps[4].order1.filled_start_amount = 0.01
+        scalps[4].order1.filled_dest_amount = 0.125
+        scalps[4].state = "order1_complete"  # order 2 is not created yet
+
+        scalps[2].create_order1().trade_order.id = "o4"
+        scalps[2].state = "closed"
+        lane.scalps.remove_scalp(scalps[2].id)
+
+        lane.run = 2
+        lane.total_result = 0.0001
+        for i in range(3):
+            lane.indicator.update(0.09, 0.0899)
+
+        journal.record_cycle([lane])
+        journal.close()
+
+        # restart
+        journal = ScalpJournal(self.directory, 1024, 3600)
+        journal.open()
+        restored_lane = self.create_lane()
+        live_orders = journal.restore([restored_lane])
+
+        restored = {s.depth: s for s in restored_lane.scalps.active_scalps.values()}
+        self.assertListEqual([1, 2, 4, 5], sorted(restored.keys()))
+        self.assertEqual("order1", restored[1].state)
+        self.assertEqual("order2", restored[2].state)
+        self.assertEqual("new", restored[4].state)
+        self.assertEqual("order1_complete", restored[5].state)
+        self.assertEqual(scalps[1].id, restored[2].id)
+        self.assertEqual(0.125, restored[2].order1.filled_dest_amount)
+        self.assertEqual(-0.01, restored[2].cur1_diff)
+        self.assertEqual("buy", restored[2].signal.order1_side)
+        self.assertListEqual(["o1", "o3"], sorted([o.get_active_order().id for o in live_orders]))
+        self.assertTrue(all([o.status == "open" for o in live_orders]))
+
+        self.assertEqual(2, restored_lane.run)
+        self.assertEqual(0.0001, restored_lane.total_result)
+        self.assertEqual(15, restored_lane.indicator.ticks)
+        self.assertTrue(restored_lane.indicator.warmed_up)
+        self.assertEqual(lane.indicator.ask.ma_long, restored_lane.indicator.ask.ma_long)
+        self.assertEqual(lane.indicator.bid.ma_short, restored_lane.indicator.bid.ma_short)
+
+        self.assertGreater(SingleScalp("ETH/BTC", "BTC", 0.01, 1, 0.08, "ETH", 0.0025).id, scalps[3].id)
+
+        # no changes - nothing is journaled
+        records_written = journal.records_written
+        journal.record_cycle([restored_lane])
+        self.assertEqual(records_written, journal.records_written)
+
+        # restored scalps are proceeded and logged as usual: order 2 of the restored scalp in order1_complete is created
+        bot = ScalpBot("../_config_default.json")
+        bot.load_config_from_file("../_config_default.json")
+        om = FakeOrderManager()
+        self.assertIsNone(restored[2].order1.get_active_order())
+        self.assertEqual(0.08, restored[2].order1.price)
+        restored_lane.scalps.scalp_changed(restored[2])
+        proceed_scalps(bot, om, restored_lane)
+        log_scalp_status(bot, restored[5])
+        self.assertEqual("order2", restored[2].state)
+        self.assertEqual("order2", restored[5].state)
+        self.assertIn(restored[5].order2, om.orders)
+        journal.close()
+
+    def test_torn_record(self):
+        journal = ScalpJournal(self.directory, 64, 3600)
+        journal.open()
+        for i in range(10):
+            journal.append({"type": "removed", "lane": "l", "id": i})  # grows the file
+
+        self.assertEqual(10, len(journal.read_records()))
+
+        journal._mmap[journal._offset - 2:journal._offset] = b"xx"  # last record is corrupted
+        self.assertEqual(9, len(journal.read_records()))
+        journal.close()
+
+        self.assertGreater(os.path.getsize(journal.journal_file), 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
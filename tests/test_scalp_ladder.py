@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_ladder
+from scalp_ladder import ladder, market_tick_size, round_to_tick, book_ladder, OrderBookIndex, OrderBookCache
+from scalp_bot import ScalpLane, ScalpsCollection, SingleScalp
+from scalp_indicators import TickerMAIndicator
+import numpy as np
+import json
+import unittest
+
+
+class ScalpLadderTestSuite(unittest.TestCase):
+
+    def test_market_tick_size(self):
+        with open("../test_data/markets_binance.json") as f:
+            markets = json.load(f)
+
+        self.assertEqual(0.000001, market_tick_size(markets["ETH/BTC"]))
+        self.assertEqual(0.01, market_tick_size({"precision": {"price": 2}}))
+        self.assertEqual(0.05, market_tick_size({"precision": {"price": 0.05}}))
+        self.assertIsNone(market_tick_size({"precision": {}}))
+        self.assertIsNone(market_tick_size(None))
+
+        self.assertEqual(1.0, market_tick_size({"precision": {"price": 1.0}}, scalp_ladder.TICK_SIZE))
+        self.assertEqual(0.1, market_tick_size({"precision": {"price": 1}}, scalp_ladder.DECIMAL_PLACES))
+        self.assertEqual(0.25, market_tick_size({"precision": {"price": 0.25}}, scalp_ladder.TICK_SIZE))
+
+    def test_round_to_tick(self):
+        prices = np.array([0.0812345, 0.0812340, 0.0812349])
+        self.assertListEqual([0.081234, 0.081234, 0.081234], round_to_tick(prices, 0.000001, "buy").tolist())
+        self.assertListEqual([0.081235, 0.081234, 0.081235], round_to_tick(prices, 0.000001, "sell").tolist())
+        self.assertIs(prices, round_to_tick(prices, None, "buy"))
+
+        # ticks of more than one significant digit
+        self.assertListEqual([0.75], round_to_tick(np.array([0.76]), 0.25, "buy").tolist())
+        self.assertListEqual([1.0], round_to_tick(np.array([0.76]), 0.25, "sell").tolist())
+        self.assertListEqual([0.081225], round_to_tick(np.array([0.0812345]), 0.000025, "buy").tolist())
+        self.assertListEqual([0.08125], round_to_tick(np.array([0.0812345]), 0.000025, "sell").tolist())
+
+    def test_ladder_same_as_lane_levels(self):
+        lane = ScalpLane("ETH/BTC", "BTC", "ETH", 0.01, 0.001, 0.0025, 10, TickerMAIndicator(2, 3), 1.5, 0.5)
+        ticker = {"ask": 0.0812, "bid": 0.0811}
+        depths = [1, 2, 5, 10]
+
+        prices, profits = lane.ladder(ticker, depths)
+        for i, depth in enumerate(depths):
+            self.assertAlmostEqual(lane.order1_price(ticker, depth), prices[i], 15)
+            self.assertAlmostEqual(lane.profit_with_depth(depth), profits[i], 15)
+
+        prices, profits = ladder("sell", 0.0811, 0.0812, 0.001, 0.0025, 1.5, 0.5, depths, 0.000001)
+        self.assertListEqual(sorted(prices.tolist()), prices.tolist())
+        self.assertTrue(all([p >= 0.0812 for p in prices]))
+
+        lane.tick_size = 0.000001
+        prices, profits = lane.ladder(ticker, depths)
+        self.assertListEqual([0.080998, 0.080876, 0.080512, 0.079903], prices)
+
+    def test_add_scalps(self):
+        scalps = ScalpsCollection(5)
+        scalps.add_scalps([SingleScalp("ETH/BTC", "BTC", 0.01, depth, 0.08, "ETH", 0.002) for depth in range(1, 4)])
+
+        self.assertEqual(3, len(scalps.active_scalps))
+        self.assertEqual(3, scalps.count("new"))
+        self.assertListEqual([4, 5], scalps.missed_scalps_depth("order1", 5))
+
+    def test_stale_scalps(self):
+        lane = ScalpLane("ETH/BTC", "BTC", "ETH", 0.01, 0.001, 0.0025, 3, TickerMAIndicator(2, 3), 1.0, 0.0)
+        prices, profits = lane.ladder({"ask": 0.1001, "bid": 0.1}, [1, 2, 3])
+
+        for depth, price in zip([1, 2, 3], prices):
+            scalp = SingleScalp("ETH/BTC", "BTC", 0.01, depth, price, "ETH", 0.002)
+            scalp.state = "order1"
+            lane.scalps.add_scalp(scalp)
+
+        self.assertListEqual([], lane.stale_scalps({"ask": 0.1001, "bid": 0.1}))
+
+        stale = lane.stale_scalps({"ask": 0.10016, "bid": 0.10015})  # moved up by 1.5 depth steps
+        self.assertListEqual([2, 3], sorted([s.depth for s in stale]))
+
+    def test_book_ladder(self):
+        lane = ScalpLane("ETH/BTC", "BTC", "ETH", 0.01, 0.001, 0.0025, 3, TickerMAIndicator(2, 3), 1.0, 0.0)
+        lane.tick_size = 0.00001
+        ticker = {"ask": 0.10001, "bid": 0.1}
+        order_book = {"bids": [[0.1, 1], [0.09999, 1], [0.09993, 10], [0.0998, 1], [0.09979, 1]],
+                      "asks": [[0.10001, 1]]}
+        book = OrderBookIndex(order_book, "buy")
+
+        self.assertListEqual([0.1, 0.0999, 0.0998], lane.ladder(ticker, [1, 2, 3])[0])
+        self.assertListEqual([1.0, 2.0, 12.0, 13.0, 14.0],
+                             book.queue_ahead(np.array([0.1, 0.09994, 0.09993, 0.0998, 0.09])).tolist())
+
+        # level 2 is moved one tick ahead of the wall at 0.09993
+        depths, prices, profits = lane.book_ladder(ticker, [1, 2, 3], book, 3.0)
+        self.assertListEqual([1, 2, 3], depths)
+        self.assertListEqual([0.1, 0.09994, 0.0998], prices)
+        self.assertListEqual(lane.ladder(ticker, [1, 2, 3])[1], profits)
+
+        # level 3 is behind 13 of max 2 * 2.8 mean level volumes
+        depths, prices, profits = lane.book_ladder(ticker, [1, 2, 3], book, 3.0, 2.0)
+        self.assertListEqual([1, 2], depths)
+        self.assertListEqual([0.1, 0.09994], prices)
+
+        # wall at the best bid: not moved across the spread
+        lane.first_order_price_margin_in_profits_with_fees = 0.02
+        self.assertListEqual([0.09999], lane.ladder(ticker, [1])[0])
+        book = OrderBookIndex({"bids": [[0.1, 20], [0.09999, 1], [0.09998, 1]], "asks": [[0.10001, 1]]}, "buy")
+        depths, prices, profits = lane.book_ladder(ticker, [1], book, 2.0)
+        self.assertListEqual([0.1], prices)
+
+    def test_book_ladder_same_wall_and_tick(self):
+        book = OrderBookIndex({"bids": [[10.0, 1], [9.5, 30], [9.25, 1], [9.0, 1], [8.75, 1]], "asks": [[10.25, 1]]},
+                              "buy")
+
+        # both lower levels are moved one tick (0.25) ahead of the wall at 9.5: the second one is not placed
+        prices, mask = book_ladder(np.array([10.0, 9.25, 9.0]), np.array([0.5, 0.5, 0.75]), book, 0.25, 3.0)
+        self.assertListEqual([10.0, 9.75, 9.75], prices.tolist())
+        self.assertListEqual([True, True, False], mask.tolist())
+
+    def test_order_book_cache(self):
+        requests = list()
+
+        def fetch_order_book(symbol, limit):
+            requests.append((symbol, limit))
+            return {"bids": [[0.1, 1]], "asks": [[0.11, 2]]}
+
+        cache = OrderBookCache(fetch_order_book, 5, 60.0)
+        self.assertEqual(0.1, cache.index("ETH/BTC", "buy").prices[0])
+        self.assertEqual(0.11, cache.index("ETH/BTC", "sell").prices[0])
+        self.assertIs(cache.index("ETH/BTC", "buy"), cache.index("ETH/BTC", "buy"))
+        self.assertListEqual([("ETH/BTC", 5)], requests)
+
+        cache.max_age = 0.0
+        cache.index("ETH/BTC", "buy")
+        self.assertEqual(2, cache.fetches)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_orders
+from scalp_orders import BatchedOrdersExchange, OrderRefreshScheduler
+import unittest
+
+
+class FakeCcxt(object):
+
+    def __init__(self, open_orders):
+        self.has = {"fetchOpenOrders": True}
+        self.open_orders = open_orders
+        self.requests = 0
+
+    def fetch_open_orders(self, symbol):
+        self.requests += 1
+        return [o for o in self.open_orders if o["symbol"] == symbol]
+
+
+class FakeExchange(object):
+
+    def __init__(self, open_orders):
+        self._ccxt = FakeCcxt(open_orders)
+        self.offline = False
+        self.requests = 0
+        self.exchange_id = "fake"
+        self.update_status = "closed"
+
+    def get_order_update(self, order):
+        self.requests += 1
+        return {"id": order.id, "status": self.update_status, "filled": 1.0}
+
+    def place_limit_order(self, order):
+        self.requests += 1
+        if order.price <= 0:
+            raise Exception("Wrong price")
+        return {"id": "new-{}".format(order.price), "status": "open"}
+
+    def cancel_order(self, order):
+        self.requests += 1
+        return {"id": order.id, "status": "canceled"}
+
+
+class FakeTradeOrder(object):
+    def __init__(self, order_id, symbol, side="buy", amount=1.0, price=0.08):
+        self.id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.price = price
+
+
+class FakeActionOrder(object):
+    def __init__(self, order_id, symbol):
+        self.symbol = symbol
+        self.trade_order = FakeTradeOrder(order_id, symbol)
+
+    def get_active_order(self):
+        return self.trade_order
+
+
+class ScalpOrdersTestSuite(unittest.TestCase):
+
+    def test_batched_order_updates(self):
+        open_orders = [{"id": str(i), "symbol": "ETH/BTC", "status": "open", "filled": 0.0} for i in range(1, 5)]
+        open_orders.append({"id": "10", "symbol": "BNB/BTC", "status": "open", "filled": 0.0})
+
+        exchange = BatchedOrdersExchange(FakeExchange(open_orders))
+        self.assertEqual("fake", exchange.exchange_id)
+
+        orders = [FakeActionOrder(str(i), "ETH/BTC") for i in range(1, 6)]  # order 5 is not open any more
+        orders.append(FakeActionOrder("10", "BNB/BTC"))
+
+        exchange.prefetch_open_orders(orders)
+        updates = [exchange.get_order_update(o.get_active_order()) for o in orders]
+        stats = exchange.finish_cycle()
+
+        self.assertListEqual(["open"] * 4 + ["closed", "closed"], [u["status"] for u in updates])
+        self.assertEqual(1, exchange.exchange._ccxt.requests)  # BNB/BTC has single order, no batch request
+        self.assertEqual(2, exchange.exchange.requests)  # order 5 and BNB/BTC order
+        self.assertDictEqual({"order_updates": 6, "batch_requests": 1, "single_requests": 2, "cached_updates": 0,
+                              "requests_saved": 3},
+                             stats)
+        self.assertEqual(3, exchange.total_requests_saved)
+
+    def test_no_batch_offline(self):
+        fake_exchange = FakeExchange([{"id": "1", "symbol": "ETH/BTC", "status": "open"}])
+        fake_exchange.offline = True
+        exchange = BatchedOrdersExchange(fake_exchange)
+
+        orders = [FakeActionOrder("1", "ETH/BTC"), FakeActionOrder("2", "ETH/BTC")]
+        exchange.prefetch_open_orders(orders)
+        for o in orders:
+            exchange.get_order_update(o.get_active_order())
+
+        self.assertEqual(0, exchange.finish_cycle()["requests_saved"])
+        self.assertEqual(0, fake_exchange._ccxt.requests)
+
+    def test_bulk_placement_batch(self):
+        fake_exchange = FakeExchange([])
+        fake_exchange._ccxt.has["createOrders"] = True
+        fake_exchange._ccxt.has["cancelOrders"] = True
+        fake_exchange._ccxt.created = list()
+        fake_exchange._ccxt.canceled = list()
+        fake_exchange._ccxt.create_orders = lambda orders: fake_exchange._ccxt.created.append(orders) or \
+            [{"id": str(o["price"]), "status": "open"} for o in orders]
+        fake_exchange._ccxt.cancel_orders = lambda ids, symbol: fake_exchange._ccxt.canceled.append((ids, symbol))
+
+        exchange = BatchedOrdersExchange(fake_exchange)
+        orders = [FakeActionOrder(None, "ETH/BTC") for i in range(10)]
+        for i, o in enumerate(orders):
+            o.trade_order.price = 0.08 - i * 0.001
+        orders.append(FakeActionOrder(None, "BNB/BTC"))
+        orders.append(FakeActionOrder("1", "BNB/BTC"))  # already placed
+
+        stats = exchange.place_orders(orders)
+        self.assertEqual(11, stats["orders"])
+        self.assertEqual(2, stats["batch_requests"])
+        self.assertEqual(10, len(fake_exchange._ccxt.created[0]))
+        self.assertEqual(0, exchange.place_orders(orders)["orders"])  # not placed twice
+
+        self.assertEqual("0.079", exchange.place_limit_order(orders[1].get_active_order())["id"])
+        orders[1].trade_order.id = "0.079"  # set by the order manager
+        self.assertEqual(0, fake_exchange.requests)
+
+        trade_order = FakeTradeOrder(None, "ETH/BTC", price=0.05)
+        self.assertEqual("new-0.05", exchange.place_limit_order(trade_order)["id"])  # not placed in bulk
+        self.assertEqual(1, fake_exchange.requests)
+
+        stats = exchange.cancel_orders([FakeTradeOrder(str(i), "ETH/BTC") for i in range(3)])
+        self.assertEqual(1, stats["batch_requests"])
+        self.assertListEqual([(["0", "1", "2"], "ETH/BTC")], fake_exchange._ccxt.canceled)
+
+        # results not taken by the order manager are kept over the cycles: the orders are not placed again
+        exchange.finish_cycle()
+        self.assertEqual(10, len(exchange._placed))  # 11 placed, 1 taken
+        self.assertEqual(0, exchange.place_orders(orders)["orders"])
+        self.assertEqual("0.08", exchange.place_limit_order(orders[0].get_active_order())["id"])
+        orders[0].trade_order.id = "0.08"
+        self.assertEqual(1, fake_exchange.requests)
+
+        # orders left by the order manager before their results were taken are canceled
+        fake_exchange._ccxt.canceled = list()
+        orders[3].trade_order = FakeTradeOrder(None, "ETH/BTC")  # replaced by the new trade order
+        stats = exchange.place_orders(orders[:4])  # orders 4-9 and BNB/BTC are closed
+        self.assertEqual(8, stats["orphaned"])
+        self.assertEqual(1, stats["orders"])
+        self.assertListEqual(["0.077"] + [str(o.trade_order.price) for o in orders[4:10]],
+                             fake_exchange._ccxt.canceled[0][0])
+        self.assertEqual((["0.08"], "BNB/BTC"), fake_exchange._ccxt.canceled[1])
+        self.assertEqual(2, len(exchange._placed))  # order 3 and the new trade order of order 4
+
+    def test_bulk_placement_rejected(self):
+        fake_exchange = FakeExchange([])
+        fake_exchange._ccxt.has["createOrders"] = True
+        fake_exchange._ccxt.create_orders = lambda orders: [{"id": "1", "status": "open"},
+                                                            {"id": None, "status": "rejected"}]
+
+        exchange = BatchedOrdersExchange(fake_exchange)
+        orders = [FakeActionOrder(None, "ETH/BTC") for i in range(2)]
+        self.assertEqual(1, exchange.place_orders(orders)["errors"])
+
+        self.assertEqual("1", exchange.place_limit_order(orders[0].get_active_order())["id"])
+        with self.assertRaises(scalp_orders.OrderPlacementError):
+            exchange.place_limit_order(orders[1].get_active_order())
+
+    def test_bulk_placement_concurrent(self):
+        fake_exchange = FakeExchange([])
+        exchange = BatchedOrdersExchange(fake_exchange, 4)
+
+        orders = [FakeActionOrder(None, "ETH/BTC") for i in range(5)]
+        orders[2].trade_order.price = 0.0
+
+        stats = exchange.place_orders(orders)
+        self.assertEqual(5, stats["single_requests"])
+        self.assertEqual(1, stats["errors"])
+        self.assertEqual(5, fake_exchange.requests)
+
+        self.assertEqual("open", exchange.place_limit_order(orders[0].get_active_order())["status"])
+        with self.assertRaises(Exception):
+            exchange.place_limit_order(orders[2].get_active_order())
+        self.assertEqual(5, fake_exchange.requests)
+
+        stats = exchange.cancel_orders([o.get_active_order() for o in orders])
+        self.assertEqual(5, stats["single_requests"])
+        self.assertEqual(10, fake_exchange.requests)
+
+        fake_exchange.offline = True
+        self.assertEqual(0, exchange.place_orders([FakeActionOrder(None, "ETH/BTC")])["single_requests"])
+
+    def test_refresh_intervals(self):
+        refresh = OrderRefreshScheduler(near_levels=2.0, max_interval=8)
+        order = FakeTradeOrder("1", "ETH/BTC", "buy", price=0.099)
+        self.assertEqual(1, refresh.interval(order))  # no market
+
+        refresh.set_depth_step("ETH/BTC", 0.002)
+        refresh.set_depth_step("ETH/BTC", 0.005)  # smallest step is kept
+        refresh.update_market("ETH/BTC", 0.1, 0.101)
+
+        intervals = list()
+        for price in (0.1, 0.0997, 0.0995, 0.099, 0.098, 0.09, 0.05):  # 0, 0.75, 1.25, 2.5, 5, 25 and 125 near distances
+            order.price = price
+            intervals.append(refresh.interval(order))
+        self.assertListEqual([1, 1, 2, 4, 8, 8, 8], intervals)
+
+        sell_order = FakeTradeOrder("2", "ETH/BTC", "sell", price=0.10302)  # 5 near distances above the ask
+        self.assertEqual(8, refresh.interval(sell_order))
+        sell_order.price = 0.1012
+        self.assertEqual(1, refresh.interval(sell_order))
+
+    def test_refresh_cached_updates(self):
+        fake_exchange = FakeExchange([])
+        fake_exchange.update_status = "open"
+        refresh = OrderRefreshScheduler(near_levels=1.0, max_interval=4)
+        refresh.set_depth_step("ETH/BTC", 0.01)
+        refresh.update_market("ETH/BTC", 0.1, 0.101)
+        exchange = BatchedOrdersExchange(fake_exchange, refresh=refresh)
+
+        near_order = FakeTradeOrder("1", "ETH/BTC", price=0.0995)
+        far_order = FakeTradeOrder("2", "ETH/BTC", price=0.096)  # 4 depth steps: every 4 cycles
+
+        cycles_requests = list()
+        for _ in range(5):
+            requests = fake_exchange.requests
+            for order in (near_order, far_order):
+                self.assertEqual("open", exchange.get_order_update(order)["status"])
+            exchange.finish_cycle()
+            cycles_requests.append(fake_exchange.requests - requests)
+
+        self.assertListEqual([2, 1, 1, 1, 2], cycles_requests)
+        self.assertEqual(3, exchange.total_requests_saved)
+
+        # order requested to cancel is updated every cycle until it's closed
+        exchange.cancel_order(far_order)
+        requests = fake_exchange.requests
+        exchange.get_order_update(far_order)
+        exchange.finish_cycle()
+        self.assertEqual(1, fake_exchange.requests - requests)
+
+        fake_exchange.update_status = "closed"
+        exchange.get_order_update(far_order)
+        self.assertIsNone(refresh.cached_update(far_order))
+        self.assertNotIn(far_order.id, refresh._canceling)
+
+    def test_refresh_skips_prefetch(self):
+        open_orders = [{"id": str(i), "symbol": "ETH/BTC", "status": "open", "filled": 0.0} for i in range(1, 3)]
+        fake_exchange = FakeExchange(open_orders)
+        refresh = OrderRefreshScheduler(near_levels=1.0, max_interval=4)
+        refresh.set_depth_step("ETH/BTC", 0.01)
+        refresh.update_market("ETH/BTC", 0.1, 0.101)
+        exchange = BatchedOrdersExchange(fake_exchange, refresh=refresh)
+
+        orders = [FakeActionOrder(str(i), "ETH/BTC") for i in range(1, 3)]
+        for order in orders:
+            order.trade_order.price = 0.095
+
+        for cycle in range(2):
+            exchange.prefetch_open_orders(orders)
+            for order in orders:
+                self.assertEqual("open", exchange.get_order_update(order.get_active_order())["status"])
+            exchange.finish_cycle()
+
+        # far orders are not due in the second cycle: no batch request for them
+        self.assertEqual(1, fake_exchange._ccxt.requests)
+        self.assertEqual(0, fake_exchange.requests)
+        self.assertEqual(2, exchange.last_cycle_stats["cached_updates"])
+
+    def test_refresh_prefetched_disappeared(self):
+        open_orders = [{"id": str(i), "symbol": "ETH/BTC", "status": "open", "filled": 0.0} for i in range(1, 4)]
+        fake_exchange = FakeExchange(open_orders)
+        refresh = OrderRefreshScheduler(near_levels=1.0, max_interval=4)
+        refresh.set_depth_step("ETH/BTC", 0.01)
+        refresh.update_market("ETH/BTC", 0.1, 0.101)
+        exchange = BatchedOrdersExchange(fake_exchange, refresh=refresh)
+
+        orders = [FakeActionOrder(str(i), "ETH/BTC") for i in range(1, 4)]
+        orders[0].trade_order.price = 0.1  # near orders are due every cycle, so the symbol is prefetched
+        orders[1].trade_order.price = 0.1
+        orders[2].trade_order.price = 0.095  # far order is cached in the second cycle
+
+        exchange.prefetch_open_orders(orders)
+        for order in orders:
+            exchange.get_order_update(order.get_active_order())
+        exchange.finish_cycle()
+
+        del open_orders[2]  # far order is filled
+        exchange.prefetch_open_orders(orders)
+        updates = [exchange.get_order_update(o.get_active_order()) for o in orders]
+        stats = exchange.finish_cycle()
+
+        self.assertListEqual(["open", "open", "closed"], [u["status"] for u in updates])
+        self.assertEqual(1, fake_exchange.requests)
+        self.assertEqual(0, stats["cached_updates"])
+        self.assertIsNone(refresh.cached_update(orders[2].get_active_order()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_profiler
+from scalp_profiler import LatencyHistogram, PhaseProfiler, ProfiledExchange, ProfileSignals
+import os
+import random
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+
+class FakeExchange(object):
+    offline = True
+
+    def __init__(self):
+        self._ccxt = self
+
+    def fetch_tickers(self, symbols):
+        return dict()
+
+    def fetch_open_orders(self, symbol):
+        return list()
+
+
+class ScalpProfilerTestSuite(unittest.TestCase):
+
+    def test_histogram(self):
+        h = LatencyHistogram(7)
+        values = [random.randint(1, 10 ** 7) for _ in range(10000)] + [5, 17]
+        for v in values:
+            h.record_ns(v)
+
+        values.sort()
+        for p in (50, 90, 99, 99.9):
+            exact = values[int(round(len(values) * p / 100.0)) - 1]
+            self.assertAlmostEqual(exact, h.percentile_ns(p), delta=exact / 64 + 1)
+
+        self.assertEqual(values[-1], h.percentile_ns(100))
+        self.assertEqual(values[-1], h.max)
+        self.assertEqual(len(values), h.count)
+        self.assertAlmostEqual(sum(values) / len(values), h.mean_ns)
+
+        small = LatencyHistogram(7)
+        for v in range(100):
+            small.record_ns(v)
+        self.assertEqual(49, small.percentile_ns(50))  # exact below 2**7
+
+        small.merge(h)
+        self.assertEqual(len(values) + 100, small.count)
+        self.assertEqual(values[-1], small.max)
+
+        h.reset()
+        self.assertEqual(0, h.percentile_ns(50))
+
+    def test_phases_and_requests(self):
+        profiler = PhaseProfiler()
+        exchange = ProfiledExchange(FakeExchange(), profiler)
+
+        with profiler.phase("tickers"):
+            exchange.fetch_tickers(["ETH/BTC"])
+            time.sleep(0.002)
+
+        with profiler.phase("orders"):
+            exchange._ccxt.fetch_open_orders("ETH/BTC")
+            with profiler.phase("journal"):
+                pass
+            exchange.fetch_open_orders("ETH/BTC")
+
+        exchange.fetch_tickers(["ETH/BTC"])
+        self.assertTrue(exchange.offline)
+
+        points = {p["phase"]: p for p in profiler.points()}
+        self.assertListEqual(["journal", "orders", "other", "tickers"], sorted(points.keys()))
+        self.assertEqual(1, points["tickers"]["requests"])
+        self.assertEqual(2, points["orders"]["requests"])
+        self.assertEqual(1, points["other"]["requests"])
+        self.assertEqual(0, points["other"]["count"])
+        self.assertGreaterEqual(points["tickers"]["p50-us"], 2000)
+        self.assertIn("tickers n=1", profiler.summary())
+
+        profiler.reset()
+        self.assertListEqual([], profiler.points())
+
+    @unittest.skipUnless(hasattr(signal, "SIGUSR1"), "no SIGUSR1")
+    def test_profile_signals(self):
+        directory = tempfile.mkdtemp()
+        try:
+            signals = ProfileSignals(directory)
+            self.assertTrue(signals.install())
+
+            os.kill(os.getpid(), signal.SIGUSR1)
+            sum([i for i in range(1000)])
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertEqual(1, len(signals.dumps))
+            self.assertTrue(os.path.isfile(signals.dumps[0]))
+
+            os.kill(os.getpid(), signal.SIGUSR2)
+            signals.uninstall()
+            with open(os.path.join(directory, "stacks.txt")) as f:
+                self.assertIn("test_profile_signals", f.read())
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
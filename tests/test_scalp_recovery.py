@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_recovery
+from scalp_recovery import RecoveryWorker, RecoveryClient
+from scalp import handoff_order2
+import socket
+import time
+import unittest
+
+
+class FakeBot(object):
+    LOG_INFO = 20
+    LOG_ERROR = 40
+
+    def __init__(self):
+        self.reports = list()
+        self.errors = list()
+        self.om_proceed_sleep = 0.0
+        self.session_uuid = "s"
+        self.recovery_handoff_updates = 2
+        self.recovery_client = None
+
+    def log(self, level, msg):
+        if level == self.LOG_ERROR:
+            self.errors.append(msg)
+
+    def send_remote_report(self, report):
+        self.reports.append(report)
+
+    def cycle_sleep(self):
+        return 0.0
+
+
+class StandInExchange(object):
+    """
+    ccxt-like exchange: limit orders are filled at their price when the ticker crosses it
+    """
+
+    def __init__(self, bid, ask):
+        self.bid, self.ask = bid, ask
+        self.orders = dict()
+        self.requests = 0
+
+    def add_order(self, order_id, symbol, side, amount, price, filled=0.0):
+        self.orders[order_id] = {"id": order_id, "symbol": symbol, "side": side, "amount": amount, "price": price,
+                                 "filled": filled, "cost": filled * price, "status": "open"}
+
+    def _match(self, order):
+        if order["status"] != "open":
+            return
+        if (order["side"] == "sell" and self.bid >= order["price"]) or \
+                (order["side"] == "buy" and self.ask <= order["price"]):
+            order["filled"] = order["amount"]
+            order["cost"] = order["amount"] * order["price"]
+            order["status"] = "closed"
+
+    def fetch_order(self, order_id, symbol):
+        self.requests += 1
+        order = self.orders[order_id]
+        self._match(order)
+        return dict(order)
+
+    def cancel_order(self, order_id, symbol):
+        self.requests += 1
+        self.orders[order_id]["status"] = "canceled"
+
+    def create_order(self, symbol, order_type, side, amount, price):
+        self.requests += 1
+        order_id = str(len(self.orders) + 1)
+        self.add_order(order_id, symbol, side, amount, price)
+        return dict(self.orders[order_id])
+
+    def fetch_ticker(self, symbol):
+        self.requests += 1
+        return {"bid": self.bid, "ask": self.ask}
+
+
+class StandInOrder2(object):
+
+    def __init__(self, order_id):
+        self.id = order_id
+        self.side = "sell"
+        self.amount = 0.125
+        self.price = 0.0802
+        self.filled = 0.0
+        self.update_requests_count = 5
+        self.status = "open"
+
+    def get_active_order(self):
+        return self
+
+
+class StandInScalp(object):
+
+    def __init__(self, scalp_id):
+        self.id = scalp_id
+        self.symbol = "ETH/BTC"
+        self.order2 = StandInOrder2(str(scalp_id))
+        self.handed_over = False
+
+    def hand_over_order2(self):
+        self.handed_over = True
+
+
+class StandInOrderManager(object):
+
+    def __init__(self, orders):
+        self.orders = list(orders)
+
+
+class ScalpRecoveryTestSuite(unittest.TestCase):
+
+    def test_handoff_and_recovery(self):
+        exchange = StandInExchange(0.079, 0.0791)
+        exchange.add_order("1", "ETH/BTC", "sell", 0.125, 0.0802, filled=0.025)
+
+        bot = FakeBot()
+        worker = RecoveryWorker(bot, exchange, "localhost", 0, max_updates_for_profit=3, max_updates_market=2,
+                                markets={"ETH/BTC": {"limits": {"amount": {"min": 0.001}}}})
+        worker.start_server()
+        try:
+            client = RecoveryClient("localhost", worker.port)
+            self.assertTrue(client.handoff({"leg_id": "s-1", "symbol": "ETH/BTC", "side": "sell", "order_id": "1",
+                                            "amount": 0.125, "price": 0.0802, "filled": 0.025,
+                                            "cost": 0.025 * 0.0802}))
+            self.assertEqual(1, client.status()["legs"])
+            self.assertFalse(client.request({"cmd": "unknown"})["ok"])
+        finally:
+            worker.stop()
+
+        self.assertFalse(RecoveryClient("localhost", worker.port, 0.2).handoff({"leg_id": "s-2"}))
+
+        for i in range(3):  # profit phase: not filled at the target price
+            worker.proceed()
+        self.assertEqual("market", worker.legs["s-1"].phase)
+        self.assertEqual("canceled", exchange.orders["1"]["status"])
+        self.assertAlmostEqual(0.1, exchange.orders["2"]["amount"])
+        self.assertEqual(0.079, exchange.orders["2"]["price"])
+
+        exchange.bid, exchange.ask = 0.0785, 0.0786  # price moves away: order is re-placed at the new best price
+        worker.proceed()
+        worker.proceed()
+        self.assertEqual(0.0785, exchange.orders["3"]["price"])
+
+        worker.proceed()
+        self.assertEqual(0, len(worker.legs))
+        self.assertEqual(1, len(worker.completed))
+
+        result = bot.reports[0]
+        self.assertEqual("s-1", result["leg-id"])
+        self.assertAlmostEqual(0.125, result["filled"])
+        self.assertAlmostEqual(0.025 * 0.0802 + 0.1 * 0.0785, result["dest-amount"])
+        self.assertEqual(3, result["orders"])
+
+    def test_unreachable_worker(self):
+        with socket.socket() as s:  # free port nobody listens to
+            s.bind(("localhost", 0))
+            port = s.getsockname()[1]
+
+        bot = FakeBot()
+        bot.recovery_client = RecoveryClient("localhost", port, 0.2, retry_interval=60.0)
+        scalps = [StandInScalp(i) for i in range(3)]
+        om = StandInOrderManager([scalp.order2 for scalp in scalps])
+
+        # first handoff fails and the next ones are skipped without connecting
+        self.assertListEqual([False, False, False], [handoff_order2(bot, om, scalp) for scalp in scalps])
+        self.assertEqual(1, bot.recovery_client.failures)
+        self.assertEqual(2, len(bot.errors))
+        self.assertFalse(bot.recovery_client.available())
+        self.assertEqual(3, len(om.orders))
+        self.assertFalse(any([scalp.handed_over for scalp in scalps]))
+
+        # worker is back after the retry interval
+        exchange = StandInExchange(0.079, 0.0791)
+        exchange.add_order("0", "ETH/BTC", "sell", 0.125, 0.0802)
+        worker = RecoveryWorker(bot, exchange, "localhost", 0, markets=dict())
+        worker.start_server()
+        try:
+            bot.recovery_client.port = worker.port
+            bot.recovery_client._retry_time = time.monotonic()
+            self.assertTrue(handoff_order2(bot, om, scalps[0]))
+        finally:
+            worker.stop()
+
+        self.assertTrue(scalps[0].handed_over)
+        self.assertNotIn(scalps[0].order2, om.orders)
+        self.assertEqual(1, bot.recovery_client.failures)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_reports
+from scalp_reports import ReportWriter
+import csv
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class FakeBot(object):
+    LOG_ERROR = 40
+
+    def __init__(self):
+        self.exchange_id = "fake"
+        self.report_fields = ["scalp-id", "result-fact-diff"]
+        self.remote_reports = list()
+
+    def log(self, level, msg):
+        pass
+
+    def send_remote_report(self, report):
+        self.remote_reports.append(report)
+
+
+class ScalpReportsTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_report_writer(self):
+        bot = FakeBot()
+        writer = ReportWriter(bot, self.directory, batch_size=3, flush_interval=60)
+        writer.start()
+
+        for i in range(5):
+            writer.put({"scalp-id": i, "result-fact-diff": 0.1 * i, "state": "closed"})
+
+        bot.report_fields.append("diff-BTC")
+        writer.put({"scalp-id": 5, "result-fact-diff": 0.5, "diff-BTC": 1.0})
+
+        writer.stop()
+
+        self.assertEqual(6, writer.reports_written)
+        self.assertEqual(2, writer.batches_written)
+        self.assertEqual(6, len(bot.remote_reports))
+
+        files = sorted(glob.glob(os.path.join(self.directory, "scalps_*.csv")))
+        self.assertEqual(2, len(files))  # new part of the file for the new report fields
+
+        with open(files[0], newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertListEqual([str(i) for i in range(5)], [r["scalp-id"] for r in rows])
+
+        with open(files[1], newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual("1.0", rows[0]["diff-BTC"])
+
+    def test_metrics(self):
+        bot = FakeBot()
+        writer = ReportWriter(bot, self.directory, batch_size=10, flush_interval=60)
+        writer.influxdb = {"measurement": "scalps"}
+
+        point = writer.influx_point({"phase": "orders", "count": 3, "p99-us": 120.0}, True)
+        self.assertEqual("scalps_metrics", point["measurement"])
+        self.assertEqual("orders", point["tags"]["phase"])
+        self.assertDictEqual({"count": 3, "p99-us": 120.0}, point["fields"])
+        writer.influxdb = None
+
+        writer.start()
+        writer.put_metrics([{"phase": "orders", "count": 3}, {"phase": "tickers", "count": 3}])
+        writer.stop()
+
+        self.assertEqual(2, len(bot.remote_reports))
+        self.assertEqual(0, len(glob.glob(os.path.join(self.directory, "scalps_*.csv"))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_simulator
+from scalp_simulator import SimulatedExchange, replay_tickers_csv, random_walk_tickers, NetworkError, \
+    ExchangeError, OrderNotFound, InvalidOrder
+import importlib.util
+import json
+import unittest
+
+SYMBOL = "ETH/BTC"
+
+
+def ticks(*prices):
+    """
+    ticks of (bid, ask, bidVolume, askVolume)
+    """
+    return [{SYMBOL: (1527000000000 + i * 1000, bid, ask, bid_volume, ask_volume)}
+            for i, (bid, ask, bid_volume, ask_volume) in enumerate(prices)]
+
+
+class ScalpSimulatorTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        with open("../test_data/markets_binance.json") as f:
+            self.markets = json.load(f)
+
+    def simulator(self, market_ticks, **kwargs):
+        kwargs.setdefault("tick_interval", 0.0)
+        return SimulatedExchange(self.markets, market_ticks, **kwargs)
+
+    def test_queue_position_and_partial_fills(self):
+        ex = self.simulator(ticks(*[(0.08, 0.080001, 10.0, 10.0)] * 5))
+        ex.fetch_tickers([SYMBOL])
+
+        order = ex.create_order(SYMBOL, "limit", "buy", 8.0, 0.08)
+        self.assertEqual("open", order["status"])
+        self.assertEqual(10.0, order["info"]["queue_ahead"])
+
+        ex.fetch_tickers([SYMBOL])  # 5 traded of 10 ahead
+        ex.fetch_tickers([SYMBOL])
+        self.assertEqual(0.0, ex.fetch_order(order["id"], SYMBOL)["filled"])
+
+        ex.fetch_tickers([SYMBOL])
+        order = ex.fetch_order(order["id"], SYMBOL)
+        self.assertEqual("open", order["status"])
+        self.assertAlmostEqual(5.0, order["filled"])
+
+        ex.fetch_tickers([SYMBOL])
+        order = ex.fetch_order(order["id"], SYMBOL)
+        self.assertEqual("closed", order["status"])
+        self.assertAlmostEqual(8.0, order["filled"])
+        self.assertAlmostEqual(8.0 * 0.08, order["cost"])
+        self.assertListEqual([5.0, 3.0], [t["amount"] for t in ex.fetch_my_trades(SYMBOL)])
+        self.assertEqual(0, ex.stats()["open_orders"])
+
+    def test_crossed_and_taker_orders(self):
+        ex = self.simulator(ticks((0.08, 0.080002, 10.0, 10.0), (0.080003, 0.080004, 1.0, 1.0)))
+        ex.fetch_tickers([SYMBOL])
+
+        taker = ex.create_order(SYMBOL, "limit", "buy", 12.0, 0.080005)
+        self.assertEqual("open", taker["status"])  # partially filled by the ask volume
+        self.assertAlmostEqual(10.0, taker["filled"])
+        self.assertAlmostEqual(10.0 * 0.080002, taker["cost"])
+
+        maker = ex.create_order(SYMBOL, "limit", "sell", 2.0, 0.080002)
+        deep = ex.create_order(SYMBOL, "limit", "sell", 2.0, 0.08001)
+        self.assertEqual(10.0, maker["info"]["queue_ahead"])
+        self.assertEqual(ex.level_volume, deep["info"]["queue_ahead"])
+
+        ex.fetch_tickers([SYMBOL])  # bid moved above the sell price and below the rest of taker
+        taker = ex.fetch_order(taker["id"], SYMBOL)
+        self.assertEqual("closed", taker["status"])
+        self.assertAlmostEqual(10.0 * 0.080002 + 2.0 * 0.080005, taker["cost"])
+        self.assertEqual("closed", ex.fetch_order(maker["id"], SYMBOL)["status"])
+        self.assertEqual("open", ex.fetch_order(deep["id"], SYMBOL)["status"])
+        self.assertListEqual([deep["id"]], [o["id"] for o in ex.fetch_open_orders(SYMBOL)])
+
+    def test_orders_inside_spread(self):
+        ex = self.simulator(ticks(*[(100.0, 102.0, 10.0, 10.0)] * 4))
+        ex.fetch_tickers([SYMBOL])
+
+        buy = ex.create_order(SYMBOL, "limit", "buy", 8.0, 101.0)
+        sell = ex.create_order(SYMBOL, "limit", "sell", 8.0, 101.5)
+        self.assertEqual(0.0, buy["info"]["queue_ahead"])  # new best bid
+        self.assertEqual(0.0, sell["info"]["queue_ahead"])
+
+        ex.fetch_tickers([SYMBOL])  # not crossed by the market: filled only by the traded volume
+        buy = ex.fetch_order(buy["id"], SYMBOL)
+        self.assertEqual("open", buy["status"])
+        self.assertAlmostEqual(5.0, buy["filled"])
+        self.assertAlmostEqual(5.0, ex.fetch_order(sell["id"], SYMBOL)["filled"])
+
+        ex.fetch_tickers([SYMBOL])
+        self.assertEqual("closed", ex.fetch_order(buy["id"], SYMBOL)["status"])
+        self.assertAlmostEqual(8.0 * 101.0, ex.fetch_order(buy["id"], SYMBOL)["cost"])
+
+    def test_cancel_and_invalid_orders(self):
+        ex = self.simulator(ticks((0.08, 0.080001, 10.0, 10.0)))
+        order = ex.create_order(SYMBOL, "limit", "buy", 1.0, 0.07)
+
+        self.assertEqual("canceled", ex.cancel_order(order["id"], SYMBOL)["status"])
+        self.assertEqual("canceled", ex.fetch_order(order["id"], SYMBOL)["status"])
+        with self.assertRaises(OrderNotFound):
+            ex.cancel_order(order["id"], SYMBOL)
+        with self.assertRaises(OrderNotFound):
+            ex.fetch_order("missing", SYMBOL)
+        with self.assertRaises(InvalidOrder):
+            ex.create_order(SYMBOL, "market", "buy", 1.0)
+        with self.assertRaises(ExchangeError):
+            ex.create_order("ABC/XYZ", "limit", "buy", 1.0, 1.0)
+
+        responses = ex.create_orders([{"symbol": SYMBOL, "type": "limit", "side": "sell", "amount": 1.0,
+                                       "price": 0.09},
+                                      {"symbol": SYMBOL, "type": "limit", "side": "sell", "amount": 0.0,
+                                       "price": 0.09}])
+        self.assertListEqual(["open", "rejected"], [r["status"] for r in responses])
+        self.assertListEqual(["canceled", "rejected"],
+                             [r["status"] for r in ex.cancel_orders([responses[0]["id"], order["id"]], SYMBOL)])
+
+    def test_scripted_orders(self):
+        ex = self.simulator(ticks((0.08, 0.080001, 10.0, 10.0)))
+        ex.script_orders("../test_data/orders_binance_error.json")
+        ex.script_orders("../test_data/orders_binance.json")
+
+        order = ex.create_order(SYMBOL, "limit", "sell", 0.016, 0.077212)
+        self.assertEqual(170254693, order["info"]["orderId"])
+        self.assertListEqual(["open"] * 3, [ex.fetch_order(order["id"], SYMBOL)["status"] for i in range(3)])
+        with self.assertRaises(ExchangeError):
+            ex.fetch_order(order["id"], SYMBOL)
+
+        order = ex.create_order(SYMBOL, "limit", "sell", 0.016, 0.077212)
+        updates = [ex.fetch_order(order["id"], SYMBOL) for i in range(4)]
+        self.assertEqual("closed", updates[-1]["status"])
+        self.assertEqual(order["id"], updates[-1]["id"])
+
+        self.assertEqual("open", ex.create_order(SYMBOL, "limit", "sell", 1.0, 0.09)["status"])
+
+    def test_latency_errors_and_determinism(self):
+        def run():
+            ex = SimulatedExchange(self.markets, random_walk_tickers({SYMBOL: 0.08}, {SYMBOL: 0.000001}, seed=3),
+                                   latency={"default": [0.1, 0.1], "create_order": [0.5, 0.0]},
+                                   errors={"create_order": 0.3}, seed=7, tick_interval=1.0)
+            results = list()
+            for i in range(50):
+                try:
+                    results.append(ex.create_order(SYMBOL, "limit", "buy", 1.0, 0.08)["status"])
+                except NetworkError:
+                    results.append("error")
+            return ex, results
+
+        ex, results = run()
+        self.assertEqual(50, ex.requests["create_order"])
+        self.assertEqual(results.count("error"), ex.request_errors["create_order"])
+        self.assertTrue(5 < ex.request_errors["create_order"] < 25)
+        self.assertAlmostEqual(25.0, ex.clock)
+        self.assertEqual(25, ex.tick_index)  # market moved by the virtual clock
+        self.assertEqual(ex.start_timestamp + 25000, ex.timestamp)
+
+        ex2, results2 = run()
+        self.assertListEqual(results, results2)
+        self.assertDictEqual(ex.stats(), ex2.stats())
+
+    def test_tickers_replay(self):
+        ex = SimulatedExchange.from_files("../test_data/markets_binance.json", "../test_data/tickers_many.csv",
+                                          tick_interval=0.0)
+        self.assertEqual(67, len(list(replay_tickers_csv("../test_data/tickers_many.csv"))))
+        self.assertIn(SYMBOL, ex.load_markets())
+
+        for i in range(70):
+            ticker = ex.fetch_tickers([SYMBOL])[SYMBOL]
+        self.assertTrue(ex.ticks_exhausted)
+        self.assertEqual(66, ex.tick_index)
+        self.assertLess(ticker["bid"], ticker["ask"])
+
+        book = ex.fetch_order_book(SYMBOL, 5)
+        self.assertEqual(5, len(book["bids"]))
+        self.assertEqual(ticker["bid"], book["bids"][0][0])
+        self.assertAlmostEqual(ticker["ask"] + 0.000004, book["asks"][4][0])
+        self.assertEqual("0.123", ex.amount_to_precision(SYMBOL, 0.1239))
+
+    @unittest.skipUnless(importlib.util.find_spec("ccxt") is not None, "ccxt is not installed")
+    def test_ccxt_errors(self):
+        import ccxt
+        self.assertTrue(issubclass(NetworkError, ccxt.NetworkError))
+        self.assertTrue(issubclass(OrderNotFound, ccxt.OrderNotFound))
+        self.assertTrue(issubclass(InvalidOrder, ccxt.InvalidOrder))
+        self.assertTrue(issubclass(OrderNotFound, scalp_simulator.SimulatorError))
+
+
+if __name__ == '__main__':
+    unittest.main()
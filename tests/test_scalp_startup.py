@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_startup
+from scalp_startup import MarketsCache, StartupTimings, MARKETS_CACHE_MAGIC
+from scalp_bot import ScalpBot
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class ScalpStartupTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open("../test_data/markets_binance.json") as f:
+            self.markets = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_markets_cache(self):
+        filename = os.path.join(self.tmp_dir, "_binance", "markets.bin")
+        cache = MarketsCache(filename, "binance")
+        self.assertIsNone(cache.load())
+
+        cache.save(self.markets)
+        markets, saved_time = cache.load()
+        self.assertDictEqual(self.markets, markets)
+        self.assertAlmostEqual(time.time(), saved_time, delta=5)
+
+        self.assertIsNone(MarketsCache(filename, "kucoin").load())
+
+        with open(filename, "r+b") as f:
+            f.write(MARKETS_CACHE_MAGIC + b"\xff")  # other version
+        self.assertIsNone(cache.load())
+
+        with open(filename, "wb") as f:
+            f.write(b"SCALP")
+        self.assertIsNone(cache.load())
+
+    def test_bot_markets_from_cache(self):
+        cwd = os.getcwd()
+        config = os.path.abspath("../_config_default.json")
+        os.chdir(self.tmp_dir)
+        try:
+            MarketsCache(os.path.join("_binance", "markets.bin"), "binance").save(self.markets)
+
+            bot = ScalpBot(config)
+            bot.load_config_from_file(config)
+            bot.exchange_id = "binance"
+            bot.offline = False
+
+            bot.load_markets()
+            self.assertEqual("cache", bot.markets_source)
+            self.assertDictEqual(self.markets, bot.markets)
+        finally:
+            os.chdir(cwd)
+
+    def test_startup_timings(self):
+        timings = StartupTimings()
+        timings.add("imports", 0.1)
+        with timings.phase("markets") as phase:
+            phase.name = "markets (cache)"
+
+        self.assertListEqual(["imports", "markets (cache)"], [p for p, d in timings.phases])
+        self.assertTrue(timings.summary().startswith("Startup 10"))
+        self.assertIn("imports 100.0, markets (cache) 0.0", timings.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_supervisor
+from scalp_supervisor import ShardSupervisor, merge_health
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+
+def _shard_worker(shard: dict, config_filename: str, metrics_queue):
+    """
+    crashes shard["crashes"] times and then reports its health and finishes
+    """
+    counter_file = os.path.join(shard["dir"], "{}.runs".format(shard["name"]))
+    runs = int(open(counter_file).read()) + 1 if os.path.isfile(counter_file) else 1
+    with open(counter_file, "w") as f:
+        f.write(str(runs))
+
+    if runs <= shard["crashes"]:
+        os._exit(3)
+
+    metrics_queue.put({"shard": shard["name"], "active_scalps": 0, "open_orders": 0, "lanes": 1, "lanes_done": 1,
+                       "result": {"BTC": shard["result"]}, "balance_diff": {"BTC": shard["result"], "ETH": 0.0}})
+
+
+def _long_worker(shard: dict, config_filename: str, metrics_queue):
+    """
+    runs until it's stopped and records its shutdown. Ignores SIGINT if shard["stubborn"] is set.
+    """
+    if shard.get("stubborn"):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    with open(os.path.join(shard["dir"], "{}.started".format(shard["name"])), "w"):
+        pass
+
+    try:
+        while True:
+            time.sleep(0.01)
+    except KeyboardInterrupt:
+        with open(os.path.join(shard["dir"], "{}.closed".format(shard["name"])), "w"):
+            pass
+
+
+class ScalpSupervisorTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def supervisor(self, shards, **kwargs):
+        for shard in shards:
+            shard["dir"] = self.tmp_dir
+        return ShardSupervisor(shards, "../_config_default.json", restart_backoff=0.01, start_method="fork",
+                               target=_shard_worker, **kwargs)
+
+    def test_restarts_and_merged_metrics(self):
+        points = list()
+        metrics_file = os.path.join(self.tmp_dir, "metrics", "metrics.jsonl")
+        supervisor = self.supervisor([{"name": "binance-1", "crashes": 2, "result": 0.001},
+                                      {"name": "kucoin-1", "crashes": 0, "result": 0.0005}],
+                                     metrics_file=metrics_file, on_metrics=points.append)
+        supervisor.run(0.01)
+
+        self.assertTrue(supervisor.done)
+        self.assertListEqual([2, 0], [w.restarts for w in supervisor.workers])
+        self.assertListEqual([True, True], [w.finished for w in supervisor.workers])
+
+        point = points[-1]
+        self.assertEqual(2, point["finished"])
+        self.assertEqual(2, point["restarts"])
+        self.assertAlmostEqual(0.0015, point["result"]["BTC"])
+        self.assertEqual(2, point["lanes_done"])
+        self.assertSetEqual({"binance-1", "kucoin-1"}, set(point["by_shard"]))
+
+        with open(metrics_file) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(len(points), len(lines))
+        self.assertAlmostEqual(0.0015, lines[-1]["result"]["BTC"])
+
+    def test_max_restarts(self):
+        supervisor = self.supervisor([{"name": "broken", "crashes": 100, "result": 0.0}], max_restarts=2)
+        supervisor.run(0.01)
+
+        worker = supervisor.workers[0]
+        self.assertTrue(worker.failed)
+        self.assertFalse(worker.finished)
+        self.assertEqual(2, worker.restarts)
+        self.assertEqual("3", open(os.path.join(self.tmp_dir, "broken.runs")).read())
+        self.assertEqual(1, supervisor.merged_point()["failed"])
+
+    def test_graceful_stop(self):
+        supervisor = self.supervisor([{"name": "graceful"}, {"name": "stubborn", "stubborn": True}])
+        supervisor.target = _long_worker
+        supervisor.check_workers()
+
+        deadline = time.monotonic() + 10.0
+        while time.monotonic() < deadline and not all(
+                [os.path.isfile(os.path.join(self.tmp_dir, "{}.started".format(w.name))) for w in supervisor.workers]):
+            time.sleep(0.01)
+
+        processes = [w.process for w in supervisor.workers]
+        supervisor.stop(0.5)
+
+        # the graceful worker has closed its state, the stubborn one is terminated after the timeout
+        self.assertEqual(0, processes[0].exitcode)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, "graceful.closed")))
+        self.assertEqual(-signal.SIGTERM, processes[1].exitcode)
+        self.assertFalse(os.path.isfile(os.path.join(self.tmp_dir, "stubborn.closed")))
+        self.assertFalse(any([w.running for w in supervisor.workers]))
+
+    def test_merge_health(self):
+        merged = merge_health({"a": {"active_scalps": 3, "open_orders": 4, "result": {"BTC": 0.1},
+                                     "balance_diff": {"BTC": 0.1, "ETH": -1.0}},
+                               "b": {"active_scalps": 1, "open_orders": 1, "result": {"BTC": 0.2, "USDT": 5.0},
+                                     "balance_diff": {"ETH": 0.5}}})
+        self.assertEqual(4, merged["active_scalps"])
+        self.assertEqual(5, merged["open_orders"])
+        self.assertAlmostEqual(0.3, merged["result"]["BTC"])
+        self.assertDictEqual({"BTC": 0.1, "ETH": -0.5}, merged["balance_diff"])
+
+        with self.assertRaises(ValueError):
+            ShardSupervisor([{"name": "a"}, {"name": "a"}], "config.json")
+
+
+if __name__ == '__main__':
+    unittest.main()
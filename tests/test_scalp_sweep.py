@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_sweep
+from scalp_bot import ScalpBot, ScalpLane
+from scalp_backtest import ScalpBacktest
+from scalp_indicators import TickerMAIndicator
+from scalp_sweep import moving_averages, ma_signals, ScalpSweep
+import itertools
+import numpy as np
+import unittest
+
+
+class ScalpSweepTestSuite(unittest.TestCase):
+
+    def test_moving_averages(self):
+        values = np.array([1.0, 2.0, 4.0, 3.0, 5.0, 7.0])
+        mas = moving_averages(values, [2, 3, 10])
+
+        self.assertTrue(np.isnan(mas[3][1]))
+        self.assertAlmostEqual(7 / 3, mas[3][2])
+        self.assertAlmostEqual(6.0, mas[2][5])
+        self.assertTrue(np.all(np.isnan(mas[10])))
+
+    def test_ma_signals_same_as_indicator(self):
+        values = np.array([10, 11, 12, 11, 10, 9, 10, 12, 13, 12, 10, 8, 9, 11], dtype=np.float64)
+        thresholds = [0.0, 0.01]
+
+        for side in ["buy", "sell"]:
+            signals = ma_signals(values, side, [(2, 4)], thresholds, 2)
+
+            for threshold in thresholds:
+                indicator = TickerMAIndicator(2, 4, 4 + 2)
+                expected = list()
+                for v in values:
+                    indicator.update(v, v)
+                    expected.append(indicator.signal(side, threshold))
+
+                self.assertListEqual(expected, signals[(2, 4, threshold)].tolist())
+
+    def test_sweep_same_as_backtest(self):
+        bot = ScalpBot("../_config_default.json")
+        bot.load_config_from_file("../_config_default.json")
+        bot.symbols = [{"symbol": "ETH/BTC", "start_currency": "BTC", "dest_currency": "ETH", "max_active_scalps": 3}]
+
+        bid = 0.08 * np.exp(np.cumsum(np.random.RandomState(0).normal(0, 0.001, 300)))  # random walk
+        ask = bid * 1.0002
+
+        sweep = ScalpSweep(bot, ask, bid)
+        configs = sweep.grid([0.001, 0.002], [0.5], [1], [3], [5, 8], [0.0, 0.0005])
+        self.assertEqual(8, len(configs))
+
+        reports = sweep.run(configs, workers=1)
+        self.assertEqual(8, len(reports))
+        self.assertListEqual(sorted([r["pnl"] for r in reports], reverse=True), [r["pnl"] for r in reports])
+        self.assertTrue(any([r["scalps-closed"] > 0 for r in reports]))
+        self.assertTrue(any([r["cur2-diff"] > 0 for r in reports]))  # leftovers to be marked to market
+        self.assertGreater(len(set([r["pnl"] for r in reports])), 1)
+
+        for report in reports:
+            config = [c for c in configs if all([c[k] == report[k] for k in c if k != "profit_with_fee"])][0]
+            lane = ScalpLane("ETH/BTC", "BTC", "ETH", bot.start_amount, config["profit"], config["profit_with_fee"], 3,
+                             TickerMAIndicator(config["ma_short_window"], config["ma_long_window"],
+                                               config["ma_long_window"] + bot.ma_count),
+                             config["depth_step_in_profits"], config["first_order_price_margin_in_profits_with_fees"])
+            backtest = ScalpBacktest([lane], bot.commission, config["ma_short_long_threshold"], bot.order1_max_updates,
+                                     bot.order2_max_updates_for_profit, bot.order2_max_updates_market,
+                                     bot.cancel_threshold)
+            result = backtest.run(zip(itertools.repeat("ETH/BTC"), ask.tolist(), bid.tolist()))[0]
+
+            self.assertEqual(result.scalps_added, report["scalps-added"])
+            self.assertEqual(result.scalps_closed, report["scalps-closed"])
+            self.assertAlmostEqual(result.result_fact_diff, report["result-fact-diff"], 12)
+            # leftover of the dest currency is valued at the last bid
+            self.assertAlmostEqual(result.cur1_diff + result.cur2_diff * bid[-1], report["pnl"], 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from .context import scalp_throttle
+from scalp_throttle import RequestScheduler, ThrottledExchange
+import unittest
+
+
+class FakeCcxt(object):
+    def fetch_open_orders(self, symbol):
+        return []
+
+
+class FakeExchange(object):
+    def __init__(self):
+        self.offline = False
+        self._ccxt = FakeCcxt()
+
+    def fetch_tickers(self, symbols=None):
+        return {}
+
+    def place_limit_order(self, order):
+        return {"id": "1"}
+
+
+class ScalpThrottleTestSuite(unittest.TestCase):
+
+    def test_priorities(self):
+        scheduler = RequestScheduler(10, 1000, 0.4)  # no refill during the test
+
+        # tickers could not take 4 requests of orders reserve
+        for i in range(6):
+            self.assertTrue(scheduler.try_acquire(1, RequestScheduler.PRIORITY_TICKERS))
+        self.assertFalse(scheduler.try_acquire(1, RequestScheduler.PRIORITY_TICKERS))
+        self.assertGreater(scheduler.wait_time(1, RequestScheduler.PRIORITY_TICKERS), 0)
+
+        # orders updates could take half of the reserve
+        self.assertTrue(scheduler.try_acquire(2, RequestScheduler.PRIORITY_ORDER_UPDATES))
+        self.assertFalse(scheduler.try_acquire(1, RequestScheduler.PRIORITY_ORDER_UPDATES))
+
+        self.assertTrue(scheduler.try_acquire(2, RequestScheduler.PRIORITY_ORDERS))
+        self.assertFalse(scheduler.try_acquire(1, RequestScheduler.PRIORITY_ORDERS))
+
+        stats = scheduler.stats()
+        self.assertEqual(1.0, scheduler.utilization())
+        self.assertEqual(6, stats["tickers_requests"])
+        self.assertEqual(2, stats["order_updates_requests"])
+        self.assertEqual(2, stats["orders_requests"])
+
+    def test_cycle_sleep(self):
+        scheduler = RequestScheduler(10, 10, 0.0)
+
+        scheduler.try_acquire(2)
+        self.assertEqual(0.0, scheduler.cycle_sleep(1.0))  # 8 tokens left
+        self.assertEqual(2, scheduler.requests_per_cycle)
+
+        scheduler.try_acquire(8)
+        self.assertEqual(1.0, scheduler.cycle_sleep(1.0))  # no tokens left, limited by max sleep
+        self.assertGreater(scheduler.cycle_sleep(100.0), 2.0)
+
+    def test_throttled_exchange(self):
+        scheduler = RequestScheduler(100, 1000, 0.2)
+        exchange = ThrottledExchange(FakeExchange(), scheduler)
+
+        exchange.fetch_tickers(["ETH/BTC"])
+        exchange.place_limit_order(None)
+        exchange._ccxt.fetch_open_orders("ETH/BTC")
+        self.assertFalse(exchange.offline)
+
+        exchange.offline = True
+        self.assertTrue(exchange.exchange.offline)
+
+        stats = scheduler.stats()
+        self.assertEqual(3, stats["requests_last_period"])
+        self.assertEqual(1, stats["tickers_requests"])
+        self.assertEqual(1, stats["orders_requests"])
+        self.assertEqual(1, stats["order_updates_requests"])
+
+
+if __name__ == '__main__':
+    unittest.main()